@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the tour manager.
+Times parsing, view config generation, auto-180, ZIP extraction and
+packaging and full init/build runs on synthetic tours of increasing size,
+stores the results as JSON and compares them against a saved baseline.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 10 100 1000 -o results.json
+    python benchmarks/run_benchmarks.py --baseline results.json
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Make marzipano_manager importable when run from anywhere
+project_dir = Path(__file__).parent.parent.absolute()
+if str(project_dir) not in sys.path:
+    sys.path.insert(0, str(project_dir))
+
+from marzipano_manager import TourManager
+from marzipano_manager import file_ops
+from marzipano_manager import parser
+from marzipano_manager import transitions
+from marzipano_manager import view_config_generator
+from synthetic_tour import generate_tour
+
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DEFAULT_REPEAT = 3
+
+# Slowdown against the baseline reported as a regression
+DEFAULT_THRESHOLD = 0.10
+
+# Benchmarks in run order
+BENCHMARKS = [
+    'parse_data_js',
+    'generate_view_config',
+    'calculate_entry_angles',
+    'extract_zip',
+    'create_zip',
+    'init',
+    'build',
+]
+
+
+def time_call(function, repeat, setup=None):
+    """
+    Time function() repeat times.
+
+    Args:
+        function: Callable to time; receives setup()'s result if given
+        repeat: Number of runs
+        setup: Optional untimed callable run before each run
+
+    Returns:
+        list: Seconds per run
+    """
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument) if setup else function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+class TourFixture:
+    """A synthetic tour ZIP, its extracted copy and parsed data."""
+
+    def __init__(self, root, scenes, tour_options):
+        self.root = root
+        self.scenes = scenes
+        self.zip_path = os.path.join(root, f"tour_{scenes}.zip")
+        self.generated = generate_tour(self.zip_path, scenes, **tour_options)
+
+        self.extracted = os.path.join(root, f"extracted_{scenes}")
+        file_ops.extract_zip(self.zip_path, self.extracted, progress=False)
+        self.data_js = os.path.join(self.extracted, "app-files", "data.js")
+        self.data = parser.parse_data_js(self.data_js)
+        self._runs = 0
+
+    def scratch(self, name):
+        """Fresh path inside the fixture directory for one run."""
+        self._runs += 1
+        path = os.path.join(self.root, f"{name}_{self.scenes}_{self._runs}")
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        return path
+
+
+def run_benchmark(name, fixture, repeat):
+    """
+    Time one benchmark on a fixture.
+
+    Returns:
+        list: Seconds per run
+    """
+    if name == 'parse_data_js':
+        return time_call(lambda: parser.parse_data_js(fixture.data_js), repeat)
+    if name == 'generate_view_config':
+        return time_call(lambda: view_config_generator.generate_view_config(fixture.data), repeat)
+    if name == 'calculate_entry_angles':
+        return time_call(transitions.calculate_entry_angles, repeat,
+                         setup=lambda: copy.deepcopy(fixture.data))
+    if name == 'extract_zip':
+        return time_call(lambda target: file_ops.extract_zip(fixture.zip_path, target, progress=False),
+                         repeat, setup=lambda: fixture.scratch('extract'))
+    if name == 'create_zip':
+        return time_call(lambda target: file_ops.create_zip(fixture.extracted, target, progress=False,
+                                                            incremental=False),
+                         repeat, setup=lambda: fixture.scratch('package') + '.zip')
+    if name == 'init':
+        return time_call(lambda target: TourManager().init(fixture.zip_path, target, serve=False),
+                         repeat, setup=lambda: fixture.scratch('init'))
+    if name == 'build':
+        tour_dir = fixture.scratch('tour')
+        with contextlib.redirect_stdout(io.StringIO()):
+            TourManager().init(fixture.zip_path, tour_dir, serve=False)
+        return time_call(lambda target: TourManager().build(tour_dir, target, incremental=False),
+                         repeat, setup=lambda: fixture.scratch('build') + '.zip')
+    raise ValueError(f"Unknown benchmark: {name}")
+
+
+def git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_dir,
+                                capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, benchmarks, repeat, tour_options, work_dir=None):
+    """
+    Run the benchmarks on synthetic tours of every size.
+
+    Args:
+        sizes: Scene counts
+        benchmarks: Benchmark names (see BENCHMARKS)
+        repeat: Runs per benchmark and size
+        tour_options: Keyword arguments for generate_tour
+        work_dir: Directory for the fixtures (defaults to a temporary one)
+
+    Returns:
+        dict: 'environment', 'tour', 'results' ({benchmark, scenes, runs, min, median})
+    """
+    results = []
+    with tempfile.TemporaryDirectory(dir=work_dir, prefix='marzipano_bench_') as root:
+        for scenes in sizes:
+            print(f"🏗️  Generating a {scenes}-scene tour...")
+            fixture_dir = os.path.join(root, str(scenes))
+            os.makedirs(fixture_dir)
+            fixture = TourFixture(fixture_dir, scenes, tour_options)
+            print(f"✓ {fixture.generated['tiles']} tiles, "
+                  f"{fixture.generated['bytes'] / (1024 * 1024):.1f} MB")
+
+            for name in benchmarks:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    runs = run_benchmark(name, fixture, repeat)
+                result = {
+                    'benchmark': name,
+                    'scenes': scenes,
+                    'runs': runs,
+                    'min': min(runs),
+                    'median': statistics.median(runs),
+                }
+                results.append(result)
+                print(f"  {name:<24} {result['min'] * 1000:10.1f} ms  "
+                      f"({result['min'] / scenes * 1e6:8.1f} µs/scene)")
+            shutil.rmtree(fixture.root)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'revision': git_revision(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'tour': tour_options,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def print_scaling(report):
+    """Print each benchmark's best time against the number of scenes."""
+    sizes = sorted({result['scenes'] for result in report['results']})
+    print(f"\n📈 Best time (ms) by number of scenes")
+    print(f"  {'benchmark':<24}" + ''.join(f"{size:>12}" for size in sizes))
+    by_key = {(result['benchmark'], result['scenes']): result for result in report['results']}
+    for name in BENCHMARKS:
+        if not any((name, size) in by_key for size in sizes):
+            continue
+        cells = [f"{by_key[(name, size)]['min'] * 1000:12.1f}" if (name, size) in by_key else f"{'-':>12}"
+                 for size in sizes]
+        print(f"  {name:<24}" + ''.join(cells))
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare best times against a baseline report.
+
+    Args:
+        report: Report from run_suite
+        baseline: Earlier report
+        threshold: Relative slowdown reported as a regression
+
+    Returns:
+        list: (benchmark, scenes, baseline seconds, seconds) of the regressions
+    """
+    previous = {(result['benchmark'], result['scenes']): result for result in baseline['results']}
+    regressions = []
+    print(f"\n⚖️  Against baseline {baseline['environment'].get('revision') or ''} "
+          f"({baseline['environment'].get('date', 'unknown date')})")
+    for result in report['results']:
+        key = (result['benchmark'], result['scenes'])
+        if key not in previous:
+            continue
+        before = previous[key]['min']
+        change = result['min'] / before - 1 if before else 0.0
+        marker = ''
+        if change > threshold:
+            marker = '  ⚠️  regression'
+            regressions.append((key[0], key[1], before, result['min']))
+        elif change < -threshold:
+            marker = '  ✓ faster'
+        print(f"  {key[0]:<24} {key[1]:>6} scenes  {before * 1000:10.1f} → "
+              f"{result['min'] * 1000:10.1f} ms  ({change:+.0%}){marker}")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark the tour manager on synthetic tours')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                            help='Scene counts to benchmark (default: 10 100 1000 10000)')
+    arg_parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=BENCHMARKS,
+                            help='Benchmarks to run (default: all)')
+    arg_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                            help='Runs per benchmark; the best one is compared (default: 3)')
+    arg_parser.add_argument('--hotspots', type=int, default=4, help='Link hotspots per scene (default: 4)')
+    arg_parser.add_argument('--levels', type=int, default=1,
+                            help='Cube levels per scene besides the preview (default: 1)')
+    arg_parser.add_argument('--html-bytes', type=int, default=200,
+                            help='HTML payload of each info hotspot (default: 200)')
+    arg_parser.add_argument('--tile-bytes', type=int, default=1024,
+                            help='Size of each fake tile, 0 for no tiles (default: 1024)')
+    arg_parser.add_argument('-o', '--output', default='benchmark_results.json',
+                            help='Results JSON to write (default: benchmark_results.json)')
+    arg_parser.add_argument('--baseline', default=None,
+                            help='Earlier results JSON to compare against; exits 1 on regressions')
+    arg_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Slowdown reported as a regression (default: 0.10 = 10%%)')
+    arg_parser.add_argument('--work-dir', default=None,
+                            help='Where to generate the tours (default: system temp directory)')
+    args = arg_parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    tour_options = {'hotspots': args.hotspots, 'levels': args.levels,
+                    'html_bytes': args.html_bytes, 'tile_bytes': args.tile_bytes}
+    report = run_suite(args.sizes, args.benchmarks, args.repeat, tour_options, work_dir=args.work_dir)
+    print_scaling(report)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions over {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Synthetic tour generator for benchmarks.
+Writes ZIPs shaped like Marzipano Tool exports (index.html, data.js, the
+template's scripts and images, a tile pyramid per scene) with any number of
+scenes, hotspots and tile levels.
+
+Usage:
+    python benchmarks/synthetic_tour.py tour.zip --scenes 1000 --hotspots 4
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import zipfile
+from pathlib import Path
+
+# Make marzipano_manager importable when run from anywhere
+project_dir = Path(__file__).parent.parent.absolute()
+if str(project_dir) not in sys.path:
+    sys.path.insert(0, str(project_dir))
+
+from marzipano_manager.tiler import FACES, TILE_SIZE, compute_levels
+
+
+# Marzipano Tool export template (index.html.tpl, index.js, vendor/, img/)
+TEMPLATE_DIR = project_dir.parent / "Marzipano-tool" / "template"
+
+SCENE_LIST_ITEM = re.compile(r'<% scenes\.forEach.*?<% }\); %>', re.DOTALL)
+
+
+def scene_links(index, scenes, hotspots):
+    """
+    Scene indexes linked from a scene: its neighbours on a ring, then ever
+    further ones (+1, -1, +2, -2, ...), so every link has a return link.
+    """
+    targets = []
+    offset = 1
+    while len(targets) < min(hotspots, scenes - 1) and offset < scenes:
+        for target in ((index + offset) % scenes, (index - offset) % scenes):
+            if target != index and target not in targets and len(targets) < hotspots:
+                targets.append(target)
+        offset += 1
+    return targets
+
+
+def make_tour_data(scenes, hotspots=4, levels=2, html_bytes=200, seed=0):
+    """
+    Tour data as the Marzipano Tool writes it to data.js.
+
+    Args:
+        scenes: Number of scenes
+        hotspots: Link hotspots per scene
+        levels: Cube levels per scene besides the fallback preview
+            (1: 512 px faces, 2: 1024 px, ...)
+        html_bytes: Size of the HTML payload of each scene's info hotspot
+        seed: Random seed for yaw angles
+
+    Returns:
+        dict: APP_DATA
+    """
+    rng = random.Random(seed)
+    scene_levels, face_size = compute_levels(TILE_SIZE * 2 ** (levels - 1))
+    filler = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * (html_bytes // 56 + 1))
+    ids = [f"{i}-scene-{i}" for i in range(scenes)]
+
+    data_scenes = []
+    for i, scene_id in enumerate(ids):
+        data_scenes.append({
+            'id': scene_id,
+            'name': f"Scene {i}",
+            'levels': scene_levels,
+            'faceSize': face_size,
+            'initialViewParameters': {
+                'pitch': 0,
+                'yaw': rng.uniform(-math.pi, math.pi),
+                'fov': 1.5707963267948966,
+            },
+            'linkHotspots': [{
+                'yaw': rng.uniform(-math.pi, math.pi),
+                'pitch': rng.uniform(-0.2, 0.2),
+                'rotation': 0,
+                'target': ids[target],
+            } for target in scene_links(i, scenes, hotspots)],
+            'infoHotspots': [{
+                'yaw': rng.uniform(-math.pi, math.pi),
+                'pitch': 0,
+                'title': f"About scene {i}",
+                'text': f"<p>{filler[:max(html_bytes - 7, 0)]}</p>",
+            }],
+        })
+
+    return {
+        'scenes': data_scenes,
+        'name': 'Synthetic tour',
+        'settings': {
+            'mouseViewMode': 'drag',
+            'autorotateEnabled': True,
+            'fullscreenButton': False,
+            'viewControlButtons': False,
+        },
+    }
+
+
+def render_index_html(data):
+    """Fill in index.html.tpl like the Marzipano Tool does."""
+    with open(TEMPLATE_DIR / "app-files" / "index.html.tpl", 'r', encoding='utf-8') as f:
+        template = f.read()
+    scene_list = ''.join(
+        f'\n      <a href="javascript:void(0)" class="scene" data-id="{scene["id"]}">\n'
+        f'        <li class="text">{scene["name"]}</li>\n      </a>'
+        for scene in data['scenes']
+    )
+    html = SCENE_LIST_ITEM.sub(lambda _: scene_list, template)
+    body_class = 'multiple-scenes' if len(data['scenes']) > 1 else 'single-scene'
+    html = re.sub(r'<%- scenes\.length.*?%> <%- settings.*?%>', body_class + ' ', html)
+    return html.replace('<%- name %>', data['name'])
+
+
+def fake_jpeg(rng, size):
+    """Incompressible bytes framed like a JPEG (SOI ... EOI)."""
+    return b'\xff\xd8\xff\xe0' + rng.randbytes(max(size - 6, 0)) + b'\xff\xd9'
+
+
+def generate_tour(output_zip, scenes, hotspots=4, levels=2, html_bytes=200, tile_bytes=1024, seed=0):
+    """
+    Write a synthetic Marzipano Tool export.
+
+    Tiles have the real pyramid layout (tiles/<id>/{z}/{f}/{y}/{x}.jpg plus
+    preview.jpg) but hold random bytes, so they cost I/O, not decoding.
+
+    Args:
+        output_zip: ZIP path to write
+        scenes: Number of scenes
+        hotspots: Link hotspots per scene
+        levels: Cube levels per scene besides the fallback preview
+        html_bytes: Size of each info hotspot's HTML
+        tile_bytes: Size of each tile (0 writes no tiles)
+        seed: Random seed
+
+    Returns:
+        dict: 'scenes', 'tiles', 'bytes' (ZIP size)
+    """
+    rng = random.Random(seed)
+    data = make_tour_data(scenes, hotspots=hotspots, levels=levels, html_bytes=html_bytes, seed=seed)
+    with open(TEMPLATE_DIR / "files.json", 'r', encoding='utf-8') as f:
+        template_files = [name for name in json.load(f) if name.startswith('app-files/')
+                          and not name.endswith('.tpl')]
+
+    tiles = 0
+    with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('app-files/index.html', render_index_html(data))
+        archive.writestr('app-files/data.js', 'var APP_DATA = ' + json.dumps(data, indent=2) + ';\n')
+        for name in template_files:
+            archive.write(TEMPLATE_DIR / name, name)
+
+        if tile_bytes:
+            for scene in data['scenes']:
+                scene_dir = f"app-files/tiles/{scene['id']}"
+                archive.writestr(f"{scene_dir}/preview.jpg", fake_jpeg(rng, tile_bytes),
+                                 compress_type=zipfile.ZIP_STORED)
+                for z, level in enumerate(scene['levels']):
+                    if level.get('fallbackOnly'):
+                        continue
+                    per_side = level['size'] // level['tileSize']
+                    for face in FACES:
+                        for y in range(per_side):
+                            for x in range(per_side):
+                                archive.writestr(f"{scene_dir}/{z}/{face}/{y}/{x}.jpg",
+                                                 fake_jpeg(rng, tile_bytes), compress_type=zipfile.ZIP_STORED)
+                                tiles += 1
+
+    return {'scenes': scenes, 'tiles': tiles, 'bytes': os.path.getsize(output_zip)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Marzipano Tool export')
+    parser.add_argument('output', help='ZIP file to write')
+    parser.add_argument('--scenes', type=int, default=10, help='Number of scenes (default: 10)')
+    parser.add_argument('--hotspots', type=int, default=4, help='Link hotspots per scene (default: 4)')
+    parser.add_argument('--levels', type=int, default=2,
+                        help='Cube levels per scene: 1 = 512 px faces, 2 = 1024 px, ... (default: 2)')
+    parser.add_argument('--html-bytes', type=int, default=200,
+                        help='HTML payload of each info hotspot (default: 200)')
+    parser.add_argument('--tile-bytes', type=int, default=1024,
+                        help='Size of each (fake) tile, 0 for no tiles (default: 1024)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    stats = generate_tour(args.output, args.scenes, hotspots=args.hotspots, levels=args.levels,
+                          html_bytes=args.html_bytes, tile_bytes=args.tile_bytes, seed=args.seed)
+    print(f"✓ {args.output}: {stats['scenes']} scenes, {stats['tiles']} tiles, "
+          f"{stats['bytes'] / (1024 * 1024):.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,27 @@ if str(script_dir) not in sys.path:
     sys.path.insert(0, str(script_dir))
 
 from marzipano_manager import TourManager
+from marzipano_manager import batch
+from marzipano_manager import profiling
+
+
+def add_profile_arguments(subparser):
+    """Add the --profile options to an init/build subcommand."""
+    subparser.add_argument('--profile', nargs='?', const='', default=None, metavar='TRACE',
+                           help='Record time, CPU, I/O and files per stage and write a Chrome trace '
+                                '(default: <command>_profile.json)')
+    subparser.add_argument('--cprofile', action='store_true',
+                           help='With --profile: also run under cProfile (.prof next to the trace)')
+    subparser.add_argument('--tracemalloc', action='store_true',
+                           help='With --profile: also trace Python memory per stage (slow)')
+
+
+def make_profiler(args):
+    """StageProfiler for the --profile options (disabled if not given)."""
+    if args.profile is None and not (args.cprofile or args.tracemalloc):
+        return None
+    return profiling.StageProfiler(trace_path=args.profile or f'{args.command}_profile.json',
+                                   cprofile=args.cprofile, tracemalloc=args.tracemalloc)
 
 
 def main():
@@ -30,11 +51,99 @@ def main():
     init_parser = subparsers.add_parser('init', help='Initialize tour from ZIP')
     init_parser.add_argument('zip_file', help='Path to Marzipano Tool ZIP export')
     init_parser.add_argument('-o', '--output', help='Output directory name')
+    init_parser.add_argument('-j', '--jobs', type=int, default=None,
+                             help='Parallel extraction workers (default: CPU count)')
+    init_parser.add_argument('--from-zip', action='store_true',
+                             help='Serve tiles straight from the ZIP; only extract files the editor patches')
+    init_parser.add_argument('--workers', type=int, default=None,
+                             help='Preview server worker threads (default: 32)')
+    init_parser.add_argument('--backlog', type=int, default=None,
+                             help='Preview server listen backlog (default: 128)')
+    init_parser.add_argument('--watch', action='store_true',
+                             help='Regenerate derived files on edits and live-reload editor tabs')
+    add_profile_arguments(init_parser)
+    
+    # Serve command
+    serve_parser = subparsers.add_parser('serve', help='Serve an initialized tour for editing')
+    serve_parser.add_argument('tour', help='Tour directory created by init')
+    serve_parser.add_argument('--port', type=int, default=8000, help='First port to try (default: 8000)')
+    serve_parser.add_argument('--no-browser', action='store_true', help='Do not open a browser')
+    serve_parser.add_argument('--workers', type=int, default=None,
+                              help='Preview server worker threads (default: 32)')
+    serve_parser.add_argument('--backlog', type=int, default=None,
+                              help='Preview server listen backlog (default: 128)')
+    serve_parser.add_argument('--watch', action='store_true',
+                              help='Regenerate derived files on edits and live-reload editor tabs')
+    serve_parser.add_argument('--poll-interval', type=float, default=None, metavar='SECONDS',
+                              help='Seconds between checks for changes in watch mode (default: 0.5)')
+    
+    # Views command
+    views_parser = subparsers.add_parser('views', help='Regenerate the view config after editing tour data')
+    views_parser.add_argument('tour', help='Tour directory created by init')
+    views_parser.add_argument('--full', action='store_true',
+                              help='Recompute every entry view, discarding ones aligned by hand')
     
     # Build command
     build_parser = subparsers.add_parser('build', help='Build final tour from config')
-    build_parser.add_argument('config', help='Path to config.json from editor')
+    build_parser.add_argument('config',
+                              help='config.json from the editor, or a tour directory saved through the preview server')
     build_parser.add_argument('-o', '--output', help='Output ZIP filename', default='final_tour.zip')
+    build_parser.add_argument('-j', '--jobs', type=int, default=None,
+                              help='Parallel compression workers (default: CPU count)')
+    build_parser.add_argument('--level', type=int, default=None, choices=range(0, 10), metavar='0-9',
+                              help='Deflate level for text assets (default: 6)')
+    build_parser.add_argument('--full', action='store_true',
+                              help='Rebuild every member instead of reusing the previous archive')
+    build_parser.add_argument('--tile-format', choices=['webp', 'avif'], default=None,
+                              help='Also ship tiles in this format; browsers without support get JPEG')
+    build_parser.add_argument('--tile-quality', type=int, default=None, choices=range(1, 101), metavar='1-100',
+                              help='Quality for transcoded tiles (default: 80 webp, 60 avif)')
+    build_parser.add_argument('--dedup-tiles', action='store_true',
+                              help='Store identical tiles once and resolve duplicates at runtime')
+    build_parser.add_argument('--prefetch-budget', type=float, default=None, metavar='MB',
+                              help='Neighbour tiles the player may prefetch per scene (default: 4, 0 disables)')
+    build_parser.add_argument('--bundle', action='store_true',
+                              help='Ship scripts and stylesheets as minified, content-hashed bundles')
+    build_parser.add_argument('--compact-data', action='store_true',
+                              help='Write data.js without whitespace or editor-only keys, plus data.js.gz')
+    build_parser.add_argument('--precision', type=int, default=None, choices=range(0, 16), metavar='0-15',
+                              help='Decimal places kept for yaw/pitch/fov in compact data.js (default: 4)')
+    build_parser.add_argument('--keep-data-uris', action='store_true',
+                              help='Leave data: URI images inline in data.js instead of moving them to app-files/assets/')
+    build_parser.add_argument('--sprite-atlas', action='store_true',
+                              help='Pack small hotspot images into sprite atlases (requires Pillow)')
+    build_parser.add_argument('--sprite-max-size', type=int, default=None, metavar='PX',
+                              help='Largest sprite atlas width/height (default: 2048)')
+    build_parser.add_argument('--chunk-scenes', action='store_true',
+                              help='Split data.js into a root index and per-scene chunks; '
+                                   'scenes are created on first visit (for very large tours)')
+    build_parser.add_argument('--keep-hops', type=int, default=None, metavar='N',
+                              help='With --chunk-scenes, keep scenes within N links of the current one '
+                                   '(default: 2)')
+    add_profile_arguments(build_parser)
+    
+    # Tile command
+    tile_parser = subparsers.add_parser('tile', help='Tile equirectangular panoramas into a tour')
+    tile_parser.add_argument('images', nargs='+', help='Equirectangular panorama images (2:1)')
+    tile_parser.add_argument('-t', '--tour', required=True,
+                             help='Tour directory to add scenes to (app-files/ is created if missing)')
+    tile_parser.add_argument('-p', '--processes', type=int, default=None,
+                             help='Tiling processes (default: CPU count)')
+    tile_parser.add_argument('--quality', type=int, default=None, choices=range(1, 101), metavar='1-100',
+                             help='JPEG quality (default: 85)')
+    
+    # Batch command
+    batch_parser = subparsers.add_parser('batch', help='Initialize/build many tours in parallel (no server)')
+    batch_parser.add_argument('inputs', nargs='+',
+                              help='Tour ZIPs, editor config.json files, directories or glob patterns')
+    batch_parser.add_argument('-o', '--output-dir', default='batch_output',
+                              help='Directory for tour outputs, logs and report (default: batch_output)')
+    batch_parser.add_argument('-p', '--processes', type=int, default=None,
+                              help='Tours processed in parallel (default: CPU count)')
+    batch_parser.add_argument('-j', '--jobs', type=int, default=None,
+                              help='Threads per tour (default: CPU count / processes)')
+    batch_parser.add_argument('--report', default=None,
+                              help='Summary report path (default: <output-dir>/batch_report.json)')
     
     args = parser.parse_args()
     
@@ -42,12 +151,39 @@ def main():
         parser.print_help()
         sys.exit(1)
     
-    manager = TourManager()
+    if args.command == 'batch':
+        report = batch.run_batch(args.inputs, args.output_dir, processes=args.processes,
+                                 jobs_per_tour=args.jobs, report_path=args.report)
+        sys.exit(1 if report['failed'] else 0)
+    
+    server_options = {}
+    if args.command == 'init':
+        server_options = {'workers': args.workers, 'backlog': args.backlog, 'watch': args.watch}
+    elif args.command == 'serve':
+        server_options = {'workers': args.workers, 'backlog': args.backlog, 'watch': args.watch,
+                          'poll_interval': args.poll_interval, 'port': args.port,
+                          'open_browser': not args.no_browser}
+    profiler = make_profiler(args) if args.command in ('init', 'build') else None
+    manager = TourManager(server_options=server_options, profiler=profiler)
     
     if args.command == 'init':
-        manager.init(args.zip_file, args.output)
+        manager.init(args.zip_file, args.output, jobs=args.jobs, from_zip=args.from_zip)
+    elif args.command == 'serve':
+        manager.serve(args.tour)
+    elif args.command == 'views':
+        manager.regenerate_views(args.tour, full=args.full)
     elif args.command == 'build':
-        manager.build(args.config, args.output)
+        manager.build(args.config, args.output, jobs=args.jobs, compression_level=args.level,
+                      incremental=not args.full, tile_format=args.tile_format,
+                      tile_quality=args.tile_quality, dedup_tiles=args.dedup_tiles,
+                      prefetch_budget=None if args.prefetch_budget is None
+                      else int(args.prefetch_budget * 1024 * 1024),
+                      bundle=args.bundle, compact_data=args.compact_data,
+                      data_precision=args.precision, externalize_assets=not args.keep_data_uris,
+                      sprite_atlas=args.sprite_atlas, sprite_max_size=args.sprite_max_size,
+                      chunk_scenes=args.chunk_scenes, keep_hops=args.keep_hops)
+    elif args.command == 'tile':
+        manager.tile(args.images, args.tour, processes=args.processes, quality=args.quality)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,168 @@
+"""
+Externalisation of data-URI assets embedded in tour data.
+Images pasted into hotspots as data: URIs are written once each to
+content-addressed files under app-files/assets/ and referenced by URL,
+so data.js carries only metadata and the images are cached separately.
+"""
+
+import base64
+import binascii
+import hashlib
+import mimetypes
+import os
+import re
+import urllib.parse
+
+from .file_ops import remove_stale_files
+
+
+# Directory inside app-files/ holding the extracted assets
+ASSETS_DIRNAME = 'assets'
+
+# data:[<mime type>][;param=value]*[;base64],<payload>
+_DATA_URI_HEADER = (r'data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?P<params>(?:;(?!base64[;,])[\w.+-]+(?:=[^;,"\'\s]*)?)*)'
+                    r'(?P<base64>;base64)?,')
+
+# A data URI inside HTML or CSS: the payload ends at a quote, whitespace, ')' or '<'
+DATA_URI = re.compile(_DATA_URI_HEADER + r'(?P<payload>[^"\'\s)<>]*)', re.IGNORECASE)
+
+# A string that is a data URI as a whole (its payload may hold any character)
+DATA_URI_VALUE = re.compile(r'\s*' + _DATA_URI_HEADER + r'(?P<payload>.*?)\s*', re.IGNORECASE | re.DOTALL)
+
+# Names of the files this module writes: <16 hex digits>.<extension>
+ASSET_FILENAME = re.compile(r'^[0-9a-f]{16}\.[a-z0-9]+$')
+
+# mimetypes has no or odd guesses for some image types
+EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/svg+xml': '.svg',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+    'image/x-icon': '.ico',
+}
+
+
+def _extension(mime):
+    mime = (mime or 'text/plain').lower()
+    return EXTENSIONS.get(mime) or mimetypes.guess_extension(mime) or '.bin'
+
+
+def decode_data_uri(match):
+    """
+    Decode a DATA_URI match.
+
+    Returns:
+        tuple: (payload bytes, file extension), or None if the payload is
+            not valid base64
+    """
+    payload = match.group('payload')
+    if match.group('base64'):
+        try:
+            content = base64.b64decode(''.join(urllib.parse.unquote(payload).split()), validate=True)
+        except (binascii.Error, ValueError):
+            return None
+    else:
+        content = urllib.parse.unquote_to_bytes(payload)
+    return content, _extension(match.group('mime'))
+
+
+class AssetWriter:
+    """Writes each distinct payload once and hands out its URL."""
+
+    def __init__(self, app_files, url_prefix=''):
+        self.assets_dir = os.path.join(app_files, ASSETS_DIRNAME)
+        self.url_prefix = url_prefix
+        self.urls = {}          # (digest, extension) -> URL
+        self.references = 0
+        self.invalid = 0
+        self.inline_bytes = 0
+        self.file_bytes = 0
+
+    def replace(self, match):
+        """re.sub callback: URL of the asset for a data URI match."""
+        if not match.group('payload'):
+            return match.group(0)  # e.g. raw SVG markup that can't be delimited
+        decoded = decode_data_uri(match)
+        if decoded is None:
+            self.invalid += 1
+            return match.group(0)
+        content, extension = decoded
+        self.references += 1
+        self.inline_bytes += len(match.group(0))
+
+        key = (hashlib.sha256(content).hexdigest()[:16], extension)
+        if key not in self.urls:
+            filename = key[0] + key[1]
+            path = os.path.join(self.assets_dir, filename)
+            os.makedirs(self.assets_dir, exist_ok=True)
+            # Same name, same content: an up-to-date file is left untouched
+            if not (os.path.exists(path) and os.path.getsize(path) == len(content)):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+            self.file_bytes += len(content)
+            self.urls[key] = f"{self.url_prefix}{ASSETS_DIRNAME}/{filename}"
+        return self.urls[key]
+
+    def filenames(self):
+        return {digest + extension for digest, extension in self.urls}
+
+
+def _rewrite(value, writer):
+    if isinstance(value, str):
+        if 'data:' not in value.lower():
+            return value
+        match = DATA_URI_VALUE.fullmatch(value)
+        if match:
+            return writer.replace(match)
+        return DATA_URI.sub(writer.replace, value)
+    if isinstance(value, list):
+        return [_rewrite(item, writer) for item in value]
+    if isinstance(value, dict):
+        return {key: _rewrite(item, writer) for key, item in value.items()}
+    return value
+
+
+def remove_stale_assets(app_files, keep):
+    """
+    Delete assets written by earlier builds that are no longer referenced.
+
+    Args:
+        app_files: app-files directory
+        keep: File names still in use
+
+    Returns:
+        int: Number of files removed
+    """
+    return remove_stale_files(os.path.join(app_files, ASSETS_DIRNAME), ASSET_FILENAME, keep)
+
+
+def externalize_data_uris(data, app_files, url_prefix=''):
+    """
+    Move data-URI payloads in tour data to content-addressed files.
+
+    Every string is searched, whether it is a data URI itself (e.g. an icon
+    field) or HTML/CSS containing them (src="data:...", url(data:...)).
+    Identical payloads share one file, assets/<sha256 prefix>.<ext>.
+
+    Args:
+        data: Tour data (not modified)
+        app_files: app-files directory of the tour
+        url_prefix: Prefix making assets/ URLs relative to index.html
+
+    Returns:
+        tuple: (rewritten tour data, stats dict with 'references', 'files',
+            'inline_bytes', 'file_bytes', 'invalid', 'removed')
+    """
+    writer = AssetWriter(app_files, url_prefix)
+    rewritten = _rewrite(data, writer)
+    removed = remove_stale_assets(app_files, writer.filenames())
+    return rewritten, {
+        'references': writer.references,
+        'files': len(writer.urls),
+        'inline_bytes': writer.inline_bytes,
+        'file_bytes': writer.file_bytes,
+        'invalid': writer.invalid,
+        'removed': removed,
+    }
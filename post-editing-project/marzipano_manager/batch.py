@@ -0,0 +1,214 @@
+"""
+Batch processing of many tours across a process pool.
+Runs the TourManager init/build pipeline without the preview server.
+"""
+
+import contextlib
+import glob
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .file_ops import default_jobs
+from .tour_store import DOCUMENT_FILES
+
+
+REPORT_FILENAME = 'batch_report.json'
+LOG_DIRNAME = 'logs'
+
+
+def discover_inputs(patterns):
+    """
+    Expand directories and glob patterns into tour inputs.
+
+    A directory contributes its *.zip files and any config.json found one
+    level down (tour directories exported from the editor). Tour directories
+    one level down without a config.json but with edits saved through the
+    preview server (app-files/tour_data.json) are queued themselves.
+
+    Args:
+        patterns: Iterable of files, directories or glob patterns
+
+    Returns:
+        list: Absolute paths of ZIP and config files and tour directories,
+            without duplicates
+    """
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '*.zip'))
+            configs = glob.glob(os.path.join(pattern, '*', 'config.json'))
+            matches += configs
+            exported = {os.path.dirname(path) for path in configs}
+            for path in glob.glob(os.path.join(pattern, '*', 'app-files', DOCUMENT_FILES['tourData'])):
+                tour_dir = os.path.dirname(os.path.dirname(path))
+                if tour_dir not in exported:
+                    matches.append(tour_dir)
+        else:
+            matches = glob.glob(pattern) or [pattern]
+        for path in sorted(matches):
+            path = os.path.abspath(path)
+            if path not in found:
+                found.append(path)
+    return found
+
+
+def plan_jobs(inputs, output_dir):
+    """
+    Turn input paths into job descriptions.
+
+    ZIP exports are initialised into <output_dir>/<name>_editor; editor
+    configs and tour directories are built into <output_dir>/<tour dir name>.zip.
+
+    Args:
+        inputs: Paths from discover_inputs()
+        output_dir: Directory for tour outputs and logs
+
+    Returns:
+        list: Job dicts (kind, input, output, name, log)
+    """
+    jobs = []
+    names = set()
+    for path in inputs:
+        if path.lower().endswith('.zip'):
+            kind = 'init'
+            name = os.path.splitext(os.path.basename(path))[0]
+        else:
+            kind = 'build'
+            tour_dir = path if os.path.isdir(path) else os.path.dirname(path)
+            name = os.path.basename(tour_dir)
+
+        # Keep outputs of same-named inputs apart
+        unique = name
+        suffix = 2
+        while unique in names:
+            unique = f"{name}-{suffix}"
+            suffix += 1
+        names.add(unique)
+
+        if kind == 'init':
+            output = os.path.join(output_dir, unique + '_editor')
+        else:
+            output = os.path.join(output_dir, unique + '.zip')
+
+        jobs.append({
+            'kind': kind,
+            'input': path,
+            'output': output,
+            'name': unique,
+            'log': os.path.join(output_dir, LOG_DIRNAME, unique + '.log'),
+        })
+    return jobs
+
+
+def run_job(job, jobs_per_tour=1):
+    """
+    Run one tour through the pipeline, logging to its own file.
+
+    Executed in a worker process; never raises, so one broken tour cannot
+    take the batch down.
+
+    Args:
+        job: Job dict from plan_jobs()
+        jobs_per_tour: Worker threads for extraction/compression within the tour
+
+    Returns:
+        dict: The job with status, seconds and error added
+    """
+    from .manager import TourManager
+
+    result = dict(job)
+    start = time.monotonic()
+    cpu_start = time.process_time()
+
+    os.makedirs(os.path.dirname(job['log']), exist_ok=True)
+    with open(job['log'], 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            manager = TourManager()
+            if job['kind'] == 'init':
+                manager.init(job['input'], job['output'], jobs=jobs_per_tour, serve=False)
+            else:
+                manager.build(job['input'], job['output'], jobs=jobs_per_tour)
+            result['status'] = 'ok'
+            result['error'] = None
+        except SystemExit as e:
+            # TourManager reports fatal problems with sys.exit(1)
+            result['status'] = 'failed'
+            result['error'] = f"exited with status {e.code}"
+        except Exception as e:
+            traceback.print_exc()
+            result['status'] = 'failed'
+            result['error'] = f"{type(e).__name__}: {e}"
+
+    result['seconds'] = time.monotonic() - start
+    result['cpu_seconds'] = time.process_time() - cpu_start
+    return result
+
+
+def run_batch(patterns, output_dir, processes=None, jobs_per_tour=None, report_path=None):
+    """
+    Process many tours in parallel.
+
+    Args:
+        patterns: Files, directories or glob patterns of ZIPs/configs
+        output_dir: Directory for outputs, per-tour logs and the report
+        processes: Worker processes (defaults to CPU count)
+        jobs_per_tour: Threads per tour (defaults to CPUs / processes)
+        report_path: Where to write the JSON summary
+            (defaults to <output_dir>/batch_report.json)
+
+    Returns:
+        dict: Summary report
+    """
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = plan_jobs(discover_inputs(patterns), output_dir)
+    if not jobs:
+        print("⚠️  No tour ZIPs or configs found")
+        return {'tours': [], 'succeeded': 0, 'failed': 0, 'seconds': 0.0}
+
+    processes = min(processes or default_jobs(), len(jobs))
+    jobs_per_tour = jobs_per_tour or max(1, default_jobs() // processes)
+
+    print(f"🗂️  Processing {len(jobs)} tours with {processes} processes "
+          f"({jobs_per_tour} threads each)")
+    print(f"📁 Output: {output_dir}")
+
+    start = time.monotonic()
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(run_job, job, jobs_per_tour) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            mark = '✓' if result['status'] == 'ok' else '❌'
+            detail = f" — {result['error']}" if result['error'] else ''
+            print(f"  {mark} [{len(results)}/{len(jobs)}] {result['kind']} {result['name']} "
+                  f"({result['seconds']:.1f}s){detail}")
+
+    results.sort(key=lambda r: r['name'])
+    failed = [r for r in results if r['status'] != 'ok']
+    report = {
+        'tours': results,
+        'succeeded': len(results) - len(failed),
+        'failed': len(failed),
+        'processes': processes,
+        'jobs_per_tour': jobs_per_tour,
+        'seconds': time.monotonic() - start,
+    }
+
+    report_path = report_path or os.path.join(output_dir, REPORT_FILENAME)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n📊 {report['succeeded']} succeeded, {report['failed']} failed "
+          f"in {report['seconds']:.1f}s")
+    for result in failed:
+        print(f"  ❌ {result['name']}: {result['error']} (log: {result['log']})")
+    print(f"📝 Report: {report_path}")
+
+    return report
@@ -0,0 +1,333 @@
+"""
+Bundling and minification of a tour's scripts and stylesheets.
+Consecutive <script>/<link> tags in index.html are concatenated into
+content-hashed bundles; the work directory itself is left untouched.
+"""
+
+import hashlib
+import json
+import posixpath
+import re
+import os
+
+
+# Hex digits of the content hash in bundle names (bundle-1.<hash>.js)
+HASH_LENGTH = 10
+
+MANIFEST_FILENAME = 'bundles.json'
+
+_SCRIPT_TAG = re.compile(r'<script src="([^"]+)"\s*>\s*</script>')
+_STYLESHEET_TAG = re.compile(r'<link rel="stylesheet" href="([^"]+)"\s*/?>')
+
+_JS_FAST = re.compile(r'[A-Za-z0-9_$]+|[ \t\r\f\v]+|\n')
+_JS_WORD = re.compile(r'[A-Za-z0-9_$]')
+
+# Tokens after which a '/' starts a regular expression, not a division
+_REGEX_KEYWORDS = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'case', 'do', 'else', 'yield', 'await',
+}
+
+# A newline after these characters can never end a statement
+_JOIN_AFTER = set('{(,;[')
+
+_CSS_STRING = r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\''
+_CSS_COMMENTS = re.compile(r'(' + _CSS_STRING + r')|/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(r'(' + _CSS_STRING + r')|\s+', re.S)
+_CSS_PUNCT = re.compile(r'(' + _CSS_STRING + r')|\s*([{};,>])\s*|:\s+', re.S)
+_CSS_URL = re.compile(r'url\(\s*(["\']?)([^"\')]+)\1\s*\)', re.I)
+
+
+def _scan_string(text, i):
+    """End index of the string or template literal starting at text[i]."""
+    quote = text[i]
+    i += 1
+    depth = 0
+    while i < len(text):
+        c = text[i]
+        if c == '\\':
+            i += 2
+            continue
+        if quote == '`':
+            if c == '$' and text.startswith('${', i):
+                depth += 1
+                i += 2
+                continue
+            if depth:
+                if c in '"\'`':
+                    i = _scan_string(text, i)
+                    continue
+                if c == '{':
+                    depth += 1
+                elif c == '}':
+                    depth -= 1
+                i += 1
+                continue
+        if c == quote:
+            return i + 1
+        if c == '\n' and quote != '`':
+            raise ValueError("Unterminated string literal")
+        i += 1
+    raise ValueError("Unterminated string literal")
+
+
+def _scan_regex(text, i):
+    """End index of the regular expression literal starting at text[i]."""
+    i += 1
+    in_class = False
+    while i < len(text):
+        c = text[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '\n':
+            raise ValueError("Unterminated regular expression")
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            i += 1
+            while i < len(text) and _JS_WORD.match(text, i):
+                i += 1
+            return i
+        i += 1
+    raise ValueError("Unterminated regular expression")
+
+
+def minify_js(text):
+    """
+    Conservatively minify JavaScript.
+
+    Removes comments (except /*! ... */ notices), indentation and blank
+    lines. Line breaks between statements are kept, so automatic semicolon
+    insertion behaves exactly as in the source.
+
+    Args:
+        text: JavaScript source
+
+    Returns:
+        str: Minified source
+
+    Raises:
+        ValueError: On unterminated strings, comments or regexes
+    """
+    out = []
+    last = ''          # last significant token
+    pending_space = False
+    pending_newline = False
+    i = 0
+    n = len(text)
+
+    def emit(token):
+        nonlocal last, pending_space, pending_newline
+        if out:
+            prev = out[-1][-1]
+            if pending_newline and prev not in _JOIN_AFTER:
+                out.append('\n')
+            elif pending_space or pending_newline:
+                # Keep words apart and avoid gluing "a + +b" into "a++b"
+                if (_JS_WORD.match(prev) and _JS_WORD.match(token[0])) or \
+                        (prev in '+-' and token[0] == prev):
+                    out.append(' ')
+        out.append(token)
+        last = token
+        pending_space = pending_newline = False
+
+    while i < n:
+        match = _JS_FAST.match(text, i)
+        if match:
+            token = match.group()
+            i = match.end()
+            if token == '\n':
+                pending_newline = True
+            elif token[0] in ' \t\r\f\v':
+                pending_space = True
+            else:
+                emit(token)
+            continue
+
+        c = text[i]
+        if c in '"\'`':
+            end = _scan_string(text, i)
+            emit(text[i:end])
+            i = end
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end < 0 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            if end < 0:
+                raise ValueError("Unterminated comment")
+            comment = text[i:end + 2]
+            if comment.startswith('/*!'):
+                emit(comment)
+                pending_newline = True
+            elif '\n' in comment:
+                pending_newline = True
+            else:
+                pending_space = True
+            i = end + 2
+        elif c == '/' and (not last or last in _REGEX_KEYWORDS or
+                           not (_JS_WORD.match(last[-1]) or last[-1] in ')]}"\'`')):
+            end = _scan_regex(text, i)
+            emit(text[i:end])
+            i = end
+        else:
+            emit(c)
+            i += 1
+
+    return ''.join(out) + '\n'
+
+
+def _rewrite_css_urls(text, css_path):
+    """Make relative url()s in a stylesheet relative to index.html."""
+    base = posixpath.dirname(css_path)
+    if not base:
+        return text
+
+    def rewrite(match):
+        url = match.group(2).strip()
+        if re.match(r'^(?:[a-z]+:|/|#)', url, re.I):
+            return match.group(0)
+        return f'url("{posixpath.normpath(posixpath.join(base, url))}")'
+
+    return _CSS_URL.sub(rewrite, text)
+
+
+def minify_css(text):
+    """
+    Minify CSS: drop comments and redundant whitespace.
+
+    Args:
+        text: Stylesheet source
+
+    Returns:
+        str: Minified stylesheet
+    """
+    keep_strings = lambda match: match.group(1) or ''
+    text = _CSS_COMMENTS.sub(keep_strings, text)
+    text = _CSS_SPACE.sub(lambda m: m.group(1) or ' ', text)
+
+    def punct(match):
+        if match.group(1):
+            return match.group(1)
+        if match.group(2):
+            return match.group(2)
+        return ':'
+
+    text = _CSS_PUNCT.sub(punct, text)
+    return text.replace(';}', '}').strip() + '\n'
+
+
+def _find_runs(html, pattern, base_dir, base, exclude_names=(), generated=None):
+    """
+    Group adjacent local asset tags into runs that can be bundled.
+
+    Returns:
+        list: Lists of (match, relative path) for each run
+    """
+    runs = []
+    current = []
+    last_end = None
+    for match in pattern.finditer(html):
+        url = match.group(1)
+        local = not re.match(r'^(?:[a-z]+:|//|/)', url, re.I) and '?' not in url
+        path = posixpath.normpath(url)
+        name = base + path
+        if not local or path.startswith('..') or name in exclude_names or \
+                not (name in (generated or {}) or os.path.isfile(os.path.join(base_dir, *path.split('/')))):
+            if current:
+                runs.append(current)
+            current = []
+            last_end = None
+            continue
+        if current and html[last_end:match.start()].strip():
+            runs.append(current)
+            current = []
+        current.append((match, path))
+        last_end = match.end()
+    if current:
+        runs.append(current)
+    return runs
+
+
+def bundle_assets(work_dir, index_path, exclude_names=None, generated=None):
+    """
+    Build minified, content-hashed bundles for index.html.
+
+    Every run of adjacent local <script src> tags becomes one script
+    bundle and every run of stylesheet <link> tags one CSS bundle, keeping
+    their order. Bundles go next to index.html. Nothing is written to
+    disk: the results are returned as archive entries for the packager.
+
+    Args:
+        work_dir: Tour directory
+        index_path: Path to index.html (in app-files/ or the tour root)
+        exclude_names: Archive names left out of the package, never bundled
+        generated: Archive name -> bytes of files that exist only in the
+            package; bundled instead of their counterparts on disk
+
+    Returns:
+        dict: 'files' (archive name -> bytes: bundles, manifest and the
+            rewritten index.html), 'replaced' (archive names of bundled
+            sources), 'manifest', and before/after bytes and request counts
+    """
+    # Asset URLs are relative to index.html; archive names to the tour directory
+    base_dir = os.path.dirname(os.path.abspath(index_path))
+    base = os.path.relpath(base_dir, os.path.abspath(work_dir)).replace(os.sep, '/')
+    base = '' if base == '.' else base + '/'
+    with open(index_path, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    files = {}
+    manifest = {}
+    replaced = set()
+    replacements = []
+    totals = {'source_bytes': 0, 'bundle_bytes': 0, 'source_requests': 0, 'bundle_requests': 0}
+
+    kinds = [
+        ('css', _STYLESHEET_TAG, '<link rel="stylesheet" href="{}">'),
+        ('js', _SCRIPT_TAG, '<script src="{}"></script>'),
+    ]
+    for ext, pattern, tag in kinds:
+        runs = _find_runs(html, pattern, base_dir, base, exclude_names or (), generated)
+        for number, run in enumerate(runs, 1):
+            parts = []
+            for match, path in run:
+                if base + path in (generated or {}):
+                    source = generated[base + path].decode('utf-8')
+                else:
+                    with open(os.path.join(base_dir, *path.split('/')), 'r', encoding='utf-8') as f:
+                        source = f.read()
+                totals['source_bytes'] += len(source.encode('utf-8'))
+                if ext == 'css':
+                    parts.append(minify_css(_rewrite_css_urls(source, path)))
+                else:
+                    # Keep pre-minified files as they are; terminate each
+                    # file so concatenation cannot merge statements
+                    parts.append(source if path.endswith('.min.js') else minify_js(source))
+                    parts.append(';\n')
+
+            data = ''.join(parts).encode('utf-8')
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+            name = f"bundle-{number}.{digest}.{ext}"
+            files[base + name] = data
+            manifest[name] = {'sources': [path for _, path in run], 'bytes': len(data)}
+            replaced.update(base + path for _, path in run)
+
+            totals['bundle_bytes'] += len(data)
+            totals['source_requests'] += len(run)
+            totals['bundle_requests'] += 1
+
+            replacements.append((run[0][0].start(), run[-1][0].end(), tag.format(name)))
+
+    # Splice from the end so earlier offsets stay valid
+    for start, end, new_tag in sorted(replacements, reverse=True):
+        html = html[:start] + new_tag + html[end:]
+
+    files[base + os.path.basename(index_path)] = html.encode('utf-8')
+    files[base + MANIFEST_FILENAME] = json.dumps(manifest, indent=2).encode('utf-8')
+
+    totals.update({'files': files, 'replaced': replaced, 'manifest': manifest})
+    return totals
@@ -0,0 +1,110 @@
+"""
+Per-scene chunks of tour data for very large tours.
+data.js keeps a small root index (scene names, links and the first scene);
+every other scene's data goes to its own script under app-files/scenes/,
+which the patched index.js loads when the scene is first visited.
+Chunks only go into the package; the tour directory keeps the full data.js
+the editor needs.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+from . import parser
+from .file_ops import remove_stale_files
+
+
+# Directory inside app-files/ holding the chunks
+CHUNKS_DIRNAME = 'scenes'
+
+# Chunk files: <sha256 prefix>.js
+CHUNK_FILENAME = re.compile(r'^[0-9a-f]{16}\.js$')
+
+# Global the chunk scripts register their scene data in
+REGISTRY = 'APP_SCENE_CHUNKS'
+
+# Scenes kept alive within this many links of the current one
+DEFAULT_KEEP_HOPS = 2
+
+
+def chunk_script(scene, compact=False):
+    """JavaScript registering one scene's data when loaded."""
+    registry = f"window.{REGISTRY}"
+    return (f"({registry} = {registry} || {{}})[{json.dumps(scene['id'])}] = "
+            f"{parser.compact_json(scene) if compact else json.dumps(scene, indent=2)};\n")
+
+
+def remove_stale_chunks(app_files, keep):
+    """
+    Delete chunks that earlier builds wrote to the tour directory, except keep.
+
+    Returns:
+        int: Number of files removed
+    """
+    return remove_stale_files(os.path.join(app_files, CHUNKS_DIRNAME), CHUNK_FILENAME, keep)
+
+
+def split_tour_data(data, url_prefix='', keep_hops=DEFAULT_KEEP_HOPS,
+                    compact=False, precision=parser.DEFAULT_PRECISION):
+    """
+    Split tour data into a root index and per-scene chunk scripts.
+
+    The root lists every scene by id and name with the indexes of the
+    scenes it links to, so the runtime can build the scene list, hotspot
+    tooltips and its eviction radius without loading any chunk. The first
+    scene, shown at startup, stays inline. Chunks are content-addressed,
+    app-files/scenes/<sha256 prefix>.js, and returned as archive entries
+    instead of being written to disk.
+
+    Args:
+        data: Tour data (not modified)
+        url_prefix: Prefix making scenes/ URLs relative to index.html
+        keep_hops: Link distance within which created scenes are kept
+        compact: Strip editor-only keys, round view angles and drop
+            whitespace (as in compact data.js)
+        precision: Decimal places kept for view angles in compact mode
+
+    Returns:
+        tuple: (root data for data.js, dict of archive name -> chunk bytes,
+            stats dict with 'chunks', 'chunk_bytes', 'largest_chunk_bytes')
+    """
+    if compact:
+        data = parser.compact_data(data, precision)
+    scenes = data.get('scenes', [])
+    index_of = {scene['id']: index for index, scene in enumerate(scenes)}
+
+    entries = []
+    files = {}
+    stats = {'chunks': 0, 'chunk_bytes': 0, 'largest_chunk_bytes': 0}
+    for index, scene in enumerate(scenes):
+        links = []
+        for hotspot in scene.get('linkHotspots', []):
+            target = index_of.get(hotspot.get('target'))
+            if target is not None and target != index and target not in links:
+                links.append(target)
+
+        if index == 0:
+            entries.append({**scene, 'links': links})
+            continue
+
+        content = chunk_script(scene, compact).encode('utf-8')
+        filename = f"{hashlib.sha256(content).hexdigest()[:16]}.js"
+        arcname = f"app-files/{CHUNKS_DIRNAME}/{filename}"
+        if arcname not in files:
+            files[arcname] = content
+            stats['chunk_bytes'] += len(content)
+            stats['largest_chunk_bytes'] = max(stats['largest_chunk_bytes'], len(content))
+        entries.append({
+            'id': scene['id'],
+            'name': scene.get('name', scene['id']),
+            'links': links,
+            'chunk': f"{url_prefix}{CHUNKS_DIRNAME}/{filename}",
+        })
+
+    stats['chunks'] = len(files)
+    root = {key: value for key, value in data.items() if key != 'scenes'}
+    root['scenes'] = entries
+    root['sceneChunks'] = {'keepHops': keep_hops}
+    return root, files, stats
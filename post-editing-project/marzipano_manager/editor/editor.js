@@ -2,6 +2,67 @@
 (function () {
   "use strict";
 
+  // Save API of the preview server (manage_tour.py init)
+  const SAVE_API_URL = "/__api/tour";
+
+  // Change events of the preview server in watch mode (manage_tour.py serve --watch)
+  const EVENTS_URL = "/__events";
+
+  function escapePointer(key) {
+    return String(key).replace(/~/g, "~0").replace(/\//g, "~1");
+  }
+
+  function isContainer(value) {
+    return value !== null && typeof value === "object";
+  }
+
+  /**
+   * JSON Patch (RFC 6902) turning `before` into `after`
+   */
+  function jsonDiff(before, after, path, ops) {
+    ops = ops || [];
+    if (before === after) return ops;
+
+    if (
+      !isContainer(before) ||
+      !isContainer(after) ||
+      Array.isArray(before) !== Array.isArray(after)
+    ) {
+      ops.push({ op: "replace", path: path, value: after });
+      return ops;
+    }
+
+    if (Array.isArray(after)) {
+      const common = Math.min(before.length, after.length);
+      for (let i = 0; i < common; i++) {
+        jsonDiff(before[i], after[i], path + "/" + i, ops);
+      }
+      for (let i = before.length - 1; i >= after.length; i--) {
+        ops.push({ op: "remove", path: path + "/" + i });
+      }
+      for (let i = before.length; i < after.length; i++) {
+        ops.push({ op: "add", path: path + "/-", value: after[i] });
+      }
+      return ops;
+    }
+
+    Object.keys(before).forEach(function (key) {
+      if (before[key] !== undefined && (!(key in after) || after[key] === undefined)) {
+        ops.push({ op: "remove", path: path + "/" + escapePointer(key) });
+      }
+    });
+    Object.keys(after).forEach(function (key) {
+      if (after[key] === undefined) return;
+      const childPath = path + "/" + escapePointer(key);
+      if (!(key in before) || before[key] === undefined) {
+        ops.push({ op: "add", path: childPath, value: after[key] });
+      } else {
+        jsonDiff(before[key], after[key], childPath, ops);
+      }
+    });
+    return ops;
+  }
+
   window.MarzipanoEditor = {
     data: null,
     viewer: null,
@@ -15,6 +76,11 @@
     overlayLayer: null,
     controllingOverlay: false, // false = control current scene, true = control overlay
     viewConfig: {}, // Stores view configurations per scene
+    savedState: null, // Last state the server acknowledged (null: no save API)
+    revision: 0,
+    saveInFlight: false,
+    saveRequest: null,
+    savePending: false,
 
     init: function (viewer, scenes, data) {
       this.viewer = viewer;
@@ -32,6 +98,8 @@
       this.loadSceneList();
       this.updateSceneStatuses();
       this.listenToSceneChanges();
+      this.connectSaveApi();
+      this.connectLiveReload();
 
       console.log("Marzipano Editor initialized with", scenes.length, "scenes");
       console.log("📊 View configuration:", this.viewConfig);
@@ -764,20 +832,170 @@
       alert("Entry angle set to: " + params.yaw.toFixed(3));
     },
 
+    connectSaveApi: function () {
+      const self = this;
+      fetch(SAVE_API_URL, { cache: "no-store" })
+        .then(function (response) {
+          if (!response.ok) throw new Error("HTTP " + response.status);
+          return response.json();
+        })
+        .then(function (state) {
+          // Continue from the saved state unless edits were made meanwhile
+          if (!self.savePending && state.tourData && state.tourData.scenes) {
+            self.data = state.tourData;
+            Object.keys(state.viewConfig || {}).forEach(function (sceneId) {
+              self.viewConfig[sceneId] = state.viewConfig[sceneId];
+            });
+            self.loadSceneList();
+            self.updateSceneStatuses();
+          }
+          // A copy: edits mutate self.data and self.viewConfig in place
+          self.savedState = JSON.parse(JSON.stringify({
+            tourData: state.tourData,
+            viewConfig: state.viewConfig,
+          }));
+          self.revision = state.revision;
+          console.log("💾 Connected to save API at revision", state.revision);
+          if (self.savePending) {
+            self.savePending = false;
+            self.saveChanges();
+          }
+        })
+        .catch(function (error) {
+          console.warn("⚠️ Save API unavailable, saving to localStorage:", error);
+        });
+    },
+
+    connectLiveReload: function () {
+      // Without watch mode the server answers 404, which ends the stream;
+      // a dropped connection (server restart) is retried by EventSource
+      if (!window.EventSource) return;
+      const self = this;
+      const source = new EventSource(EVENTS_URL);
+
+      source.addEventListener("reload", function (event) {
+        console.log("🔄 Changed on disk:", JSON.parse(event.data).files.join(", "));
+        source.close();
+        window.location.reload();
+      });
+
+      source.addEventListener("view-config", function (event) {
+        const update = JSON.parse(event.data);
+        self.viewConfig = update.viewConfig;
+        if (window.loadViewConfig) window.loadViewConfig(update.viewConfig);
+        if (self.savedState) {
+          self.savedState.viewConfig = JSON.parse(JSON.stringify(update.viewConfig));
+          self.revision = update.revision;
+        }
+        console.log("🔄 View config updated from disk");
+      });
+
+      source.addEventListener("stylesheet", function (event) {
+        JSON.parse(event.data).files.forEach(function (file) {
+          document.querySelectorAll('link[rel="stylesheet"]').forEach(function (link) {
+            const href = link.getAttribute("href").split("?")[0];
+            if (href === file || href.endsWith("/" + file)) {
+              link.setAttribute("href", href + "?v=" + Date.now());
+            }
+          });
+        });
+      });
+    },
+
     updateData: function () {
       // This triggers instant update to data structure
       console.log("Data updated");
 
-      // Store in localStorage for persistence
+      if (this.savedState) {
+        this.saveChanges();
+      } else {
+        this.savePending = true;
+        this.saveLocally();
+      }
+    },
+
+    saveLocally: function () {
+      // Fallback when the editor is not served by manage_tour.py
       const saveData = {
         tourData: this.data,
         viewConfig: this.viewConfig
       };
-      localStorage.setItem("marzipano_tour_data", JSON.stringify(saveData));
-      console.log("💾 Saved to localStorage");
+      try {
+        localStorage.setItem("marzipano_tour_data", JSON.stringify(saveData));
+        console.log("💾 Saved to localStorage");
+      } catch (error) {
+        console.error("❌ Could not save to localStorage:", error);
+      }
+    },
+
+    /**
+     * Send the changes since the last acknowledged save as a JSON Patch.
+     * One request is in flight at a time; edits made meanwhile are sent
+     * together once it completes.
+     */
+    saveChanges: function () {
+      const self = this;
+      if (this.saveInFlight) {
+        this.savePending = true;
+        return this.saveRequest;
+      }
+
+      const current = { tourData: this.data, viewConfig: this.viewConfig };
+      const ops = jsonDiff(this.savedState, current, "");
+      if (!ops.length) return Promise.resolve();
+
+      const snapshot = JSON.parse(JSON.stringify(current));
+      this.saveInFlight = true;
+      this.saveRequest = fetch(SAVE_API_URL, {
+        method: "PATCH",
+        headers: {
+          "Content-Type": "application/json-patch+json",
+          "If-Match": '"' + this.revision + '"',
+        },
+        body: JSON.stringify(ops),
+      })
+        .then(function (response) {
+          return response.json().then(function (body) {
+            if (!response.ok) throw new Error(body.error || "HTTP " + response.status);
+            return body;
+          });
+        })
+        .then(function (body) {
+          self.savedState = snapshot;
+          self.revision = body.revision;
+          console.log("💾 Saved", ops.length, "changes (revision " + body.revision + ")");
+        })
+        .catch(function (error) {
+          console.error("❌ Save failed, keeping a copy in localStorage:", error);
+          self.saveLocally();
+        })
+        .then(function () {
+          self.saveInFlight = false;
+          if (self.savePending) {
+            self.savePending = false;
+            return self.saveChanges();
+          }
+        });
+      return this.saveRequest;
     },
 
     saveTourData: function () {
+      if (this.savedState) {
+        // Flush pending changes and write tour_data.json / view_config.json
+        this.saveChanges()
+          .then(function () {
+            return fetch(SAVE_API_URL + "/compact", { method: "POST" });
+          })
+          .then(function (response) {
+            if (!response.ok) throw new Error("HTTP " + response.status);
+            alert("Tour saved. Build it with: manage_tour.py build <tour directory>");
+          })
+          .catch(function (error) {
+            alert("Saving failed: " + error.message);
+          });
+        return;
+      }
+
       // Prepare export data with view config
       const exportData = {
         tourData: this.data,
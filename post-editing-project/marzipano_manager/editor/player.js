@@ -10,7 +10,8 @@
       scenes.forEach(function (sceneObj, index) {
         var sceneData = data.scenes[index];
 
-        sceneData.linkHotspots.forEach(function (hotspot) {
+        // Root entries of chunked tour data carry no hotspots
+        (sceneData.linkHotspots || []).forEach(function (hotspot) {
           // Find target scene
           var targetIndex = data.scenes.findIndex(
             (s) => s.id === hotspot.target
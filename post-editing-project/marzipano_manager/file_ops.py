@@ -5,24 +5,170 @@ Handles ZIP extraction, file copying, and packaging.
 
 import os
 import shutil
+import sys
+import threading
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 
-def extract_zip(zip_path, output_dir):
+# Copy buffer used when streaming archive members to disk
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Per-tour directory for derived caches (e.g. gzip variants); never packaged
+WORK_CACHE_DIR = '.cache'
+
+
+class ProgressReporter:
+    """Thread-safe progress line for long-running file operations."""
+
+    def __init__(self, label, total_files, total_bytes, enabled=True, interval=0.5):
+        self.label = label
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.enabled = enabled
+        self.interval = interval
+        self.files = 0
+        self.bytes = 0
+        self.start_time = time.monotonic()
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, files=0, nbytes=0):
+        """Record finished work and redraw the progress line if due."""
+        with self._lock:
+            self.files += files
+            self.bytes += nbytes
+            now = time.monotonic()
+            if self.enabled and now - self._last_report >= self.interval:
+                self._last_report = now
+                self._print(end='\r')
+
+    def finish(self):
+        """Print the final progress line and return summary statistics."""
+        elapsed = time.monotonic() - self.start_time
+        if self.enabled:
+            self._print(end='\n')
+        return {
+            'files': self.files,
+            'bytes': self.bytes,
+            'seconds': elapsed,
+        }
+
+    def _print(self, end):
+        elapsed = max(time.monotonic() - self.start_time, 1e-6)
+        rate = self.bytes / elapsed / (1024 * 1024)
+        sys.stdout.write(
+            f"  ⏳ {self.label}: {self.files}/{self.total_files} files, "
+            f"{self.bytes / (1024 * 1024):.1f}/{self.total_bytes / (1024 * 1024):.1f} MB "
+            f"({rate:.1f} MB/s){end}"
+        )
+        sys.stdout.flush()
+
+
+def default_jobs():
+    """Default worker count for parallel file operations."""
+    return os.cpu_count() or 1
+
+
+def member_target_path(output_dir, member_name):
+    """
+    Resolve the destination path of a ZIP member inside output_dir.
+    
+    Mirrors the sanitising done by ZipFile.extractall: absolute paths,
+    drive letters and '..' components are dropped.
+    
+    Args:
+        output_dir: Extraction root
+        member_name: Name of the member inside the archive
+        
+    Returns:
+        str: Absolute destination path
+    """
+    arcname = member_name.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    parts = [p for p in arcname.split(os.path.sep) if p not in ('', os.path.curdir, os.path.pardir)]
+    return os.path.join(os.path.abspath(output_dir), *parts)
+
+
+def extract_zip(zip_path, output_dir, jobs=None, progress=True, include=None):
     """
     Extract ZIP archive to output directory.
     
+    Members are streamed to disk in fixed-size chunks by a pool of worker
+    threads, each reading through its own handle on the archive. Inflating
+    and file writes release the GIL, so threads scale across cores and disks.
+    
     Args:
         zip_path: Path to ZIP file
         output_dir: Directory to extract to
+        jobs: Number of worker threads (defaults to CPU count)
+        progress: Whether to print progress and throughput
+        include: Optional predicate on member names; others are skipped
+        
+    Returns:
+        dict: Extraction statistics (files, bytes, seconds)
     """
     if not os.path.exists(zip_path):
         raise FileNotFoundError(f"ZIP file not found: {zip_path}")
     
     os.makedirs(output_dir, exist_ok=True)
+    jobs = jobs or default_jobs()
     
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(output_dir)
+        members = zip_ref.infolist()
+    
+    if include is not None:
+        members = [info for info in members if include(info.filename)]
+    
+    # Create the directory tree up front so workers never race on makedirs
+    directories = set()
+    files = []
+    for info in members:
+        target = member_target_path(output_dir, info.filename)
+        if info.is_dir():
+            directories.add(target)
+        else:
+            directories.add(os.path.dirname(target))
+            files.append((info, target))
+    for directory in sorted(directories):
+        os.makedirs(directory, exist_ok=True)
+    
+    reporter = ProgressReporter(
+        "Extracting", len(files), sum(info.file_size for info, _ in files), enabled=progress
+    )
+    
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+    
+    def extract_member(item):
+        info, target = item
+        zip_handle = getattr(local, 'zip_handle', None)
+        if zip_handle is None:
+            zip_handle = local.zip_handle = zipfile.ZipFile(zip_path, 'r')
+            with handles_lock:
+                handles.append(zip_handle)
+        with zip_handle.open(info) as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        reporter.update(files=1, nbytes=info.file_size)
+    
+    try:
+        if jobs <= 1:
+            for item in files:
+                extract_member(item)
+        else:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                # Consume results so the first worker error propagates
+                for _ in executor.map(extract_member, files):
+                    pass
+    finally:
+        for zip_handle in handles:
+            zip_handle.close()
+    
+    return reporter.finish()
 
 
 def copy_editor_files(editor_dir, target_dir):
@@ -45,41 +191,72 @@ def copy_editor_files(editor_dir, target_dir):
             raise FileNotFoundError(f"Editor file not found: {src}")
 
 
-def remove_editor_files(tour_dir):
+# Files init adds to app-files/ for the editor; never part of a built tour
+EDITOR_FILES = ('editor.js', 'editor.css', 'tour_data.json')
+
+
+def editor_archive_names():
+    """Archive names of the editor files, for excluding them from a build."""
+    return {f"app-files/{name}" for name in EDITOR_FILES}
+
+
+def remove_stale_files(directory, pattern, keep):
     """
-    Remove editor files from tour directory.
+    Delete files a build wrote earlier that it no longer writes.
+    
+    Only names matching pattern are touched; the directory is removed
+    once it is empty.
     
     Args:
-        tour_dir: Tour directory path
+        directory: Directory holding the generated files
+        pattern: Compiled regex matching the generated file names
+        keep: File names still in use
+        
+    Returns:
+        int: Number of files removed
     """
-    app_files_dir = os.path.join(tour_dir, "app-files")
-    
-    files_to_remove = [
-        os.path.join(app_files_dir, "editor.js"),
-        os.path.join(app_files_dir, "editor.css"),
-        os.path.join(app_files_dir, "tour_data.json")
-    ]
-    
-    for file_path in files_to_remove:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    for name in os.listdir(directory):
+        if pattern.match(name) and name not in keep:
+            os.remove(os.path.join(directory, name))
+            removed += 1
+    if not os.listdir(directory):
+        os.rmdir(directory)
+    return removed
 
 
-def create_zip(source_dir, output_zip):
+def create_zip(source_dir, output_zip, jobs=None, level=None, progress=True, incremental=True,
+               source_zip=None, exclude_names=None, generated=None):
     """
     Create ZIP archive of directory.
     
+    Already-compressed assets (tiles, images) are stored and text assets
+    are deflated in parallel; see packager for the compression policy.
+    A content-hash manifest is kept next to the archive so that the next
+    build can copy unchanged members over without recompressing them.
+    
     Args:
         source_dir: Directory to archive
         output_zip: Output ZIP filename
+        jobs: Number of compression workers (defaults to CPU count)
+        level: Deflate level for compressible members (defaults to 6)
+        progress: Whether to print progress and throughput
+        incremental: Whether to reuse unchanged members from the previous build
+        source_zip: Optional source ZIP that source_dir is an overlay of
+        exclude_names: Optional archive names to leave out
+        generated: Optional dict of archive name -> bytes to add or replace
+        
+    Returns:
+        dict: Packaging statistics
     """
-    output_path = os.path.abspath(output_zip)
+    from . import packager
     
-    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(source_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, source_dir)
-                zipf.write(file_path, arcname)
-
-
+    if level is None:
+        level = packager.DEFAULT_COMPRESSION_LEVEL
+    
+    return packager.build_archive(source_dir, output_zip, jobs=jobs, level=level,
+                                  progress=progress, incremental=incremental,
+                                  source_zip=source_zip, exclude_names=exclude_names,
+                                  generated=generated)
@@ -1,148 +1,289 @@
 """
 HTML patching utilities for injecting editor code.
+
+The patches work on index.html content and are idempotent, so they can be
+registered in a PatchPipeline and applied in a single pass; the
+file-level functions below wrap them for one-off use.
 """
 
-import os
+import re
 
+from . import parser
+from .patch_pipeline import APPLIED, NOT_APPLICABLE, PatchNotApplicable, PatchPipeline, print_report
 
-def patch_index_html(index_path, editor_init_template_path):
+
+# Inlined view configuration, regenerated by init and build
+VIEW_CONFIG_SCRIPT = re.compile(r'<script id="view-config">.*?</script>', re.DOTALL)
+
+# Loader that fetched view_config.json in tours initialized by older versions
+LEGACY_VIEW_CONFIG_LOADER = re.compile(
+    r'<script>\s*// Load view configuration\s*fetch\(.*?</script>', re.DOTALL)
+
+# editor.js and the inline script initializing it (other tags may sit before it)
+EDITOR_INIT_SCRIPT = re.compile(r'(<script src="[^"]*editor\.js"></script>\s*)<script>.*?</script>', re.DOTALL)
+INLINE_SCRIPT = re.compile(r'<script>.*?</script>', re.DOTALL)
+
+TRANSITION_RUNTIME_TAG = re.compile(r'<script src="(?:app-files/)?transition_runtime\.js"></script>')
+
+PLAYER_INIT = '''
+  <script src="app-files/player.js"></script>
+  <script>
+    // Initialize player once index.js has shown the first scene
+    (function() {
+      function initialize() {
+        MarzipanoPlayer.init(window.viewer, window.scenes, window.APP_DATA);
+      }
+      if (window.marzipanoReady) {
+        initialize();
+      } else {
+        window.addEventListener("marzipano-ready", initialize, { once: true });
+      }
+    })();
+  </script>
+'''
+
+
+def path_prefix(index_path):
     """
-    Patch index.html to include editor files and initialization.
-    
+    Prefix of app-files assets as seen from index.html.
+
     Args:
-        index_path: Path to index.html
-        editor_init_template_path: Path to editor initialization template
+        index_path: Path to index.html (in app-files/ or the tour root)
     """
-    with open(index_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Add lang="en" to prevent auto-translation
+    return '' if 'app-files' in index_path else 'app-files/'
+
+
+def add_lang(content):
+    """Add lang="en" to prevent auto-translation."""
     if '<html>' in content and 'lang=' not in content:
         content = content.replace('<html>', '<html lang="en">')
-    
-    # Determine if index.html is in app-files/ or root
-    # This affects the path to editor files
-    is_in_app_files = 'app-files' in index_path
-    editor_path_prefix = '' if is_in_app_files else 'app-files/'
-    
-    # Add editor CSS before </head>
-    css_link = f'<link rel="stylesheet" href="{editor_path_prefix}editor.css">'
-    if css_link not in content and 'editor.css' not in content:
-        content = content.replace(
-            '</head>',
-            f'  {css_link}\n</head>'
-        )
-    
-    # Expose viewer and scenes globally for editor
+    return content
+
+
+def add_editor_css(content, prefix=''):
+    """Add the editor stylesheet before </head>."""
+    css_link = f'<link rel="stylesheet" href="{prefix}editor.css">'
+    if css_link in content or 'editor.css' in content:
+        return content
+    if '</head>' not in content:
+        raise PatchNotApplicable("no </head> tag")
+    return content.replace('</head>', f'  {css_link}\n</head>', 1)
+
+
+def expose_globals(content):
+    """Expose viewer and scenes globally when they are created inline."""
     # Find where viewer and scenes are created and expose them
     if 'window.viewer = viewer;' not in content:
         content = content.replace(
             'var viewer = new Marzipano.Viewer(',
             'var viewer = window.viewer = new Marzipano.Viewer('
         )
-    
+
     if 'window.scenes = scenes;' not in content:
         # Add after scenes array is created
         content = content.replace(
             'var scenes = data.scenes.map(',
             'var scenes = window.scenes = data.scenes.map('
         )
-    
-    # Add editor JS and initialization before </body>
-    js_script = f'<script src="{editor_path_prefix}editor.js"></script>'
-    if js_script not in content and 'editor.js' not in content:
-        with open(editor_init_template_path, 'r', encoding='utf-8') as f:
-            editor_init = f.read()
-        
-        # Replace placeholder in template with correct path
-        editor_init = editor_init.replace('app-files/editor.js', f'{editor_path_prefix}editor.js')
-        
-        content = content.replace('</body>', editor_init + '\n</body>')
-    
-    with open(index_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    return content
+
+
+def add_editor_init(content, editor_init, prefix=''):
+    """
+    Add editor.js and its initialization script before </body>.
+
+    Args:
+        content: index.html content
+        editor_init: Content of templates/editor_init.html
+        prefix: Path prefix of app-files assets
+    """
+    js_script = f'<script src="{prefix}editor.js"></script>'
+    if js_script in content or 'editor.js' in content:
+        return content
+    if '</body>' not in content:
+        raise PatchNotApplicable("no </body> tag")
+
+    # Replace placeholder in template with correct path
+    editor_init = editor_init.replace('app-files/editor.js', f'{prefix}editor.js')
+    return content.replace('</body>', editor_init + '\n</body>', 1)
+
+
+def refresh_editor_init(content, editor_init, prefix=''):
+    """
+    Replace the editor initialization script with the template's current one.
+
+    Adds editor.js and the script if the page has neither.
+
+    Args:
+        content: index.html content
+        editor_init: Content of templates/editor_init.html
+        prefix: Path prefix of app-files assets
+    """
+    match = EDITOR_INIT_SCRIPT.search(content)
+    template_script = INLINE_SCRIPT.search(editor_init)
+    if not match or not template_script:
+        return add_editor_init(content, editor_init, prefix)
+    script = template_script.group(0)
+    return content[:match.start()] + match.group(1) + script + content[match.end():]
+
+
+def add_player(content):
+    """Add player.js and its initialization script before </body>."""
+    if '<script src="app-files/player.js"></script>' in content:
+        return content
+    return content.replace('</body>', PLAYER_INIT + '</body>')
+
+
+def add_transition_runtime(content, prefix=''):
+    """Load the transition runtime before editor.js (or before </body>)."""
+    transition_script = f'<script src="{prefix}transition_runtime.js"></script>'
+    if transition_script in content or 'transition_runtime.js' in content:
+        return content
+
+    editor_script = f'<script src="{prefix}editor.js"></script>'
+    if editor_script in content:
+        return content.replace(editor_script, transition_script + '\n  ' + editor_script)
+    # Fallback: inject before </body>
+    return content.replace('</body>', transition_script + '\n</body>')
+
+
+def _view_config_script(view_config):
+    """<script> element handing the view configuration to the runtime."""
+    # Keep "</script>" out of the inline script
+    payload = parser.compact_json(view_config).replace('</', '<\\/')
+    return f'<script id="view-config">\n    window.loadViewConfig({payload});\n  </script>'
+
+
+def set_view_config(content, view_config):
+    """
+    Embed the view configuration in index.html content.
+
+    Replaces a previously inlined configuration or the fetch-based loader
+    of older tours; otherwise it is added after the transition runtime.
+    """
+    script = _view_config_script(view_config)
+    if VIEW_CONFIG_SCRIPT.search(content):
+        return VIEW_CONFIG_SCRIPT.sub(lambda _: script, content, count=1)
+    if LEGACY_VIEW_CONFIG_LOADER.search(content):
+        return LEGACY_VIEW_CONFIG_LOADER.sub(lambda _: script, content, count=1)
+
+    match = TRANSITION_RUNTIME_TAG.search(content)
+    if not match:
+        raise PatchNotApplicable("transition runtime script tag not found")
+    return content[:match.end()] + '\n  ' + script + content[match.end():]
+
+
+def add_tile_map(content, prefix=''):
+    """Load tile_map.js (duplicate tile aliases) before index.js."""
+    if 'tile_map.js' in content:
+        return content
+    index_script = f'<script src="{prefix}index.js"></script>'
+    if index_script not in content:
+        raise PatchNotApplicable("index.js script tag not found")
+    return content.replace(
+        index_script,
+        f'<script src="{prefix}tile_map.js"></script>\n{index_script}'
+    )
+
+
+def editor_patches(pipeline, editor_init):
+    """
+    Register the editor patches for index.html, in order.
+
+    Args:
+        pipeline: PatchPipeline for index.html
+        editor_init: Content of templates/editor_init.html
+    """
+    prefix = path_prefix(pipeline.path)
+    pipeline.register('lang attribute', add_lang)
+    pipeline.register('editor stylesheet', add_editor_css, prefix)
+    pipeline.register('global viewer and scenes', expose_globals)
+    pipeline.register('editor script', add_editor_init, editor_init, prefix)
+    return pipeline
+
+
+def transition_patches(pipeline, view_config):
+    """
+    Register the transition runtime and inlined view config patches.
+
+    Args:
+        pipeline: PatchPipeline for index.html
+        view_config: View configuration to inline
+    """
+    pipeline.register('transition runtime', add_transition_runtime, path_prefix(pipeline.path))
+    pipeline.register('view config', set_view_config, view_config)
+    return pipeline
+
+
+def _patch_file(index_path, name, patch, *args):
+    report = PatchPipeline(index_path).register(name, patch, *args).run()
+    print_report([entry for entry in report if entry['status'] == NOT_APPLICABLE])
+    return any(entry['status'] == APPLIED for entry in report)
+
+
+def patch_index_html(index_path, editor_init_template_path):
+    """
+    Patch index.html to include editor files and initialization.
+
+    Args:
+        index_path: Path to index.html
+        editor_init_template_path: Path to editor initialization template
+
+    Returns:
+        list: Patch report
+    """
+    with open(editor_init_template_path, 'r', encoding='utf-8') as f:
+        editor_init = f.read()
+    return editor_patches(PatchPipeline(index_path), editor_init).run()
 
 
 def patch_for_player(index_path, player_js_path):
     """
     Patch index.html to include player for final build.
-    
+
     Args:
         index_path: Path to index.html
         player_js_path: Path to player.js (relative to app-files)
     """
-    with open(index_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Add player JS before </body>
-    if '<script src="app-files/player.js"></script>' not in content:
-        player_init = '''
-  <script src="app-files/player.js"></script>
-  <script>
-    // Initialize player after Marzipano loads
-    (function() {
-      setTimeout(function() {
-        if (window.viewer && window.scenes && window.APP_DATA) {
-          MarzipanoPlayer.init(window.viewer, window.scenes, window.APP_DATA);
-        }
-      }, 500);
-    })();
-  </script>
-'''
-        content = content.replace('</body>', player_init + '</body>')
-    
-    with open(index_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    return _patch_file(index_path, 'player script', add_player)
 
 
-def inject_transition_system(index_path):
+def inline_view_config(index_path, view_config):
+    """
+    Embed the view configuration in index.html.
+
+    Args:
+        index_path: Path to index.html
+        view_config: View configuration dictionary
+
+    Returns:
+        bool: Whether index.html changed
+    """
+    return _patch_file(index_path, 'view config', set_view_config, view_config)
+
+
+def inject_transition_system(index_path, view_config=None):
     """
     Inject transition system scripts into index.html.
-    
+
+    The view configuration is inlined rather than fetched, so the runtime
+    has it without an extra request.
+
     Args:
         index_path: Path to index.html
+        view_config: View configuration to inline (defaults to empty)
+
+    Returns:
+        list: Patch report
     """
-    with open(index_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Determine path prefix
-    is_in_app_files = 'app-files' in index_path
-    path_prefix = '' if is_in_app_files else 'app-files/'
-    
-    # Add transition runtime before editor.js
-    transition_script = f'<script src="{path_prefix}transition_runtime.js"></script>'
-    view_config_loader = f'''
-  <script>
-    // Load view configuration
-    fetch('{path_prefix}view_config.json')
-      .then(response => response.json())
-      .then(config => {{
-        if (window.loadViewConfig) {{
-          window.loadViewConfig(config);
-        }} else {{
-          window.addEventListener('load', function() {{
-            setTimeout(function() {{
-              if (window.loadViewConfig) window.loadViewConfig(config);
-            }}, 100);
-          }});
-        }}
-      }})
-      .catch(err => console.error('Failed to load view config:', err));
-  </script>
-'''
-    
-    if transition_script not in content and 'transition_runtime.js' not in content:
-        # Inject before editor.js
-        if f'<script src="{path_prefix}editor.js"></script>' in content:
-            content = content.replace(
-                f'<script src="{path_prefix}editor.js"></script>',
-                transition_script + '\n  ' + view_config_loader + '\n  ' + f'<script src="{path_prefix}editor.js"></script>'
-            )
-        else:
-            # Fallback: inject before </body>
-            content = content.replace('</body>', transition_script + '\n  ' + view_config_loader + '\n</body>')
-    
-    with open(index_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    return transition_patches(PatchPipeline(index_path), view_config or {}).run()
+
 
+def inject_tile_map(index_path):
+    """
+    Load tile_map.js (duplicate tile aliases) before index.js.
 
+    Args:
+        index_path: Path to index.html
+    """
+    return _patch_file(index_path, 'tile map', add_tile_map, path_prefix(index_path))
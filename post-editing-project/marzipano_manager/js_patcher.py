@@ -1,113 +1,38 @@
 """
 Patches Marzipano's index.js to expose viewer and scenes globally.
+
+The patches work on index.js content and are idempotent, so they can be
+registered in a PatchPipeline and applied in a single pass; the
+file-level functions below wrap them for one-off use.
 """
 
 import os
+import re
 
+from .patch_pipeline import APPLIED, PatchNotApplicable, PatchPipeline, print_report
 
-def patch_index_js(work_dir):
-    """
-    Patch index.js to expose viewer and scenes as global variables.
-    
-    Args:
-        work_dir: Tour working directory
-    """
-    index_js_path = os.path.join(work_dir, "app-files", "index.js")
-    
-    if not os.path.exists(index_js_path):
-        print(f"⚠️  Warning: index.js not found at {index_js_path}")
-        return False
-    
-    with open(index_js_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    modified = False
-    
-    # Expose viewer globally
-    if 'window.viewer = viewer;' not in content:
-        # Find "var viewer = new Marzipano.Viewer" and make it global
-        if 'var viewer = new Marzipano.Viewer(' in content:
-            content = content.replace(
-                'var viewer = new Marzipano.Viewer(',
-                'var viewer = window.viewer = new Marzipano.Viewer('
-            )
-            modified = True
-            print("  ✓ Exposed viewer globally")
-    
-    # Expose scenes globally
-    if 'window.scenes = scenes;' not in content:
-        # Find "var scenes = data.scenes.map" and make it global
-        if 'var scenes = data.scenes.map(' in content:
-            content = content.replace(
-                'var scenes = data.scenes.map(',
-                'var scenes = window.scenes = data.scenes.map('
-            )
-            modified = True
-            print("  ✓ Exposed scenes globally")
-    
-    # Add initialization complete flag
-    if 'window.marzipanoReady = true;' not in content:
-        # Add at the end of the file, before any closing braces
-        # Find the switchScene call for the first scene (typical initialization complete point)
-        if 'switchScene(scenes[0]);' in content:
-            content = content.replace(
-                'switchScene(scenes[0]);',
-                'switchScene(scenes[0]);\n  window.marzipanoReady = true;\n  console.log("Marzipano initialization complete, viewer and scenes exposed globally");'
-            )
-            modified = True
-            print("  ✓ Added initialization complete flag")
-    
-    if modified:
-        with open(index_js_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        return True
-    else:
-        print("  ℹ️  index.js already patched")
-        return False
 
+READY_FLAG = 'window.marzipanoReady = true;'
 
-def patch_for_transitions(work_dir):
-    """
-    Patch index.js to use seamless transitions instead of direct scene switching.
-    
-    Args:
-        work_dir: Tour working directory
-    """
-    index_js_path = os.path.join(work_dir, "app-files", "index.js")
-    
-    if not os.path.exists(index_js_path):
-        print(f"⚠️  Warning: index.js not found at {index_js_path}")
-        return False
-    
-    with open(index_js_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    modified = False
-    
-    # Track current scene for conditional views
-    if 'window.setCurrentScene' not in content and 'function switchScene(scene)' in content:
-        # Add tracking at the beginning of switchScene
-        content = content.replace(
-            'function switchScene(scene) {',
-            '''function switchScene(scene) {
+# Fired once viewer, scenes and the first scene are in place
+READY_EVENT_DISPATCH = (
+    'window.dispatchEvent(new CustomEvent("marzipano-ready", '
+    '{ detail: { viewer: viewer, scenes: scenes, data: data } }));'
+)
+
+SCENE_TRACKING = '''function switchScene(scene) {
     // Track current scene for conditional views
     if (window.setCurrentScene) {
       window.setCurrentScene(scene.data.id);
     }
 '''
-        )
-        modified = True
-        print("  ✓ Added scene tracking")
-    
-    # Replace hotspot click handler with seamless transition
-    if 'performSeamlessTransition' not in content:
-        # Find the link hotspot click handler
-        # Original: wrapper.addEventListener('click', function() { switchScene(findSceneById(hotspot.target)); });
-        old_handler = '''wrapper.addEventListener('click', function() {
+
+# Original: wrapper.addEventListener('click', function() { switchScene(findSceneById(hotspot.target)); });
+LINK_HANDLER = '''wrapper.addEventListener('click', function() {
       switchScene(findSceneById(hotspot.target));
     });'''
-        
-        new_handler = '''wrapper.addEventListener('click', function() {
+
+SEAMLESS_LINK_HANDLER = '''wrapper.addEventListener('click', function() {
       console.log('🔘 Hotspot clicked! Target:', hotspot.target);
       
       var targetScene = findSceneById(hotspot.target);
@@ -142,18 +67,427 @@ def patch_for_transitions(work_dir):
         switchScene(targetScene);
       }
     });'''
-        
-        if old_handler in content:
-            content = content.replace(old_handler, new_handler)
-            modified = True
-            print("  ✓ Replaced hotspot handler with seamless transitions")
+
+
+def expose_viewer(content):
+    """Make the viewer a global (window.viewer)."""
+    if 'window.viewer = viewer;' in content or 'window.viewer = new Marzipano.Viewer(' in content:
+        return content
+    if 'var viewer = new Marzipano.Viewer(' not in content:
+        raise PatchNotApplicable("viewer creation not found")
+    return content.replace(
+        'var viewer = new Marzipano.Viewer(',
+        'var viewer = window.viewer = new Marzipano.Viewer('
+    )
+
+
+def expose_scenes(content):
+    """Make the scene list a global (window.scenes)."""
+    if 'window.scenes = scenes;' in content or 'window.scenes = data.scenes.map(' in content:
+        return content
+    if 'var scenes = data.scenes.map(' not in content:
+        raise PatchNotApplicable("scene list creation not found")
+    return content.replace(
+        'var scenes = data.scenes.map(',
+        'var scenes = window.scenes = data.scenes.map('
+    )
+
+
+def add_ready_signal(content):
+    """
+    Signal readiness where the first scene is shown; injected scripts wait
+    for the marzipano-ready event instead of polling.
+    """
+    if READY_EVENT_DISPATCH in content:
+        return content
+    if READY_FLAG in content:
+        # Tours patched before the ready event existed
+        return content.replace(READY_FLAG, READY_FLAG + '\n  ' + READY_EVENT_DISPATCH, 1)
+    if 'switchScene(scenes[0]);' not in content:
+        raise PatchNotApplicable("initial switchScene(scenes[0]) call not found")
+    return content.replace(
+        'switchScene(scenes[0]);',
+        'switchScene(scenes[0]);\n  ' + READY_FLAG + '\n  ' + READY_EVENT_DISPATCH +
+        '\n  console.log("Marzipano initialization complete, viewer and scenes exposed globally");'
+    )
+
+
+def add_scene_tracking(content):
+    """Report every scene switch to the transition runtime."""
+    if 'window.setCurrentScene' in content:
+        return content
+    if 'function switchScene(scene) {' not in content:
+        raise PatchNotApplicable("switchScene function not found")
+    return content.replace('function switchScene(scene) {', SCENE_TRACKING)
+
+
+def add_seamless_hotspots(content):
+    """Replace the link hotspot click handler with seamless transitions."""
+    if 'performSeamlessTransition' in content:
+        return content
+    if LINK_HANDLER not in content:
+        raise PatchNotApplicable("link hotspot click handler not found")
+    return content.replace(LINK_HANDLER, SEAMLESS_LINK_HANDLER)
+
+
+def editor_patches(pipeline):
+    """Register the patches exposing Marzipano objects to the editor."""
+    pipeline.register('global viewer', expose_viewer)
+    pipeline.register('global scenes', expose_scenes)
+    pipeline.register('ready event', add_ready_signal)
+    return pipeline
+
+
+def transition_patches(pipeline):
+    """Register the seamless transition hooks."""
+    pipeline.register('scene tracking', add_scene_tracking)
+    pipeline.register('seamless link hotspots', add_seamless_hotspots)
+    return pipeline
+
+
+def index_js_path(work_dir):
+    """Path of a tour's index.js."""
+    return os.path.join(work_dir, "app-files", "index.js")
+
+
+def _run(pipeline):
+    report = pipeline.run()
+    print_report(report)
+    return any(entry['status'] == APPLIED for entry in report)
+
+
+def patch_index_js(work_dir):
+    """
+    Patch index.js to expose viewer and scenes as global variables.
+    
+    Args:
+        work_dir: Tour working directory
+    """
+    return _run(editor_patches(PatchPipeline(index_js_path(work_dir))))
+
+
+def patch_for_transitions(work_dir):
+    """
+    Patch index.js to use seamless transitions instead of direct scene switching.
+    
+    Args:
+        work_dir: Tour working directory
+    """
+    return _run(transition_patches(PatchPipeline(index_js_path(work_dir))))
+
+
+TILE_SOURCE_CALL = '''var source = Marzipano.ImageUrlSource.fromString(
+      urlPrefix + "/" + data.id + "/{z}/{f}/{y}/{x}.jpg",
+      { cubeMapPreviewUrl: urlPrefix + "/" + data.id + "/preview.jpg" });'''
+
+TILE_FORMAT_PATTERN = re.compile(r'var TILE_FORMAT = "([a-z0-9]+)";\n  var TILE_FORMAT_PROBE = "([^"]*)";')
+
+# Start of the tile source block (current and first version) and the line after it
+TILE_SOURCE_MARKERS = ('  // Tile source:', '  // Tile format:')
+TILE_SOURCE_END = '  // Create scenes.'
+
+TILE_SOURCE_BLOCK = '''  // Tile source: transcoded tiles when the browser decodes them, JPEG otherwise.
+  // Duplicate tiles resolve to the single stored copy listed in tile_map.js.
+  var TILE_FORMAT = "%(format)s";
+  var TILE_FORMAT_PROBE = "%(probe)s";
+  var tileExtension = "jpg";
+  if (TILE_FORMAT_PROBE) {
+    (function() {
+      var probe = new Image();
+      probe.onload = function() {
+        if (probe.width > 0) {
+          tileExtension = TILE_FORMAT;
+        }
+      };
+      probe.src = TILE_FORMAT_PROBE;
+    })();
+  }
+
+  var tileAliases = {};
+  Object.keys(window.TILE_MAP || {}).forEach(function(stored) {
+    window.TILE_MAP[stored].forEach(function(duplicate) {
+      tileAliases[duplicate] = stored;
+    });
+  });
+
+  function tileUrl(url) {
+    return tileAliases[url] || url;
+  }
+
+  // URL of a JPEG tile path as this page loads it (used by the prefetcher)
+  window.resolveTileUrl = function(url) {
+    return tileUrl(url.replace(/\.jpg$/, "." + tileExtension));
+  };
+
+  function tileSource(prefix) {
+    return new Marzipano.ImageUrlSource(function(tile) {
+      if (tile.z === 0) {
+        // Fallback level: faces stacked in preview image (bdflru order)
+        return {
+          url: tileUrl(prefix + "/preview." + tileExtension),
+          rect: { x: 0, y: "bdflru".indexOf(tile.face) / 6, width: 1, height: 1 / 6 }
+        };
+      }
+      return { url: tileUrl(prefix + "/" + tile.z + "/" + tile.face + "/" + tile.y + "/" + tile.x + "." + tileExtension) };
+    });
+  }
+
+'''
+
+
+def install_tile_source(content, tile_format=None, probe=None):
+    """
+    Install or update the custom tile source in index.js content.
+    
+    Keeps the current tile format unless a new one is given.
+    
+    Raises:
+        PatchNotApplicable: index.js has no tile source to replace
+    """
+    match = TILE_FORMAT_PATTERN.search(content)
+    settings = {'format': 'jpg', 'probe': ''}
+    if match:
+        settings = {'format': match.group(1), 'probe': match.group(2)}
+    if tile_format:
+        settings = {'format': tile_format, 'probe': probe}
+    block = TILE_SOURCE_BLOCK % settings
+    
+    start = -1
+    for marker in TILE_SOURCE_MARKERS:
+        start = content.find(marker)
+        if start >= 0:
+            break
     
-    if modified:
-        with open(index_js_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        return True
-    else:
-        print("  ℹ️  Transition hooks already installed")
-        return False
+    if start >= 0:
+        end = content.index(TILE_SOURCE_END, start)
+        return content[:start] + block + content[end:]
+    
+    if TILE_SOURCE_CALL not in content or TILE_SOURCE_END not in content:
+        raise PatchNotApplicable("tile source not found; tile URLs left unchanged")
+    content = content.replace(TILE_SOURCE_CALL, 'var source = tileSource(urlPrefix + "/" + data.id);')
+    return content.replace(TILE_SOURCE_END, block + TILE_SOURCE_END, 1)
+
+
+def reset_tile_format(content):
+    """
+    Load JPEG tiles again after a build that shipped transcoded ones.
+
+    The tile source block stays (duplicate tiles still resolve through it);
+    only its format and probe are reset.
+    """
+    match = TILE_FORMAT_PATTERN.search(content)
+    if not match or match.group(1) == 'jpg':
+        return content
+    return install_tile_source(content, 'jpg', '')
+
+
+def patch_tile_format(work_dir, tile_format, probe):
+    """
+    Patch index.js to load transcoded tiles when the browser supports them.
+    
+    The browser decodes a 1x1 probe image of the format; tiles are requested
+    as JPEG until (and unless) that succeeds.
+    
+    Args:
+        work_dir: Tour working directory
+        tile_format: Tile file extension, e.g. 'webp'
+        probe: Data URI of a 1x1 image in that format
+    """
+    pipeline = PatchPipeline(index_js_path(work_dir))
+    pipeline.register(f'{tile_format} tiles', install_tile_source, tile_format, probe)
+    return _run(pipeline)
+
+
+def patch_tile_aliases(work_dir):
+    """
+    Patch index.js to resolve duplicate tiles through tile_map.js.
+    
+    Args:
+        work_dir: Tour working directory
+    """
+    return _run(PatchPipeline(index_js_path(work_dir)).register('tile map lookup', install_tile_source))
+
 
+SCENE_MAP_START = re.compile(r'  var scenes = (?:window\.scenes = )?data\.scenes\.map\(function\(data\) \{\n')
 
+SCENE_MAP_END = '''    return {
+      data: data,
+      scene: scene,
+      view: view
+    };
+  });
+'''
+
+LAZY_SCENES_MARKER = '  function createSceneObjects(data) {\n'
+
+LAZY_SWITCH_GUARD = '''function switchScene(scene) {
+    // Scenes of chunked tour data are created on first visit
+    if (!scene.scene) {
+      loadScene(scene, function() {
+        switchScene(scene);
+      });
+      return;
+    }
+'''
+
+SEAMLESS_TRANSITION_CALL = '        window.performSeamlessTransition(currentScene, targetScene, hotspot);\n'
+
+LAZY_SEAMLESS_TRANSITION_CALL = '''        loadScene(targetScene, function() {
+          window.performSeamlessTransition(currentScene, targetScene, hotspot);
+        });
+'''
+
+LAZY_SCENES_BLOCK = '''    return {
+      data: data,
+      scene: scene,
+      view: view
+    };
+  }
+
+  // With chunked tour data (data.sceneChunks) a scene is created when it is
+  // first visited, from the chunk script listed in its root entry, and
+  // destroyed once it is more than keepHops links away from the current
+  // scene. Without it every scene is created up front.
+  var sceneChunks = data.sceneChunks;
+  var pendingChunks = {};
+  var scenes = window.scenes = data.scenes.map(function(entry) {
+    return { data: entry, root: entry, scene: null, view: null, modals: null };
+  });
+
+  function loadSceneData(entry, done) {
+    var id = entry.root.id;
+    var loaded = window.APP_SCENE_CHUNKS = window.APP_SCENE_CHUNKS || {};
+    if (!entry.root.chunk || loaded[id]) {
+      done(loaded[id] || entry.root);
+      return;
+    }
+    if (pendingChunks[id]) {
+      pendingChunks[id].push(done);
+      return;
+    }
+    pendingChunks[id] = [done];
+    var script = document.createElement('script');
+    script.onload = script.onerror = function() {
+      var callbacks = pendingChunks[id];
+      delete pendingChunks[id];
+      script.parentNode.removeChild(script);
+      if (!loaded[id]) {
+        console.error('Could not load scene data:', entry.root.chunk);
+        return;
+      }
+      callbacks.forEach(function(callback) {
+        callback(loaded[id]);
+      });
+    };
+    script.src = entry.root.chunk;
+    document.head.appendChild(script);
+  }
+
+  function loadScene(entry, done) {
+    if (entry.scene) {
+      done();
+      return;
+    }
+    loadSceneData(entry, function(sceneData) {
+      if (!entry.scene) {
+        // Info hotspots add their mobile modals to the body
+        var modalCount = sceneChunks ? document.querySelectorAll('.info-hotspot-modal').length : 0;
+        var created = createSceneObjects(sceneData);
+        entry.data = created.data;
+        entry.scene = created.scene;
+        entry.view = created.view;
+        if (sceneChunks) {
+          entry.modals = Array.prototype.slice.call(document.querySelectorAll('.info-hotspot-modal'), modalCount);
+        }
+      }
+      done();
+    });
+  }
+
+  function unloadScene(entry) {
+    if (entry.scene) {
+      viewer.destroyScene(entry.scene);
+      entry.modals.forEach(function(modal) {
+        modal.parentNode.removeChild(modal);
+      });
+      entry.scene = entry.view = entry.modals = null;
+    }
+    if (entry.root.chunk) {
+      delete window.APP_SCENE_CHUNKS[entry.root.id];
+      entry.data = entry.root;
+    }
+  }
+
+  // Keep scenes near the current one, fetch the data of its neighbours
+  // and drop everything else
+  function retainAround(current) {
+    var distance = {};
+    distance[current] = 0;
+    var queue = [current];
+    while (queue.length) {
+      var index = queue.shift();
+      if (distance[index] >= sceneChunks.keepHops) {
+        continue;
+      }
+      scenes[index].root.links.forEach(function(target) {
+        if (!(target in distance)) {
+          distance[target] = distance[index] + 1;
+          queue.push(target);
+        }
+      });
+    }
+    scenes.forEach(function(entry, index) {
+      if (!(index in distance)) {
+        unloadScene(entry);
+      } else if (distance[index] === 1) {
+        loadSceneData(entry, function() {});
+      }
+    });
+  }
+
+  if (sceneChunks) {
+    // Evict once the scene change transition has finished
+    var evictionTimer = null;
+    viewer.addEventListener('sceneChange', function() {
+      clearTimeout(evictionTimer);
+      evictionTimer = setTimeout(function() {
+        var active = viewer.scene();
+        for (var i = 0; i < scenes.length; i++) {
+          if (scenes[i].scene && scenes[i].scene === active) {
+            retainAround(i);
+            return;
+          }
+        }
+      }, 2000);
+    });
+  } else {
+    scenes.forEach(function(entry) {
+      loadScene(entry, function() {});
+    });
+  }
+'''
+
+
+def install_lazy_scenes(content):
+    """
+    Create scenes lazily from chunked tour data and evict distant ones.
+
+    The scene factory of index.js becomes createSceneObjects(); scenes are
+    created through loadScene(), which switchScene() and the seamless link
+    handler wait for. Data without sceneChunks still creates every scene
+    up front, so the patched index.js also runs regular data.js.
+
+    Raises:
+        PatchNotApplicable: index.js has no scene factory to replace
+    """
+    if LAZY_SCENES_MARKER in content:
+        return content
+    match = SCENE_MAP_START.search(content)
+    if not match or SCENE_MAP_END not in content[match.end():] or \
+            'function switchScene(scene) {' not in content:
+        raise PatchNotApplicable("scene creation not found")
+    end = content.index(SCENE_MAP_END, match.end())
+    content = (content[:match.start()] + LAZY_SCENES_MARKER + content[match.end():end] +
+               LAZY_SCENES_BLOCK + content[end + len(SCENE_MAP_END):])
+    content = content.replace('function switchScene(scene) {', LAZY_SWITCH_GUARD, 1)
+    return content.replace(SEAMLESS_TRANSITION_CALL, LAZY_SEAMLESS_TRANSITION_CALL)
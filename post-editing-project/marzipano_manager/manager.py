@@ -3,35 +3,57 @@ Main Tour Manager module.
 Orchestrates initialization and building of Marzipano tours.
 """
 
+import copy
 import os
 import sys
 from pathlib import Path
 
+from . import assets
+from . import chunks
 from . import parser
+from . import patch_pipeline
+from . import prefetch
+from . import profiling
 from . import transitions
+from . import bundler
 from . import file_ops
 from . import html_patcher
 from . import js_patcher
 from . import server
+from . import sprites
+from . import tile_dedup
+from . import tour_store
 from . import view_config_generator
+from .tour_graph import TourGraph
+from . import zip_source
 
 
 class TourManager:
     """Manages Marzipano tour initialization and building."""
     
-    def __init__(self):
+    def __init__(self, server_options=None, profiler=None):
         self.work_dir = None
         self.data = None
         self.manager_dir = Path(__file__).parent
+        # Keyword arguments passed to server.start_server (workers, backlog, ...)
+        self.server_options = server_options or {}
+        # Records per-stage timings of init and build (disabled unless given)
+        self.profiler = profiler or profiling.StageProfiler(enabled=False)
         
-    def init(self, zip_path, output_dir=None):
+    def init(self, zip_path, output_dir=None, jobs=None, from_zip=False, serve=True):
         """
         Initialize a tour from Marzipano Tool export.
         
         Args:
             zip_path: Path to the ZIP archive from Marzipano Tool
             output_dir: Optional output directory (defaults to extracted folder name)
+            jobs: Number of parallel extraction workers (defaults to CPU count)
+            from_zip: Only extract the files the patchers modify into an overlay
+                directory and serve everything else straight from the ZIP
+            serve: Start the preview server once the tour is ready
         """
+        self.profiler.start('init')
+        self.profiler.stage('extract')
         print(f"📦 Extracting tour from {zip_path}...")
         
         # Determine output directory
@@ -41,8 +63,14 @@ class TourManager:
         self.work_dir = os.path.abspath(output_dir)
         
         # Extract ZIP
-        file_ops.extract_zip(zip_path, self.work_dir)
-        print(f"✓ Extracted to {self.work_dir}")
+        if from_zip:
+            stats = file_ops.extract_zip(zip_path, self.work_dir, jobs=jobs,
+                                         include=zip_source.is_overlay_member)
+            zip_source.write_source_marker(self.work_dir, zip_path)
+            print(f"✓ Extracted {stats['files']} editable files to overlay {self.work_dir}")
+        else:
+            stats = file_ops.extract_zip(zip_path, self.work_dir, jobs=jobs)
+            print(f"✓ Extracted {stats['files']} files to {self.work_dir} in {stats['seconds']:.1f}s")
         
         # Parse data.js
         data_js_path = os.path.join(self.work_dir, "app-files", "data.js")
@@ -50,24 +78,28 @@ class TourManager:
             print(f"❌ Error: data.js not found at {data_js_path}")
             sys.exit(1)
         
+        self.profiler.stage('parse data.js')
         print("🔍 Parsing data.js...")
         self.data = parser.parse_data_js(data_js_path)
         print(f"✓ Found {len(self.data['scenes'])} scenes")
         
+        # Index scenes and links once for all auto-180 computations
+        graph = TourGraph(self.data)
+        
         # Apply Auto-180 Logic
+        self.profiler.stage('auto-180')
         print("🔄 Applying Auto-180 Logic...")
-        transitions.calculate_entry_angles(self.data)
+        transitions.calculate_entry_angles(self.data, graph)
         print("✓ Entry headings calculated")
         
         # Copy editor files
+        self.profiler.stage('install editor')
         print("📝 Installing editor...")
         editor_dir = self.manager_dir / "editor"
         target_dir = os.path.join(self.work_dir, "app-files")
         file_ops.copy_editor_files(editor_dir, target_dir)
         print("✓ Editor installed")
         
-        # Patch index.html
-        print("🔧 Patching index.html...")
         # Try app-files/index.html first (common structure), then root index.html
         index_path = os.path.join(self.work_dir, "app-files", "index.html")
         if not os.path.exists(index_path):
@@ -75,23 +107,18 @@ class TourManager:
         if not os.path.exists(index_path):
             print(f"❌ Error: index.html not found in {self.work_dir} or app-files/")
             sys.exit(1)
-        editor_init_template = self.manager_dir / "templates" / "editor_init.html"
-        html_patcher.patch_index_html(index_path, editor_init_template)
-        print("✓ index.html patched")
-        
-        # Patch index.js to expose Marzipano objects
-        print("🔧 Patching index.js...")
-        js_patcher.patch_index_js(self.work_dir)
-        print("✓ index.js patched")
         
         # Generate view config with auto-180 logic
+        self.profiler.stage('view config')
         print("🎯 Generating view config (auto-180 logic)...")
-        view_config = view_config_generator.generate_view_config(self.data)
+        view_config, sources, _ = view_config_generator.update_view_config(self.data, {}, graph=graph)
         view_config_path = os.path.join(self.work_dir, "app-files", "view_config.json")
         view_config_generator.save_view_config(view_config, view_config_path)
+        view_config_generator.save_sources(sources, self.work_dir)
         print("✓ View config generated")
         
         # Copy transition runtime
+        self.profiler.stage('install transitions')
         print("🎬 Installing transition system...")
         transition_runtime = self.manager_dir / "transitions" / "runtime.js"
         target_runtime = os.path.join(self.work_dir, "app-files", "transition_runtime.js")
@@ -99,45 +126,154 @@ class TourManager:
         shutil.copy(transition_runtime, target_runtime)
         print("✓ Transition system installed")
         
-        # Patch index.html to include transition runtime
-        print("🔧 Injecting transition system into index.html...")
-        html_patcher.inject_transition_system(index_path)
-        print("✓ Transition system injected")
-        
-        # Patch index.js to use seamless transitions
-        print("🔧 Patching index.js for seamless transitions...")
-        js_patcher.patch_for_transitions(self.work_dir)
-        print("✓ Transition hooks installed")
+        # Patch index.html and index.js: editor hooks, transition runtime with
+        # the inlined view config, seamless transitions. Each file is read and
+        # written once.
+        self.profiler.stage('patch')
+        print("🔧 Patching index.html and index.js...")
+        editor_init_template = self.manager_dir / "templates" / "editor_init.html"
+        with open(editor_init_template, 'r', encoding='utf-8') as f:
+            editor_init = f.read()
+        index_html = html_patcher.editor_patches(patch_pipeline.PatchPipeline(index_path), editor_init)
+        html_patcher.transition_patches(index_html, view_config)
+        index_js = js_patcher.editor_patches(patch_pipeline.PatchPipeline(js_patcher.index_js_path(self.work_dir)))
+        js_patcher.transition_patches(index_js)
+        report = patch_pipeline.run_pipelines(index_html, index_js)
+        patch_pipeline.print_report(report)
+        applied = sum(entry['status'] == patch_pipeline.APPLIED for entry in report)
+        print(f"✓ {applied} patches applied, {len(report) - applied} skipped")
         
         # Save enhanced data as JSON for editor
+        self.profiler.stage('save tour data')
         json_path = os.path.join(self.work_dir, "app-files", "tour_data.json")
         parser.data_to_json(self.data, json_path)
         
         print("\n✅ Initialization complete!")
         print(f"📁 Tour directory: {self.work_dir}")
+        self.profiler.finish()
         
         # Start local server
-        server.start_server(self.work_dir)
+        if serve:
+            server.start_server(self.work_dir, **self.server_options)
         
-    def build(self, config_path, output_zip=None):
+    def serve(self, tour_dir):
+        """
+        Serve an initialized tour with the preview server.
+        
+        Args:
+            tour_dir: Tour directory created by init
+        """
+        self.work_dir = os.path.abspath(tour_dir)
+        if not os.path.exists(os.path.join(self.work_dir, "app-files", "index.html")) and \
+           not os.path.exists(os.path.join(self.work_dir, "index.html")):
+            print(f"❌ Error: No tour found in {self.work_dir} (no index.html)")
+            sys.exit(1)
+        server.start_server(self.work_dir, **self.server_options)
+        
+    def regenerate_views(self, tour_dir, full=False):
+        """
+        Regenerate the view config (auto-180) of a tour from its tour data.
+        
+        Only entries whose scenes' links or initial views changed since the
+        last regeneration are recomputed; entries aligned by hand in the
+        editor are kept.
+        
+        Args:
+            tour_dir: Tour directory created by init
+            full: Recompute every entry, discarding hand-tuned ones
+        """
+        self.work_dir = os.path.abspath(tour_dir)
+        if not tour_store.TourStore.exists(self.work_dir):
+            print(f"❌ Error: No saved tour data in {self.work_dir}")
+            sys.exit(1)
+        
+        # Go through the store so journaled editor saves are included
+        store = tour_store.TourStore(self.work_dir)
+        self.data = store.document['tourData']
+        existing = store.document['viewConfig']
+        graph = TourGraph(self.data)
+        print("🎯 Regenerating view config (auto-180 logic)...")
+        sources = None if full else view_config_generator.load_sources(self.work_dir)
+        view_config, sources, report = view_config_generator.update_view_config(
+            self.data, {} if full else existing, sources, graph)
+        view_config_generator.print_update_report(report)
+        
+        if view_config != existing:
+            store.apply([{'op': 'replace', 'path': '/viewConfig', 'value': view_config}])
+            store.compact()
+            index_path = os.path.join(self.work_dir, "app-files", "index.html")
+            if not os.path.exists(index_path):
+                index_path = os.path.join(self.work_dir, "index.html")
+            pipeline = patch_pipeline.PatchPipeline(index_path)
+            pipeline.register('view config', html_patcher.set_view_config, view_config)
+            patch_pipeline.print_report(pipeline.run())
+        else:
+            print("✓ View config already up to date")
+        view_config_generator.save_sources(sources, self.work_dir)
+        
+    def build(self, config_path, output_zip=None, jobs=None, compression_level=None, incremental=True,
+              tile_format=None, tile_quality=None, dedup_tiles=False, prefetch_budget=None,
+              bundle=False, compact_data=False, data_precision=None, externalize_assets=True,
+              sprite_atlas=False, sprite_max_size=None, chunk_scenes=False, keep_hops=None):
         """
         Build final tour from config.
         
         Args:
-            config_path: Path to config.json from editor
+            config_path: Path to config.json from editor, or a tour directory
+                (or its app-files/tour_data.json) saved through the preview server
             output_zip: Output ZIP filename (defaults to final_tour.zip)
+            jobs: Number of parallel compression workers (defaults to CPU count)
+            compression_level: Deflate level for text assets (defaults to 6)
+            incremental: Reuse unchanged members from the previous output archive
+            tile_format: Also ship tiles as 'webp' or 'avif' (JPEG kept as fallback)
+            tile_quality: Encoder quality for transcoded tiles (defaults per format)
+            dedup_tiles: Store byte-identical tiles once and map duplicates at runtime
+            prefetch_budget: Bytes the runtime may prefetch per scene (0 disables,
+                defaults to 4 MB)
+            bundle: Package scripts and stylesheets as minified, content-hashed bundles
+            compact_data: Write data.js without whitespace and editor-only keys,
+                plus a precompressed data.js.gz
+            data_precision: Decimal places kept for view angles in compact data.js
+                (defaults to 4)
+            externalize_assets: Move data-URI images in the tour data to
+                app-files/assets/ files so data.js only references them
+            sprite_atlas: Pack small images of hotspot HTML into sprite atlases
+            sprite_max_size: Largest atlas side in pixels (defaults to 2048)
+            chunk_scenes: Write a root data.js plus one chunk per scene and
+                create scenes lazily at runtime
+            keep_hops: Link distance within which the runtime keeps created
+                scenes (defaults to 2)
         """
+        self.profiler.start('build')
+        self.profiler.stage('load config')
         print(f"🔨 Building tour from {config_path}...")
         
         if not os.path.exists(config_path):
             print(f"❌ Error: Config file not found: {config_path}")
             sys.exit(1)
         
+        # Edits saved through the preview server live in app-files/tour_data.json
+        # and the save journal; a tour directory or that file can be built directly
+        config_path = os.path.abspath(config_path)
+        store_dir = None
+        if os.path.isdir(config_path):
+            store_dir = config_path
+        elif os.path.basename(config_path) == tour_store.DOCUMENT_FILES['tourData'] and \
+                os.path.basename(os.path.dirname(config_path)) == "app-files":
+            store_dir = os.path.dirname(os.path.dirname(config_path))
+        
         # Load config
-        self.data = parser.json_to_data(config_path)
+        if store_dir is not None:
+            if not tour_store.TourStore.exists(store_dir):
+                print(f"❌ Error: No saved tour data in {store_dir}")
+                sys.exit(1)
+            self.data, view_config = tour_store.load_documents(store_dir)
+            config_dir = store_dir
+        else:
+            self.data, view_config = parser.load_config(config_path)
+            # Determine work directory (assume config is in the tour directory)
+            config_dir = os.path.dirname(config_path)
         
-        # Determine work directory (assume config is in the tour directory)
-        config_dir = os.path.dirname(os.path.abspath(config_path))
         # Check for index.html in app-files/ or root
         if os.path.exists(os.path.join(config_dir, "app-files", "index.html")) or \
            os.path.exists(os.path.join(config_dir, "index.html")):
@@ -148,13 +284,95 @@ class TourManager:
         
         print("✓ Config loaded")
         
+        index_path = os.path.join(self.work_dir, "app-files", "index.html")
+        if not os.path.exists(index_path):
+            index_path = os.path.join(self.work_dir, "index.html")
+        
+        # Shipped tour data references embedded images by URL; the editor's
+        # copy keeps them inline
+        player_data = self.data
+        app_files = os.path.join(self.work_dir, "app-files")
+        self.profiler.stage('externalize assets')
+        if externalize_assets:
+            player_data, stats = assets.externalize_data_uris(self.data, app_files,
+                                                              html_patcher.path_prefix(index_path))
+            if stats['references']:
+                print(f"🖼️  {stats['references']} embedded images → {stats['files']} files in "
+                      f"app-files/{assets.ASSETS_DIRNAME}/ "
+                      f"({stats['inline_bytes'] / 1024:.1f} KB inline → {stats['file_bytes'] / 1024:.1f} KB)")
+            if stats['invalid']:
+                print(f"⚠️  {stats['invalid']} data URIs with invalid base64 were left inline")
+        elif assets.remove_stale_assets(app_files, set()):
+            print("✓ Assets extracted by a previous build removed")
+        
+        # Pack hotspot icons into sprite atlases
+        sprited = set()
+        if sprite_atlas:
+            self.profiler.stage('sprite atlas')
+            print("🧩 Packing hotspot images into sprite atlases...")
+            try:
+                player_data, stats = sprites.build_sprite_atlases(
+                    player_data, self.work_dir, index_path,
+                    max_size=sprite_max_size or sprites.DEFAULT_MAX_SIZE)
+            except (ImportError, ValueError) as e:
+                print(f"❌ Error: {e}")
+                sys.exit(1)
+            sprited = stats['unreferenced']
+            print(f"✓ {stats['images']} images → {stats['atlases']} atlases "
+                  f"({stats['atlas_bytes'] / 1024:.1f} KB), {stats['references']} tags rewritten")
+        elif sprites.remove_stale_atlases(app_files, set()):
+            print("✓ Sprite atlases of a previous build removed")
+        
         # Generate final data.js
+        self.profiler.stage('data.js')
         print("📝 Generating data.js...")
         data_js_path = os.path.join(self.work_dir, "app-files", "data.js")
-        parser.generate_data_js(self.data, data_js_path)
-        print("✓ data.js generated")
+        if data_precision is None:
+            data_precision = parser.DEFAULT_PRECISION
+        # Files that exist only in the package (the tour directory keeps
+        # what the editor needs)
+        generated = {}
+        if chunks.remove_stale_chunks(app_files, set()):
+            print("✓ Scene chunks a previous build wrote to the tour directory removed")
+        if chunk_scenes:
+            root, generated, stats = chunks.split_tour_data(
+                player_data, html_patcher.path_prefix(index_path),
+                keep_hops=chunks.DEFAULT_KEEP_HOPS if keep_hops is None else keep_hops,
+                compact=compact_data, precision=data_precision)
+            root_js = parser.data_js_content(root, compact=compact_data, precision=data_precision)
+            generated['app-files/data.js'] = root_js
+            if compact_data:
+                generated['app-files/data.js.gz'] = parser.gzip_content(root_js)
+            print(f"✂️  {len(root['scenes'])} scenes → {stats['chunks']} chunks in "
+                  f"app-files/{chunks.CHUNKS_DIRNAME}/ ({stats['chunk_bytes'] / 1024:.1f} KB, "
+                  f"largest {stats['largest_chunk_bytes'] / 1024:.1f} KB), "
+                  f"packaged data.js {len(root_js) / 1024:.1f} KB")
+        if compact_data:
+            sizes = parser.generate_data_js(player_data, data_js_path, compact=True, precision=data_precision)
+            print(f"✓ data.js generated: {sizes['full_bytes'] / 1024:.1f} KB → {sizes['bytes'] / 1024:.1f} KB "
+                  f"({sizes['gzip_bytes'] / 1024:.1f} KB gzipped)")
+        else:
+            sizes = parser.generate_data_js(player_data, data_js_path)
+            print(f"✓ data.js generated ({sizes['bytes'] / 1024:.1f} KB)")
+        
+        # Save the edited view configuration (or keep the one from init)
+        self.profiler.stage('view config')
+        view_config_path = os.path.join(self.work_dir, "app-files", "view_config.json")
+        if view_config is not None:
+            view_config_generator.save_view_config(view_config, view_config_path)
+        elif os.path.exists(view_config_path):
+            view_config = parser.json_to_data(view_config_path)
+        
+        # index.html and index.js patches are collected and applied in one pass
+        index_html = patch_pipeline.PatchPipeline(index_path)
+        index_js = patch_pipeline.PatchPipeline(js_patcher.index_js_path(self.work_dir))
+        if view_config is not None:
+            index_html.register('view config', html_patcher.set_view_config, view_config)
+        if chunk_scenes:
+            index_js.register('lazy scenes', js_patcher.install_lazy_scenes)
         
         # Copy player.js
+        self.profiler.stage('install player')
         print("🎮 Installing player.js...")
         player_src = self.manager_dir / "editor" / "player.js"
         player_dst = os.path.join(self.work_dir, "app-files", "player.js")
@@ -162,19 +380,179 @@ class TourManager:
         shutil.copy(player_src, player_dst)
         print("✓ player.js installed")
         
-        # Remove editor files
-        print("🧹 Removing editor files...")
-        file_ops.remove_editor_files(self.work_dir)
-        print("✓ Editor files removed")
+        source_zip = zip_source.read_source_marker(self.work_dir)
+        
+        # Transcode tiles
+        from . import transcoder
+        if tile_format:
+            self.profiler.stage('transcode tiles')
+            print(f"🖼️  Transcoding tiles to {tile_format}...")
+            try:
+                stats = transcoder.transcode_tiles(self.work_dir, tile_format, quality=tile_quality,
+                                                   processes=jobs, source_zip=source_zip)
+            except (ImportError, ValueError, OSError) as e:
+                print(f"❌ Error: {e}")
+                sys.exit(1)
+            if stats['output_bytes'] >= stats['jpeg_bytes']:
+                # No point shipping a second copy that is not even smaller
+                print(f"⚠️  {stats['tiles']} {tile_format} tiles are not smaller than the JPEGs "
+                      f"({stats['output_bytes'] / (1024 * 1024):.1f} MB vs "
+                      f"{stats['jpeg_bytes'] / (1024 * 1024):.1f} MB); shipping JPEG only")
+                tile_format = None
+            else:
+                saved = 1 - stats['output_bytes'] / stats['jpeg_bytes']
+                print(f"✓ {stats['tiles']} tiles: {stats['jpeg_bytes'] / (1024 * 1024):.1f} MB JPEG → "
+                      f"{stats['output_bytes'] / (1024 * 1024):.1f} MB {tile_format} ({saved:.0%} smaller, "
+                      f"{stats['encoded']} encoded, {stats['skipped']} up to date) in {stats['seconds']:.1f}s")
+                index_js.register(f'{tile_format} tiles', js_patcher.install_tile_source,
+                                  tile_format, transcoder.FORMATS[tile_format]['probe'])
+        if not tile_format:
+            if transcoder.remove_transcoded(self.work_dir):
+                print("✓ Transcoded tiles removed")
+            index_js.register('jpg tiles', js_patcher.reset_tile_format)
+        
+        # Prefetch manifest for neighbour scenes
+        self.profiler.stage('prefetch manifest')
+        manifest_path = os.path.join(self.work_dir, "app-files", prefetch.MANIFEST_FILENAME)
+        if prefetch_budget is None:
+            prefetch_budget = prefetch.DEFAULT_BUDGET
+        if prefetch_budget > 0:
+            manifest = prefetch.build_manifest(self.data, view_config or {}, self.work_dir,
+                                               budget=prefetch_budget, source_zip=source_zip)
+            prefetch.write_manifest(manifest, self.work_dir)
+            links = sum(len(links) for links in manifest['scenes'].values())
+            print(f"✓ Prefetch manifest: {links} links, "
+                  f"{prefetch_budget / (1024 * 1024):.1f} MB budget per scene")
+        elif os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        
+        # Deduplicate tiles
+        self.profiler.stage('dedup tiles')
+        excluded = None
+        if dedup_tiles:
+            print("🧬 Deduplicating tiles...")
+            stats = tile_dedup.dedup_tiles(self.work_dir, source_zip=source_zip, jobs=jobs)
+            excluded = stats['excluded']
+            print(f"✓ {stats['duplicates']} of {stats['tiles']} tiles are duplicates; "
+                  f"saves {stats['saved_bytes'] / (1024 * 1024):.1f} MB "
+                  f"(tile map {stats['map_bytes'] / 1024:.1f} KB) in {stats['seconds']:.1f}s")
+            index_js.register('tile map lookup', js_patcher.install_tile_source)
+            index_html.register('tile map', html_patcher.add_tile_map,
+                                html_patcher.path_prefix(index_path))
+        elif tile_dedup.clear_tile_map(self.work_dir):
+            print("✓ Tile map from a previous deduplicated build cleared")
+        
+        # Apply the collected patches
+        self.profiler.stage('patch')
+        print("🔧 Patching index.html and index.js...")
+        report = patch_pipeline.run_pipelines(index_html, index_js)
+        patch_pipeline.print_report(report)
+        
+        # Leave editor files out of the package; they stay in the tour
+        # directory, which holds the editor's saved state
+        excluded = (excluded or set()) | file_ops.editor_archive_names() | sprited
+        print("✓ Editor files excluded from the package")
+        
+        # Bundle and minify assets (only in the archive; the tour directory is kept)
+        if bundle:
+            self.profiler.stage('bundle')
+            print("🗜️  Bundling scripts and stylesheets...")
+            try:
+                stats = bundler.bundle_assets(self.work_dir, index_path, exclude_names=excluded,
+                                              generated=generated)
+            except ValueError as e:
+                print(f"❌ Error: Could not minify assets: {e}")
+                sys.exit(1)
+            # Precompressed siblings of bundled files are obsolete too
+            replaced = stats['replaced'] | {name + '.gz' for name in stats['replaced']}
+            excluded = (excluded or set()) | replaced
+            generated = {name: data for name, data in generated.items() if name not in replaced}
+            generated.update(stats['files'])
+            print(f"✓ {stats['source_requests']} files → {stats['bundle_requests']} bundles, "
+                  f"{stats['source_bytes'] / 1024:.0f} KB → {stats['bundle_bytes'] / 1024:.0f} KB")
         
         # Package ZIP
         if output_zip is None:
             output_zip = "final_tour.zip"
         
+        self.profiler.stage('package')
         print(f"📦 Packaging {output_zip}...")
-        file_ops.create_zip(self.work_dir, output_zip)
-        print(f"✓ Tour packaged to {output_zip}")
+        if source_zip:
+            print(f"  ↪ Unmodified files are copied from {source_zip}")
+        stats = file_ops.create_zip(self.work_dir, output_zip, jobs=jobs, level=compression_level,
+                                    incremental=incremental, source_zip=source_zip,
+                                    exclude_names=excluded, generated=generated)
+        print(f"✓ Tour packaged to {output_zip} "
+              f"({stats['deflated']} deflated, {stats['stored']} stored, "
+              f"{stats['archive_bytes'] / (1024 * 1024):.1f} MB in {stats['seconds']:.1f}s)")
+        if stats['reused']:
+            print(f"  ↺ {stats['reused']} unchanged members reused, {stats['encoded']} re-encoded")
         
         print("\n✅ Build complete!")
+        self.profiler.finish()
 
-
+    def tile(self, image_paths, tour_dir, processes=None, quality=None):
+        """
+        Tile equirectangular panoramas into a tour.
+        
+        Writes tiles/<id>/{z}/{f}/{y}/{x}.jpg pyramids and preview.jpg like
+        the Marzipano Tool, and adds the scenes (levels, faceSize) to data.js.
+        Panoramas named like an existing scene replace its tiles.
+        
+        Args:
+            image_paths: Equirectangular panorama images
+            tour_dir: Tour directory (containing app-files/, created if missing)
+            processes: Number of tiling processes (defaults to CPU count)
+            quality: JPEG quality (defaults to 85)
+        """
+        from . import tiler
+        
+        missing = [path for path in image_paths if not os.path.exists(path)]
+        if missing:
+            print(f"❌ Error: Panorama not found: {missing[0]}")
+            sys.exit(1)
+        
+        self.work_dir = os.path.abspath(tour_dir)
+        app_files = os.path.join(self.work_dir, "app-files")
+        data_js_path = os.path.join(app_files, "data.js")
+        os.makedirs(app_files, exist_ok=True)
+        
+        if os.path.exists(data_js_path):
+            self.data = parser.parse_data_js(data_js_path)
+        else:
+            self.data = {
+                "scenes": [],
+                "name": "Project Title",
+                "settings": {
+                    "mouseViewMode": "drag",
+                    "autorotateEnabled": False,
+                    "fullscreenButton": True,
+                    "viewControlButtons": True
+                }
+            }
+        
+        print(f"🧩 Tiling {len(image_paths)} panoramas into {self.work_dir}...")
+        try:
+            stats = tiler.tile_panoramas(
+                image_paths, os.path.join(app_files, "tiles"), processes=processes,
+                quality=quality or tiler.DEFAULT_QUALITY, existing_scenes=self.data.get("scenes", []),
+                cache_dir=os.path.join(self.work_dir, file_ops.WORK_CACHE_DIR, "tiler"))
+        except (ImportError, ValueError, OSError) as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        print(f"✓ Wrote {stats['tiles']} tiles ({stats['bytes'] / (1024 * 1024):.1f} MB) "
+              f"in {stats['seconds']:.1f}s")
+        
+        # Record levels/faceSize in data.js (and the editor's copy, if initialized)
+        tiler.merge_scenes(self.data, stats['scenes'])
+        parser.generate_data_js(self.data, data_js_path)
+        if tour_store.TourStore.exists(self.work_dir):
+            # Go through the store so journaled editor saves are kept
+            store = tour_store.TourStore(self.work_dir)
+            editor_data = copy.deepcopy(store.document['tourData'])
+            tiler.merge_scenes(editor_data, stats['scenes'])
+            store.apply([{'op': 'add', 'path': '/tourData/scenes', 'value': editor_data['scenes']}])
+            store.compact()
+        print("✓ data.js updated")
+        
+        print("\n✅ Tiling complete!")
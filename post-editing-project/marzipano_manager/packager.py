@@ -0,0 +1,644 @@
+"""
+Packaging engine for final tour archives.
+Compresses members in parallel according to a per-extension policy and
+assembles the ZIP with a single writer.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .file_ops import COPY_BUFFER_SIZE, WORK_CACHE_DIR, ProgressReporter, default_jobs
+from .tour_store import JOURNAL_FILENAME
+from .zip_source import SOURCE_MARKER, ZipSource
+
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# Already-compressed formats gain nothing from deflate
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.webp', '.avif', '.gif',
+    '.gz', '.br', '.zip', '.swf', '.woff', '.woff2',
+}
+
+# Files up to this size are read once and kept in memory between the
+# compression worker and the writer; larger ones are streamed twice
+INLINE_LIMIT = 8 * 1024 * 1024
+
+# Maximum number of encoded members waiting for the writer, per worker
+WINDOW_PER_WORKER = 4
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = '.manifest.json'
+
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_COUNT_LIMIT = 0xFFFF
+_UTF8_FLAG = 0x800
+_VERSION_DEFAULT = 20
+_VERSION_ZIP64 = 45
+_CREATE_SYSTEM_UNIX = 3
+_FILE_ATTRIBUTES = 0o100644 << 16
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_RECORD = struct.Struct('<IHHHHIIH')
+_END_RECORD64 = struct.Struct('<IQHHIIQQQQ')
+_END_LOCATOR64 = struct.Struct('<IIQI')
+
+
+class PackageEntry:
+    """
+    A single member to be written to the archive.
+
+    The content comes from a file on disk (path), from memory (data), or
+    from a member of another archive (source + info), which is copied raw.
+    """
+
+    def __init__(self, arcname, path=None, data=None, mtime=None, source=None, info=None):
+        self.arcname = arcname
+        self.path = path
+        self.data = data
+        self.source = source
+        self.info = info
+        if mtime is None:
+            if path:
+                mtime = os.path.getmtime(path)
+            elif info is not None:
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+            else:
+                mtime = time.time()
+        self.mtime = mtime
+
+    @property
+    def size(self):
+        if self.data is not None:
+            return len(self.data)
+        if self.info is not None:
+            return self.info.file_size
+        return os.path.getsize(self.path)
+
+
+class EncodedMember:
+    """Compressed payload and metadata for one archive member."""
+
+    def __init__(self, entry, method, crc, file_size, compress_size, payload=None,
+                 digest=None, raw_source=None):
+        self.entry = entry
+        self.method = method
+        self.crc = crc
+        self.file_size = file_size
+        self.compress_size = compress_size
+        # Encoded bytes, or None to stream the stored file from entry.path
+        self.payload = payload
+        # Content hash recorded in the build manifest
+        self.digest = digest
+        # (archive path, offset) of compressed bytes copied from another archive
+        self.raw_source = raw_source
+
+    @property
+    def reused(self):
+        return self.raw_source is not None
+
+    def manifest_record(self):
+        """Manifest entry describing this member."""
+        record = {
+            'size': self.file_size,
+            'sha256': self.digest,
+            'method': self.method,
+            'crc': self.crc,
+            'compress_size': self.compress_size,
+        }
+        if self.entry.path:
+            record['mtime_ns'] = os.stat(self.entry.path).st_mtime_ns
+        return record
+
+
+class PreviousArchive:
+    """
+    Previous build output and its manifest, used for incremental builds.
+
+    Members whose content hash is unchanged are copied into the new archive
+    as raw compressed bytes, without decompressing or recompressing them.
+    """
+
+    def __init__(self, zip_path, manifest):
+        self.members = manifest.get('members', {})
+        self.source = ZipSource(zip_path)
+
+    @classmethod
+    def load(cls, output_zip, level, policy=None):
+        """
+        Load the previous archive for output_zip if it can be reused.
+
+        Returns:
+            PreviousArchive or None when there is no compatible previous build
+        """
+        manifest_path = manifest_path_for(output_zip)
+        if not (os.path.exists(output_zip) and os.path.exists(manifest_path)):
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != MANIFEST_VERSION or manifest.get('level') != level \
+                    or manifest.get('policy') != _policy_key(policy):
+                return None
+            return cls(output_zip, manifest)
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return None
+
+    def reuse(self, entry, digest):
+        """
+        Return an EncodedMember copying entry from the previous archive.
+
+        Args:
+            entry: PackageEntry being packaged
+            digest: Content hash of the entry, or None to match on size/mtime
+
+        Returns:
+            EncodedMember or None if the entry changed
+        """
+        record = self.members.get(entry.arcname)
+        info = self.source.get(entry.arcname)
+        if record is None or info is None:
+            return None
+        if info.CRC != record['crc'] or info.compress_type != record['method'] \
+                or info.compress_size != record['compress_size']:
+            return None
+
+        if digest is None:
+            # Fast path: unchanged size and mtime means unchanged content
+            if not entry.path or 'mtime_ns' not in record:
+                return None
+            st = os.stat(entry.path)
+            if st.st_size != record['size'] or st.st_mtime_ns != record['mtime_ns']:
+                return None
+        elif digest != record['sha256']:
+            return None
+
+        return EncodedMember(
+            entry, record['method'], record['crc'], record['size'], record['compress_size'],
+            digest=record['sha256'],
+            raw_source=(self.source.path, self.source.data_offset(info))
+        )
+
+    def close(self):
+        self.source.close()
+
+
+def manifest_path_for(output_zip):
+    """Path of the build manifest kept next to an output archive."""
+    return os.path.abspath(output_zip) + MANIFEST_SUFFIX
+
+
+def _policy_key(policy):
+    """JSON-comparable form of a compression policy override."""
+    return [[ext, method] for ext, method in sorted(policy.items())] if policy else None
+
+
+def compression_method(arcname, policy=None):
+    """
+    Choose the compression method for a member from its extension.
+
+    Args:
+        arcname: Member name inside the archive
+        policy: Optional dict mapping extensions to ZIP_STORED/ZIP_DEFLATED
+
+    Returns:
+        int: ZIP_STORED or ZIP_DEFLATED
+    """
+    ext = os.path.splitext(arcname)[1].lower()
+    if policy and ext in policy:
+        return policy[ext]
+    if ext in STORED_EXTENSIONS:
+        return ZIP_STORED
+    # Deflate text assets and anything we don't recognise
+    return ZIP_DEFLATED
+
+
+def collect_entries(source_dir, exclude=None, source_zip=None, exclude_names=None):
+    """
+    Collect archive entries for every file under source_dir.
+
+    When source_dir is an overlay on a source ZIP, members of the ZIP that
+    are not overridden on disk are included as raw copies.
+
+    Args:
+        source_dir: Directory to archive
+        exclude: Optional iterable of absolute paths to skip
+        source_zip: Optional ZipSource backing source_dir
+        exclude_names: Optional iterable of archive names to skip
+
+    Returns:
+        list: PackageEntry objects sorted by archive name
+    """
+    exclude = {os.path.abspath(p) for p in (exclude or ())}
+    exclude_names = set(exclude_names or ())
+    exclude.add(os.path.abspath(os.path.join(source_dir, SOURCE_MARKER)))
+    exclude.add(os.path.abspath(os.path.join(source_dir, JOURNAL_FILENAME)))
+    entries = []
+
+    for root, dirs, files in os.walk(source_dir):
+        if root == source_dir and WORK_CACHE_DIR in dirs:
+            dirs.remove(WORK_CACHE_DIR)
+        dirs.sort()
+        for file in files:
+            file_path = os.path.join(root, file)
+            if os.path.abspath(file_path) in exclude:
+                continue
+            arcname = os.path.relpath(file_path, source_dir).replace(os.path.sep, '/')
+            if arcname in exclude_names:
+                continue
+            entries.append(PackageEntry(arcname, path=file_path))
+
+    if source_zip is not None:
+        on_disk = {entry.arcname for entry in entries}
+        for name, info in source_zip.members.items():
+            if name not in on_disk and name not in exclude_names:
+                entries.append(PackageEntry(name, source=source_zip, info=info))
+
+    entries.sort(key=lambda e: e.arcname)
+    return entries
+
+
+def encode_entry(entry, level=DEFAULT_COMPRESSION_LEVEL, policy=None, previous=None):
+    """
+    Compress a single entry according to the policy.
+
+    Runs in worker threads; zlib and hashlib release the GIL while
+    compressing and hashing, so this scales across cores. When a previous
+    archive is given, unchanged entries are returned as raw copies instead.
+
+    Args:
+        entry: PackageEntry to encode
+        level: Deflate level for compressible members
+        policy: Optional per-extension override
+        previous: Optional PreviousArchive for incremental builds
+
+    Returns:
+        EncodedMember: Encoded payload and ZIP metadata
+    """
+    if entry.source is not None:
+        info = entry.info
+        return EncodedMember(
+            entry, info.compress_type, info.CRC, info.file_size, info.compress_size,
+            raw_source=(entry.source.path, entry.source.data_offset(info))
+        )
+
+    if previous is not None:
+        reused = previous.reuse(entry, None)
+        if reused is not None:
+            return reused
+
+    method = compression_method(entry.arcname, policy)
+    data = entry.data
+
+    if data is None and (method == ZIP_DEFLATED or entry.size <= INLINE_LIMIT):
+        with open(entry.path, 'rb') as f:
+            data = f.read()
+
+    if data is None:
+        # Large stored member: checksum now, stream it in the writer
+        crc = 0
+        size = 0
+        digest = hashlib.sha256()
+        with open(entry.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+                crc = zlib.crc32(chunk, crc)
+                digest.update(chunk)
+                size += len(chunk)
+        digest = digest.hexdigest()
+        if previous is not None:
+            reused = previous.reuse(entry, digest)
+            if reused is not None:
+                return reused
+        return EncodedMember(entry, ZIP_STORED, crc, size, size, digest=digest)
+
+    digest = hashlib.sha256(data).hexdigest()
+    if previous is not None:
+        # Touched but identical content is still reusable
+        reused = previous.reuse(entry, digest)
+        if reused is not None:
+            return reused
+
+    crc = zlib.crc32(data)
+
+    if method == ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = compressor.compress(data) + compressor.flush()
+        # Keep the raw bytes when deflate doesn't help
+        if len(compressed) < len(data):
+            return EncodedMember(entry, ZIP_DEFLATED, crc, len(data), len(compressed), compressed,
+                                 digest=digest)
+
+    return EncodedMember(entry, ZIP_STORED, crc, len(data), len(data), data, digest=digest)
+
+
+def _dos_datetime(timestamp):
+    """Convert a POSIX timestamp to ZIP (DOS) date and time fields."""
+    t = time.localtime(timestamp)
+    year = min(max(t.tm_year, 1980), 2107)
+    dos_date = (year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+    dos_time = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+    return dos_time, dos_date
+
+
+class ArchiveWriter:
+    """
+    Sequential ZIP writer that accepts already-encoded member payloads.
+
+    Unlike zipfile.ZipFile, members are written from precomputed CRCs and
+    compressed bytes, so compression can happen elsewhere (or not at all,
+    when raw bytes are copied from another archive). ZIP64 records are
+    emitted only when sizes, offsets or counts require them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fp = open(path, 'wb')
+        # Archives that raw member bytes are copied from, by path
+        self.raw_sources = {}
+        self.records = []
+        self.bytes_written = 0
+
+    def write_header(self, arcname, method, crc, file_size, compress_size, mtime):
+        """Write a local file header; the caller writes the payload next."""
+        name = arcname.encode('utf-8')
+        flags = 0 if arcname.isascii() else _UTF8_FLAG
+        dos_time, dos_date = _dos_datetime(mtime)
+        offset = self.fp.tell()
+
+        zip64 = file_size >= _ZIP64_LIMIT or compress_size >= _ZIP64_LIMIT
+        if zip64:
+            extra = struct.pack('<HHQQ', 1, 16, file_size, compress_size)
+            header_sizes = (_ZIP64_LIMIT, _ZIP64_LIMIT)
+            version = _VERSION_ZIP64
+        else:
+            extra = b''
+            header_sizes = (compress_size, file_size)
+            version = _VERSION_DEFAULT
+
+        self.fp.write(_LOCAL_HEADER.pack(
+            0x04034b50, version, flags, method, dos_time, dos_date,
+            crc, header_sizes[0], header_sizes[1], len(name), len(extra)
+        ))
+        self.fp.write(name)
+        self.fp.write(extra)
+
+        self.records.append({
+            'name': name,
+            'flags': flags,
+            'method': method,
+            'time': dos_time,
+            'date': dos_date,
+            'crc': crc,
+            'file_size': file_size,
+            'compress_size': compress_size,
+            'offset': offset,
+        })
+
+    def write_member(self, member):
+        """Write an EncodedMember (header and payload)."""
+        entry = member.entry
+        self.write_header(
+            entry.arcname, member.method, member.crc,
+            member.file_size, member.compress_size, entry.mtime
+        )
+        if member.payload is not None:
+            self.fp.write(member.payload)
+        elif member.raw_source is not None:
+            source_path, offset = member.raw_source
+            src = self.raw_sources.get(source_path)
+            if src is None:
+                src = self.raw_sources[source_path] = open(source_path, 'rb')
+            src.seek(offset)
+            remaining = member.compress_size
+            while remaining:
+                chunk = src.read(min(COPY_BUFFER_SIZE, remaining))
+                if not chunk:
+                    raise EOFError(f"Truncated member in {source_path}: {entry.arcname}")
+                self.fp.write(chunk)
+                remaining -= len(chunk)
+        else:
+            with open(entry.path, 'rb') as src:
+                shutil.copyfileobj(src, self.fp, COPY_BUFFER_SIZE)
+        self.bytes_written += member.compress_size
+
+    def close(self):
+        """Write the central directory and end records, then close the file."""
+        cd_offset = self.fp.tell()
+
+        for record in self.records:
+            extra_values = []
+            if record['file_size'] >= _ZIP64_LIMIT:
+                extra_values.append(record['file_size'])
+            if record['compress_size'] >= _ZIP64_LIMIT:
+                extra_values.append(record['compress_size'])
+            if record['offset'] >= _ZIP64_LIMIT:
+                extra_values.append(record['offset'])
+
+            if extra_values:
+                extra = struct.pack(f'<HH{len(extra_values)}Q', 1, 8 * len(extra_values), *extra_values)
+                version = _VERSION_ZIP64
+            else:
+                extra = b''
+                version = _VERSION_DEFAULT
+
+            self.fp.write(_CENTRAL_HEADER.pack(
+                0x02014b50, _CREATE_SYSTEM_UNIX << 8 | version, version,
+                record['flags'], record['method'], record['time'], record['date'],
+                record['crc'],
+                min(record['compress_size'], _ZIP64_LIMIT),
+                min(record['file_size'], _ZIP64_LIMIT),
+                len(record['name']), len(extra), 0, 0, 0,
+                _FILE_ATTRIBUTES,
+                min(record['offset'], _ZIP64_LIMIT),
+            ))
+            self.fp.write(record['name'])
+            self.fp.write(extra)
+
+        cd_end = self.fp.tell()
+        cd_size = cd_end - cd_offset
+        count = len(self.records)
+
+        if count >= _ZIP64_COUNT_LIMIT or cd_offset >= _ZIP64_LIMIT or cd_size >= _ZIP64_LIMIT:
+            self.fp.write(_END_RECORD64.pack(
+                0x06064b50, _END_RECORD64.size - 12,
+                _CREATE_SYSTEM_UNIX << 8 | _VERSION_ZIP64, _VERSION_ZIP64,
+                0, 0, count, count, cd_size, cd_offset
+            ))
+            self.fp.write(_END_LOCATOR64.pack(0x07064b50, 0, cd_end, 1))
+
+        self.fp.write(_END_RECORD.pack(
+            0x06054b50, 0, 0,
+            min(count, _ZIP64_COUNT_LIMIT), min(count, _ZIP64_COUNT_LIMIT),
+            min(cd_size, _ZIP64_LIMIT), min(cd_offset, _ZIP64_LIMIT), 0
+        ))
+        self._close_files()
+
+    def abort(self):
+        """Close the file without finishing the archive."""
+        self._close_files()
+
+    def _close_files(self):
+        self.fp.close()
+        for src in self.raw_sources.values():
+            src.close()
+
+
+def write_archive(entries, output_zip, jobs=None, level=DEFAULT_COMPRESSION_LEVEL,
+                  policy=None, progress=True, incremental=True):
+    """
+    Encode entries in parallel and write them to a new archive.
+
+    Workers compress members ahead of the writer within a bounded window,
+    and the single writer appends them in entry order, so the archive
+    layout is deterministic. The archive is written to a temporary file
+    and moved into place once complete, together with a content-hash
+    manifest. With incremental=True, members unchanged since the previous
+    build are copied from the previous archive as raw compressed bytes.
+
+    Args:
+        entries: List of PackageEntry objects
+        output_zip: Output ZIP filename
+        jobs: Number of compression workers (defaults to CPU count)
+        level: Deflate level for compressible members
+        policy: Optional per-extension compression override
+        progress: Whether to print progress and throughput
+        incremental: Whether to reuse members from the previous archive
+
+    Returns:
+        dict: Packaging statistics
+    """
+    output_path = os.path.abspath(output_zip)
+    tmp_path = output_path + '.tmp'
+    jobs = jobs or default_jobs()
+
+    previous = PreviousArchive.load(output_path, level, policy) if incremental else None
+
+    reporter = ProgressReporter(
+        "Packaging", len(entries), sum(e.size for e in entries), enabled=progress
+    )
+    counts = {ZIP_STORED: 0, ZIP_DEFLATED: 0}
+    reused = 0
+    manifest_members = {}
+
+    writer = ArchiveWriter(tmp_path)
+    try:
+        def emit(member):
+            nonlocal reused
+            writer.write_member(member)
+            counts[member.method] += 1
+            reused += member.reused
+            manifest_members[member.entry.arcname] = member.manifest_record()
+            reporter.update(files=1, nbytes=member.file_size)
+
+        if jobs <= 1:
+            for entry in entries:
+                emit(encode_entry(entry, level, policy, previous))
+        else:
+            window = jobs * WINDOW_PER_WORKER
+            pending = deque()
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                for entry in entries:
+                    pending.append(executor.submit(encode_entry, entry, level, policy, previous))
+                    if len(pending) >= window:
+                        emit(pending.popleft().result())
+                while pending:
+                    emit(pending.popleft().result())
+        writer.close()
+    except BaseException:
+        writer.abort()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        if previous:
+            previous.close()
+
+    os.replace(tmp_path, output_path)
+    save_manifest(output_path, level, policy, manifest_members)
+
+    stats = reporter.finish()
+    stats.update({
+        'stored': counts[ZIP_STORED],
+        'deflated': counts[ZIP_DEFLATED],
+        'reused': reused,
+        'encoded': len(entries) - reused,
+        'compressed_bytes': writer.bytes_written,
+        'archive_bytes': os.path.getsize(output_path),
+    })
+    return stats
+
+
+def save_manifest(output_zip, level, policy, members):
+    """
+    Write the content-hash manifest for an archive.
+
+    Args:
+        output_zip: Archive the manifest describes
+        level: Deflate level the archive was built with
+        policy: Compression policy override the archive was built with
+        members: Dict of arcname -> manifest record
+    """
+    manifest_path = manifest_path_for(output_zip)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'level': level,
+        'policy': _policy_key(policy),
+        'members': members,
+    }
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp_path, manifest_path)
+
+
+def build_archive(source_dir, output_zip, jobs=None, level=DEFAULT_COMPRESSION_LEVEL,
+                  policy=None, progress=True, incremental=True, source_zip=None, exclude_names=None,
+                  generated=None):
+    """
+    Package a directory into a ZIP archive.
+
+    Args:
+        source_dir: Directory to archive
+        output_zip: Output ZIP filename
+        jobs: Number of compression workers (defaults to CPU count)
+        level: Deflate level for compressible members
+        policy: Optional per-extension compression override
+        progress: Whether to print progress and throughput
+        incremental: Whether to reuse members from the previous archive
+        source_zip: Optional path of a source ZIP that source_dir overlays
+        exclude_names: Optional archive names to leave out (e.g. duplicate tiles)
+        generated: Optional dict of archive name -> bytes added to the archive,
+            replacing files on disk with the same name
+
+    Returns:
+        dict: Packaging statistics
+    """
+    output_path = os.path.abspath(output_zip)
+    source = ZipSource(source_zip) if source_zip else None
+    # Never archive the output, its temporary file or its manifest into itself
+    manifest_path = manifest_path_for(output_path)
+    entries = collect_entries(source_dir, exclude=[
+        output_path, output_path + '.tmp', manifest_path, manifest_path + '.tmp'
+    ], source_zip=source, exclude_names=exclude_names)
+    if generated:
+        entries = [entry for entry in entries if entry.arcname not in generated]
+        entries.extend(PackageEntry(name, data=data) for name, data in generated.items())
+        entries.sort(key=lambda e: e.arcname)
+    try:
+        return write_archive(entries, output_path, jobs=jobs, level=level, policy=policy,
+                             progress=progress, incremental=incremental)
+    finally:
+        if source:
+            source.close()
@@ -3,14 +3,228 @@ Data parser for Marzipano data.js files.
 Handles conversion between JavaScript and Python data structures.
 """
 
+import gzip
 import json
+import os
 import re
 
 
+class DataJsSyntaxError(ValueError):
+    """Syntax error in data.js, with the source position it occurred at."""
+    
+    def __init__(self, message, line, column):
+        super().__init__(f"{message} (line {line}, column {column})")
+        self.line = line
+        self.column = column
+
+
+_APP_DATA = re.compile(r'\bAPP_DATA\s*=\s*')
+_WHITESPACE = re.compile(r'(?:\s+|//[^\n]*|/\*.*?\*/)*', re.DOTALL)
+
+# One token, preceded by any whitespace and comments
+_TOKEN = re.compile(r"""
+    (?:\s+|//[^\n]*|/\*.*?\*/)*
+    (?:
+        (?P<punct>[{}\[\]:,])
+      | "(?P<dq>(?:[^"\\\r\n]|\\(?:\r\n|[\s\S]))*)"
+      | '(?P<sq>(?:[^'\\\r\n]|\\(?:\r\n|[\s\S]))*)'
+      | (?P<num>[+-]?(?:0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?))
+      | (?P<ident>[A-Za-z_$][\w$]*)
+    )
+""", re.DOTALL | re.VERBOSE)
+
+_ESCAPE = re.compile(r'\\(u\{[0-9a-fA-F]+\}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|\r\n|[\s\S])')
+_SIMPLE_ESCAPES = {
+    'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0',
+    '\n': '', '\r\n': '', '\r': '', '\u2028': '', '\u2029': '',
+}
+_KEYWORDS = {
+    'true': True, 'false': False, 'null': None, 'undefined': None,
+    'NaN': float('nan'), 'Infinity': float('inf'),
+}
+_JSON_DECODER = json.JSONDecoder()
+
+# Keys rounded in compact output (view angles, in radians)
+ROUNDED_KEYS = {'yaw', 'pitch', 'fov', 'roll', 'rotation'}
+
+# Decimal places kept for ROUNDED_KEYS; 1e-4 rad is well under a pixel
+DEFAULT_PRECISION = 4
+
+# Fields only the editor and build steps use, left out of the shipped
+# data.js ('*' matches every list item or object key)
+EDITOR_ONLY_KEYS = (
+    'scenes.*.entryAngles',
+    'scenes.*.currentViewParameters',
+)
+
+# Failed JSON fast-path attempts before parsing the rest token by token;
+# each failure costs a scan up to the error position
+_MAX_JSON_ATTEMPT_FAILURES = 16
+
+
+def _unescape(match):
+    escape = match.group(1)
+    if escape[0] == 'u' and len(escape) > 1:
+        code = int(escape[2:-1] if escape[1] == '{' else escape[1:], 16)
+        return chr(code)
+    if escape[0] == 'x' and len(escape) == 3:
+        return chr(int(escape[1:], 16))
+    return _SIMPLE_ESCAPES.get(escape, escape)
+
+
+def _convert_number(literal):
+    body = literal.lstrip('+-')
+    sign = -1 if literal.startswith('-') else 1
+    if body[:2] in ('0x', '0X'):
+        return sign * int(body, 16)
+    if '.' in body or 'e' in body or 'E' in body:
+        return float(literal)
+    return int(literal)
+
+
+class _JsLiteralParser:
+    """
+    Single-pass recursive-descent parser for JavaScript object literals.
+    
+    Accepts the subset of JavaScript that Marzipano Tool and hand edits
+    produce: single- or double-quoted strings with escapes, unquoted keys,
+    trailing commas, comments, hex numbers and the usual keywords. Each
+    token is read by one anchored regular expression match at the current
+    offset, so the source is never copied. Subtrees that happen to be strict
+    JSON (almost all of a Marzipano Tool export) are decoded by the C JSON
+    scanner in one go. The number of failed JSON attempts is capped, so
+    sources that are not JSON at all are tokenized and stay linear.
+    """
+    
+    def __init__(self, text, pos=0):
+        self.text = text
+        self.pos = pos
+        self.json_failures = 0
+    
+    def error(self, message, pos=None):
+        pos = self.pos if pos is None else pos
+        line = self.text.count('\n', 0, pos) + 1
+        column = pos - self.text.rfind('\n', 0, pos)
+        return DataJsSyntaxError(message, line, column)
+    
+    def next_token(self):
+        match = _TOKEN.match(self.text, self.pos)
+        if match is None:
+            pos = _WHITESPACE.match(self.text, self.pos).end()
+            if pos >= len(self.text):
+                raise self.error("Unexpected end of data.js", pos)
+            raise self.error(f"Unexpected character '{self.text[pos]}'", pos)
+        self.pos = match.end()
+        return match
+    
+    def unexpected(self, token, expected):
+        kind = token.lastgroup
+        return self.error(f"Expected {expected} but found '{token.group(kind)}'", token.start(kind))
+    
+    @staticmethod
+    def string_value(token, kind):
+        body = token.group(kind)
+        if '\\' in body:
+            body = _ESCAPE.sub(_unescape, body)
+        return body
+    
+    def parse_value(self):
+        if self.json_failures < _MAX_JSON_ATTEMPT_FAILURES:
+            start = _WHITESPACE.match(self.text, self.pos).end()
+            if self.text.startswith(('{', '[', '"'), start):
+                try:
+                    value, self.pos = _JSON_DECODER.raw_decode(self.text, start)
+                    return value
+                except ValueError:
+                    self.json_failures += 1
+        
+        token = self.next_token()
+        kind = token.lastgroup
+        if kind == 'punct':
+            char = token.group(kind)
+            if char == '{':
+                return self.parse_object()
+            if char == '[':
+                return self.parse_array()
+        elif kind == 'dq' or kind == 'sq':
+            return self.string_value(token, kind)
+        elif kind == 'num':
+            return _convert_number(token.group(kind))
+        elif token.group(kind) in _KEYWORDS:
+            return _KEYWORDS[token.group(kind)]
+        raise self.unexpected(token, "a value")
+    
+    def parse_object(self):
+        result = {}
+        while True:
+            token = self.next_token()
+            kind = token.lastgroup
+            if kind == 'dq' or kind == 'sq':
+                key = self.string_value(token, kind)
+            elif kind == 'ident' or kind == 'num':
+                key = token.group(kind)
+            elif token.group(kind) == '}':
+                return result  # Empty object or trailing comma
+            else:
+                raise self.unexpected(token, "a property name")
+            
+            token = self.next_token()
+            if token.group('punct') != ':':
+                raise self.unexpected(token, "':'")
+            result[key] = self.parse_value()
+            
+            token = self.next_token()
+            char = token.group('punct')
+            if char == '}':
+                return result
+            if char != ',':
+                raise self.unexpected(token, "',' or '}'")
+    
+    def parse_array(self):
+        result = []
+        while True:
+            start = self.pos
+            token = self.next_token()
+            if token.group('punct') == ']':
+                return result  # Empty array or trailing comma
+            self.pos = start
+            result.append(self.parse_value())
+            
+            token = self.next_token()
+            char = token.group('punct')
+            if char == ']':
+                return result
+            if char != ',':
+                raise self.unexpected(token, "',' or ']'")
+
+
+def parse_js_literal(text, start=0):
+    """
+    Parse a JavaScript object/array literal into Python objects.
+    
+    Args:
+        text: JavaScript source
+        start: Offset of the literal in text
+        
+    Returns:
+        tuple: (value, offset just past the literal)
+        
+    Raises:
+        DataJsSyntaxError: If the literal is malformed
+    """
+    literal_parser = _JsLiteralParser(text, start)
+    value = literal_parser.parse_value()
+    return value, literal_parser.pos
+
+
 def parse_data_js(file_path):
     """
     Parse data.js file and extract the APP_DATA object.
     
+    The object literal is tokenized in a single pass, so apostrophes in
+    scene names, embedded hotspot HTML and trailing commas are handled,
+    and errors report the line and column in data.js.
+    
     Args:
         file_path: Path to data.js file
         
@@ -20,39 +234,143 @@ def parse_data_js(file_path):
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
     
-    # Extract the JavaScript object
     # Looking for: var APP_DATA = { ... };
-    match = re.search(r'var\s+APP_DATA\s*=\s*({.*?});', content, re.DOTALL)
+    match = _APP_DATA.search(content)
     if not match:
         raise ValueError("Could not find APP_DATA in data.js")
     
-    js_object = match.group(1)
+    data, _ = parse_js_literal(content, match.end())
+    if not isinstance(data, dict):
+        raise ValueError("APP_DATA in data.js is not an object")
+    return data
+
+
+def _round_angles(value, precision):
+    if isinstance(value, dict):
+        return {
+            key: _round_number(item, precision) if key in ROUNDED_KEYS and isinstance(item, float)
+            else _round_angles(item, precision)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_round_angles(item, precision) for item in value]
+    return value
+
+
+def _round_number(number, precision):
+    number = round(number, precision)
+    return int(number) if number.is_integer() else number
+
+
+def _strip_path(value, parts):
+    if isinstance(value, list):
+        if parts[0] == '*':
+            return [_strip_path(item, parts[1:]) for item in value]
+        return value
+    if not isinstance(value, dict):
+        return value
+    if len(parts) == 1:
+        return {key: item for key, item in value.items() if parts[0] not in ('*', key)}
+    return {
+        key: _strip_path(item, parts[1:]) if parts[0] in ('*', key) else item
+        for key, item in value.items()
+    }
+
+
+def compact_data(data, precision=DEFAULT_PRECISION, strip=EDITOR_ONLY_KEYS):
+    """
+    Copy of tour data reduced to what the player needs.
     
-    # Convert JavaScript to JSON (basic conversion)
-    # Handle trailing commas and single quotes
-    json_str = js_object
-    json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)  # Remove trailing commas
-    json_str = json_str.replace("'", '"')  # Replace single quotes
+    Args:
+        data: Tour data (not modified)
+        precision: Decimal places kept for view angles (None keeps all)
+        strip: Dotted key paths to drop, '*' matching any item
+        
+    Returns:
+        dict: Compacted tour data
+    """
+    for path in strip or ():
+        data = _strip_path(data, path.split('.'))
+    if precision is not None:
+        data = _round_angles(data, precision)
+    return data
+
+
+def compact_json(value):
+    """
+    JSON without whitespace, safe to embed as a JavaScript literal.
+    
+    Args:
+        value: JSON-serializable value
+        
+    Returns:
+        str: Serialized value
+    """
+    payload = json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+    # Raw line separators are not valid inside older engines' string literals
+    return payload.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+
+def data_js_content(data, compact=False, precision=DEFAULT_PRECISION):
+    """
+    Content of data.js for tour data.
     
-    try:
-        data = json.loads(json_str)
-        return data
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Error parsing data.js: {e}")
+    Args:
+        data: Python dictionary with tour data
+        compact: Strip editor-only keys, round view angles and drop whitespace
+        precision: Decimal places kept for view angles in compact mode
+        
+    Returns:
+        bytes: UTF-8 encoded script
+    """
+    if not compact:
+        return ("var APP_DATA = " + json.dumps(data, indent=2) + ";").encode('utf-8')
+    return ("var APP_DATA=" + compact_json(compact_data(data, precision)) + ";\n").encode('utf-8')
+
+
+def gzip_content(content):
+    """Reproducible gzip compression of bytes (no timestamp or file name)."""
+    return gzip.compress(content, compresslevel=9, mtime=0)
 
 
-def generate_data_js(data, output_path):
+def generate_data_js(data, output_path, compact=False, precision=DEFAULT_PRECISION):
     """
     Generate clean data.js from Python dictionary.
     
+    In compact mode editor-only keys are stripped, view angles rounded and
+    the JSON written without whitespace; a gzip-compressed '.gz' sibling is
+    written next to it for servers that serve precompressed files.
+    
     Args:
         data: Python dictionary with tour data
         output_path: Where to write data.js
+        compact: Write the compact form and its .gz sibling
+        precision: Decimal places kept for view angles in compact mode
+        
+    Returns:
+        dict: Bytes written ('bytes'); in compact mode also 'gzip_bytes' and
+            'full_bytes', the size the regular output would have had
     """
-    js_content = "var APP_DATA = " + json.dumps(data, indent=2) + ";"
+    content = data_js_content(data, compact, precision)
+    gz_path = output_path + '.gz'
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(js_content)
+    with open(output_path, 'wb') as f:
+        f.write(content)
+    if not compact:
+        if os.path.exists(gz_path):
+            # A stale sibling would be served instead of the new data.js
+            os.remove(gz_path)
+        return {'bytes': len(content)}
+    
+    compressed = gzip_content(content)
+    with open(gz_path, 'wb') as f:
+        f.write(compressed)
+    
+    return {
+        'full_bytes': len(data_js_content(data)),
+        'bytes': len(content),
+        'gzip_bytes': len(compressed),
+    }
 
 
 def data_to_json(data, output_path):
@@ -81,3 +399,22 @@ def json_to_data(json_path):
         return json.load(f)
 
 
+
+
+def load_config(config_path):
+    """
+    Load config.json saved by the editor.
+    
+    The editor saves {"tourData": ..., "viewConfig": ...}; a bare tour
+    data object (APP_DATA) is accepted as well.
+    
+    Args:
+        config_path: Path to config.json
+        
+    Returns:
+        tuple: (tour data, view config or None)
+    """
+    config = json_to_data(config_path)
+    if isinstance(config, dict) and 'tourData' in config:
+        return config['tourData'], config.get('viewConfig')
+    return config, None
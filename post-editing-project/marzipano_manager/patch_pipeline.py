@@ -0,0 +1,115 @@
+"""
+Single-pass patch pipeline for tour files.
+A file is read once, run through an ordered list of idempotent patches in
+memory and written back atomically, only if something changed.
+"""
+
+import os
+
+
+APPLIED = 'applied'
+SKIPPED = 'skipped'          # already applied or nothing to patch
+NOT_APPLICABLE = 'not applicable'
+
+
+class PatchNotApplicable(Exception):
+    """Raised by a patch whose anchor is missing from the file."""
+
+
+class PatchPipeline:
+    """
+    Ordered list of patches for one file.
+
+    A patch is a function taking the file content (plus any arguments
+    given at registration) and returning the new content. Returning the
+    content unchanged means the patch was already applied; raising
+    PatchNotApplicable means the file has nothing it can patch.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.patches = []
+
+    def register(self, name, patch, *args, **kwargs):
+        """
+        Add a patch to the end of the pipeline.
+
+        Args:
+            name: Name shown in the report
+            patch: Function (content, *args, **kwargs) -> content
+        """
+        self.patches.append((name, patch, args, kwargs))
+        return self
+
+    def run(self):
+        """
+        Apply all patches and write the file once.
+
+        Nothing is written if a patch fails, so an error never leaves a
+        half-patched file behind.
+
+        Returns:
+            list: {'file', 'patch', 'status', 'detail'} dicts in patch order
+                (empty if the file does not exist)
+        """
+        if not os.path.exists(self.path):
+            print(f"⚠️  Warning: {self.path} not found")
+            return []
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            original = f.read()
+
+        content = original
+        report = []
+        name = os.path.basename(self.path)
+        for patch_name, patch, args, kwargs in self.patches:
+            try:
+                patched = patch(content, *args, **kwargs)
+            except PatchNotApplicable as e:
+                report.append({'file': name, 'patch': patch_name, 'status': NOT_APPLICABLE, 'detail': str(e)})
+                continue
+            status = APPLIED if patched != content else SKIPPED
+            report.append({'file': name, 'patch': patch_name, 'status': status, 'detail': ''})
+            content = patched
+
+        if content != original:
+            atomic_write(self.path, content)
+        return report
+
+
+def atomic_write(path, content):
+    """Write a text file through a temporary sibling and an atomic rename."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def run_pipelines(*pipelines):
+    """
+    Run several pipelines and combine their reports.
+
+    Returns:
+        list: Report entries of all pipelines
+    """
+    report = []
+    for pipeline in pipelines:
+        report.extend(pipeline.run())
+    return report
+
+
+def print_report(report):
+    """Print one status line per patch."""
+    for entry in report:
+        label = f"{entry['file']}: {entry['patch']}"
+        if entry['status'] == APPLIED:
+            print(f"  ✓ {label}")
+        elif entry['status'] == SKIPPED:
+            print(f"  ℹ️  {label} (nothing to do)")
+        else:
+            print(f"  ⚠️  {label} skipped: {entry['detail']}")
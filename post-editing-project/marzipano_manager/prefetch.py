@@ -0,0 +1,231 @@
+"""
+Prefetch manifest generation from the tour's link graph.
+For every link, lists the target's preview and the tiles visible from the
+view the user lands on, so the runtime can warm them before the jump.
+"""
+
+import json
+import math
+import os
+
+from .tour_graph import TourGraph
+from .zip_source import ZipSource
+
+
+# Viewport the manifest is computed for (CSS pixels)
+DEFAULT_VIEWPORT = (1920, 1080)
+
+# Rays cast per axis when finding visible tiles
+SAMPLES = 24
+
+# Default per-scene byte budget the runtime may spend on prefetching
+DEFAULT_BUDGET = 4 * 1024 * 1024
+
+MANIFEST_FILENAME = 'prefetch.json'
+
+
+def view_direction(yaw, pitch, sx, sy, tan_h, tan_v):
+    """
+    World direction through a screen point of a rectilinear view.
+
+    Uses Marzipano's conventions: yaw turns right, pitch looks down, and
+    the cube's front face looks down -z.
+
+    Args:
+        yaw, pitch: View parameters in radians
+        sx, sy: Screen position in [-1, 1] (x right, y down)
+        tan_h, tan_v: Tangents of the half field of view
+
+    Returns:
+        tuple: (x, y, z)
+    """
+    cx, cy, cz = sx * tan_h, -sy * tan_v, -1.0
+
+    cos_p, sin_p = math.cos(pitch), math.sin(pitch)
+    y = cy * cos_p + cz * sin_p
+    z = -cy * sin_p + cz * cos_p
+
+    cos_y, sin_y = math.cos(yaw), math.sin(yaw)
+    return cx * cos_y - z * sin_y, y, cx * sin_y + z * cos_y
+
+
+def cube_position(x, y, z):
+    """
+    Face and face coordinates hit by a direction.
+
+    Returns:
+        tuple: (face, a, b) with a to the right and b up, both in [-0.5, 0.5]
+    """
+    ax, ay, az = abs(x), abs(y), abs(z)
+    if az >= ax and az >= ay:
+        t = 0.5 / az
+        return ('f', x * t, y * t) if z < 0 else ('b', -x * t, y * t)
+    if ax >= ay:
+        t = 0.5 / ax
+        return ('r', z * t, y * t) if x > 0 else ('l', -z * t, y * t)
+    t = 0.5 / ay
+    return ('u', x * t, z * t) if y > 0 else ('d', x * t, -z * t)
+
+
+def select_level(levels, fov, viewport):
+    """
+    Level Marzipano would display for a view: the smallest one whose
+    resolution covers the viewport, or the largest available.
+
+    Args:
+        levels: Scene levels from data.js
+        fov: Vertical field of view in radians
+        viewport: (width, height) in pixels
+
+    Returns:
+        int: Index of the level in levels
+    """
+    needed = viewport[1] / math.tan(fov / 2)
+    selectable = [i for i, level in enumerate(levels) if not level.get('fallbackOnly')]
+    if not selectable:
+        return len(levels) - 1
+    for index in selectable:
+        if levels[index]['size'] >= needed:
+            return index
+    return selectable[-1]
+
+
+def visible_tiles(scene, view, viewport=DEFAULT_VIEWPORT, samples=SAMPLES):
+    """
+    Tiles of a scene visible in a view.
+
+    Args:
+        scene: Scene dict (levels)
+        view: {yaw, pitch, fov}
+        viewport: (width, height) in pixels
+        samples: Rays cast per axis
+
+    Returns:
+        list: (z, face, y, x) tuples in screen order, centre first
+    """
+    levels = scene.get('levels') or []
+    if not levels:
+        return []
+
+    fov = view.get('fov', math.pi / 2)
+    z = select_level(levels, fov, viewport)
+    level = levels[z]
+    count = level['size'] // level['tileSize']
+
+    tan_v = math.tan(fov / 2)
+    tan_h = tan_v * viewport[0] / viewport[1]
+    yaw, pitch = view.get('yaw', 0), view.get('pitch', 0)
+
+    tiles = {}
+    for i in range(samples + 1):
+        for j in range(samples + 1):
+            sx = 2 * i / samples - 1
+            sy = 2 * j / samples - 1
+            face, a, b = cube_position(*view_direction(yaw, pitch, sx, sy, tan_h, tan_v))
+            col = min(int((a + 0.5) * count), count - 1)
+            row = min(int((0.5 - b) * count), count - 1)
+            distance = sx * sx + sy * sy
+            key = (z, face, row, col)
+            if key not in tiles or distance < tiles[key]:
+                tiles[key] = distance
+
+    return sorted(tiles, key=lambda key: tiles[key])
+
+
+def entry_view(view_config, graph, source_id, target_id):
+    """
+    View the user lands on when following a link, as the runtime picks it.
+
+    Args:
+        view_config: Loaded view_config.json (may be empty)
+        graph: TourGraph of the tour
+        source_id, target_id: Link endpoints
+
+    Returns:
+        dict: {yaw, pitch, fov}
+    """
+    target = graph.scene(target_id)
+    initial = target.get('initialViewParameters', {})
+    config = view_config.get(target_id, {})
+    entry = config.get('ifCameFrom', {}).get(source_id)
+    if entry:
+        return entry
+
+    # Runtime fallback: auto-180 from the clicked hotspot
+    for hotspot in graph.links_from(source_id):
+        if hotspot['target'] == target_id:
+            yaw = hotspot.get('yaw', 0) + math.pi
+            yaw = (yaw + math.pi) % (2 * math.pi) - math.pi
+            return {'yaw': yaw, 'pitch': 0, 'fov': initial.get('fov', math.pi / 2)}
+    return initial
+
+
+def build_manifest(tour_data, view_config, work_dir, budget=DEFAULT_BUDGET, viewport=DEFAULT_VIEWPORT,
+                   source_zip=None):
+    """
+    Build the prefetch manifest.
+
+    Args:
+        tour_data: Tour data (APP_DATA)
+        view_config: View configuration (may be empty)
+        work_dir: Tour directory, used to look up file sizes
+        budget: Bytes the runtime may prefetch per scene visit
+        viewport: Viewport the visible tiles are computed for
+        source_zip: Source ZIP when work_dir is an overlay; sizes of files
+            not on disk are taken from its member index
+
+    Returns:
+        dict: {budget, scenes: {scene id: [{target, assets: [[url, bytes], ...]}]}}
+    """
+    graph = TourGraph(tour_data)
+    app_files = os.path.join(work_dir, 'app-files')
+    sizes = {}
+    members = {}
+    if source_zip:
+        source = ZipSource(source_zip)
+        members = source.members
+        source.close()
+
+    def asset(url):
+        if url not in sizes:
+            path = os.path.join(app_files, *url.split('/'))
+            if os.path.exists(path):
+                sizes[url] = os.path.getsize(path)
+            else:
+                info = members.get(f"app-files/{url}")
+                sizes[url] = info.file_size if info is not None else 0
+        return [url, sizes[url]]
+
+    scenes = {}
+    for source_id in graph.scenes:
+        links = []
+        seen = set()
+        for hotspot in graph.links_from(source_id):
+            target_id = hotspot['target']
+            if target_id in seen or graph.scene(target_id) is None:
+                continue
+            seen.add(target_id)
+
+            view = entry_view(view_config, graph, source_id, target_id)
+            prefix = f"tiles/{target_id}"
+            assets = [asset(f"{prefix}/preview.jpg")]
+            for z, face, row, col in visible_tiles(graph.scene(target_id), view, viewport):
+                assets.append(asset(f"{prefix}/{z}/{face}/{row}/{col}.jpg"))
+            links.append({'target': target_id, 'assets': assets})
+        if links:
+            scenes[source_id] = links
+
+    return {'budget': budget, 'scenes': scenes}
+
+
+def write_manifest(manifest, work_dir):
+    """
+    Write app-files/prefetch.json.
+
+    Returns:
+        str: Path of the manifest
+    """
+    path = os.path.join(work_dir, 'app-files', MANIFEST_FILENAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    return path
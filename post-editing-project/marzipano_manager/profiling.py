@@ -0,0 +1,274 @@
+"""
+Per-stage profiling of init and build runs.
+Records wall and CPU time, bytes read and written and files opened for
+every stage and writes them as a Chrome trace (chrome://tracing, Perfetto).
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+
+# Profiler currently recording; the audit hook below reports opened files to it
+_active = None
+_hook_installed = False
+
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_APPEND
+
+
+def _audit_open(event, args):
+    if event != 'open' or _active is None:
+        return
+    path, mode, flags = args
+    if not isinstance(path, str) or path.endswith('.pyc') or path.startswith('/proc/'):
+        return  # File descriptors, lazy imports and the profiler's own counters
+    if isinstance(mode, str):
+        writing = any(c in mode for c in 'wax+')
+    else:
+        writing = bool(flags & _WRITE_FLAGS)
+    _active._record_open(path, writing)
+
+
+def _io_counters():
+    """
+    Bytes read and written by this process so far.
+
+    Uses /proc/self/io (rchar/wchar: bytes passed through read/write calls,
+    including those served from the page cache). Returns (None, None) where
+    it is unavailable.
+    """
+    try:
+        with open('/proc/self/io', 'rb') as f:
+            counters = dict(line.split(b':') for line in f.read().splitlines())
+        return int(counters[b'rchar']), int(counters[b'wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _cpu_seconds():
+    """User + system time of all threads and of finished child processes."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class _Sample:
+    """Counters at one point in time."""
+
+    def __init__(self):
+        self.bytes_read, self.bytes_written = _io_counters()
+        self.cpu = _cpu_seconds()
+        self.wall = time.perf_counter()
+
+
+class StageProfiler:
+    """
+    Splits a run into consecutive stages and measures each one.
+
+    Stages are marked with stage(name); a stage ends where the next begins
+    or when the run finishes. File counts come from 'open' audit events of
+    every thread; files written by child processes are not counted, but
+    their CPU time is once they have exited.
+
+    A disabled profiler (the default) ignores every call, so callers can
+    mark stages unconditionally.
+    """
+
+    def __init__(self, enabled=True, trace_path=None, cprofile=False, tracemalloc=False):
+        """
+        Args:
+            enabled: Record anything at all
+            trace_path: Chrome trace JSON to write when the run finishes
+            cprofile: Also run the main thread under cProfile; statistics are
+                saved next to the trace as .prof and the top entries printed
+            tracemalloc: Also trace Python allocations (slow): peak memory
+                per stage and the top allocation sites
+        """
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+        self.run_name = None
+        self.stages = []
+        self._current = None
+        self._run_start = None
+        self._profile = None
+        self._lock = threading.Lock()
+
+    def start(self, run_name):
+        """
+        Begin recording a run.
+
+        Args:
+            run_name: Name of the run, e.g. 'build'
+        """
+        global _active, _hook_installed
+        if not self.enabled:
+            return
+        self.run_name = run_name
+        self.stages = []
+        _active = self
+        if not _hook_installed:
+            sys.addaudithook(_audit_open)
+            _hook_installed = True
+
+        if self.tracemalloc:
+            import tracemalloc
+            tracemalloc.start()
+        if self.cprofile:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._run_start = _Sample()
+
+    def stage(self, name):
+        """
+        End the current stage (if any) and begin the next one.
+
+        Args:
+            name: Stage name shown in the summary and trace
+        """
+        if not self.enabled or self._run_start is None:
+            return
+        self._end_stage()
+        if self.tracemalloc:
+            import tracemalloc
+            tracemalloc.reset_peak()
+        self._current = {
+            'name': name,
+            'start': _Sample(),
+            'files_read': set(),
+            'files_written': set(),
+        }
+
+    def _record_open(self, path, writing):
+        with self._lock:
+            if self._current is not None:
+                self._current['files_written' if writing else 'files_read'].add(path)
+
+    def _end_stage(self):
+        current = self._current
+        if current is None:
+            return
+        end = _Sample()
+        with self._lock:
+            self._current = None
+        start = current['start']
+        stage = {
+            'name': current['name'],
+            'start': start.wall - self._run_start.wall,
+            'wall': end.wall - start.wall,
+            'cpu': end.cpu - start.cpu,
+            'bytes_read': None if start.bytes_read is None else end.bytes_read - start.bytes_read,
+            'bytes_written': None if start.bytes_written is None else end.bytes_written - start.bytes_written,
+            'files_read': len(current['files_read']),
+            'files_written': len(current['files_written']),
+        }
+        if self.tracemalloc:
+            import tracemalloc
+            stage['python_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        self.stages.append(stage)
+
+    def finish(self):
+        """
+        End the run: write the trace and print the summary.
+
+        Returns:
+            dict: Report with the run totals and per-stage measurements
+                (None if the profiler is disabled)
+        """
+        global _active
+        if not self.enabled or self._run_start is None:
+            return None
+        self._end_stage()
+        end = _Sample()
+        _active = None
+        if self._profile is not None:
+            self._profile.disable()
+        snapshot = None
+        if self.tracemalloc:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+        start = self._run_start
+        self._run_start = None
+        report = {
+            'name': self.run_name,
+            'wall': end.wall - start.wall,
+            'cpu': end.cpu - start.cpu,
+            'stages': self.stages,
+        }
+
+        self.print_summary(report)
+        if self.trace_path:
+            write_chrome_trace(report, self.trace_path)
+            print(f"📊 Trace written to {self.trace_path} (open in chrome://tracing or ui.perfetto.dev)")
+        if self._profile is not None:
+            self._print_cprofile()
+        if snapshot is not None:
+            self._print_allocations(snapshot)
+        return report
+
+    @staticmethod
+    def print_summary(report):
+        """Print one line per stage."""
+        def megabytes(value):
+            return '     n/a' if value is None else f"{value / (1024 * 1024):8.1f}"
+
+        print(f"\n⏱️  Profile of {report['name']}: {report['wall']:.2f}s wall, {report['cpu']:.2f}s CPU")
+        print(f"  {'stage':<24} {'wall s':>8} {'cpu s':>8} {'read MB':>8} {'write MB':>8} {'files r/w':>11}")
+        for stage in report['stages']:
+            files = f"{stage['files_read']}/{stage['files_written']}"
+            print(f"  {stage['name']:<24} {stage['wall']:8.2f} {stage['cpu']:8.2f} "
+                  f"{megabytes(stage['bytes_read'])} {megabytes(stage['bytes_written'])} {files:>11}")
+
+    def _print_cprofile(self):
+        import pstats
+        prof_path = os.path.splitext(self.trace_path or f"{self.run_name}_profile")[0] + '.prof'
+        self._profile.dump_stats(prof_path)
+        print(f"📊 cProfile statistics written to {prof_path}; top functions by cumulative time:")
+        pstats.Stats(self._profile, stream=sys.stdout).sort_stats('cumulative').print_stats(15)
+        self._profile = None
+
+    @staticmethod
+    def _print_allocations(snapshot, limit=10):
+        print(f"🧠 Top {limit} Python allocation sites still alive:")
+        for statistic in snapshot.statistics('lineno')[:limit]:
+            print(f"  {statistic.size / 1024:10.1f} KB  {statistic.traceback}")
+
+
+def write_chrome_trace(report, path):
+    """
+    Write a profile report in the Chrome Trace Event format.
+
+    The run and each stage become complete ('X') events; the stage
+    measurements are attached as event arguments.
+
+    Args:
+        report: Report returned by StageProfiler.finish
+        path: Output JSON path
+    """
+    pid = os.getpid()
+    events = [{
+        'name': report['name'], 'cat': 'run', 'ph': 'X', 'pid': pid, 'tid': 0,
+        'ts': 0, 'dur': round(report['wall'] * 1e6),
+        'args': {'cpu_s': round(report['cpu'], 6)},
+    }]
+    for stage in report['stages']:
+        args = {key: value for key, value in stage.items() if key not in ('name', 'start', 'wall')}
+        args['cpu'] = round(args['cpu'], 6)
+        events.append({
+            'name': stage['name'], 'cat': 'stage', 'ph': 'X', 'pid': pid, 'tid': 0,
+            'ts': round(stage['start'] * 1e6), 'dur': round(stage['wall'] * 1e6),
+            'args': args,
+        })
+
+    trace = {
+        'traceEvents': events,
+        'displayTimeUnit': 'ms',
+        'otherData': {'run': report['name'], 'wall_s': report['wall'], 'cpu_s': report['cpu']},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, indent=2)
@@ -2,19 +2,564 @@
 Local HTTP server for testing tours.
 """
 
+import collections
+import email.utils
+import gzip
 import http.server
+import json
+import posixpath
+import queue
+import re
+import shutil
 import socketserver
+import sys
 import threading
+import time
+import urllib.parse
 import webbrowser
 import os
 
+from .file_ops import COPY_BUFFER_SIZE, WORK_CACHE_DIR
+from .tour_store import JsonPatchError, TourStore
+from .watcher import DEFAULT_POLL_INTERVAL, TourWatcher
+from .zip_source import ZipSource, read_source_marker
+
+
+# Worker threads handling connections
+DEFAULT_WORKERS = 32
+
+# Pending connections queued by the kernel once all workers are busy
+DEFAULT_BACKLOG = 128
+
+# Seconds an idle keep-alive connection may hold a worker
+KEEPALIVE_TIMEOUT = 5
+
+# Errors of clients that went away mid-response; not worth a traceback
+CLIENT_DISCONNECTS = (ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+
+# Number of recent requests kept for latency percentiles
+STATS_WINDOW = 10000
+
+STATS_PATH = '/__server_stats'
+
+# Editor save API: GET the documents, PATCH them with a JSON Patch,
+# POST .../compact to write them out
+TOUR_API_PATH = '/__api/tour'
+TOUR_COMPACT_PATH = TOUR_API_PATH + '/compact'
+
+# Server-sent change events for editor tabs in watch mode
+EVENTS_PATH = '/__events'
+
+# Seconds between keep-alive comments on an idle event stream
+EVENTS_HEARTBEAT = 15
+
+# Largest request body the save API accepts
+MAX_PATCH_BYTES = 16 * 1024 * 1024
+
+# Tiles never change once exported, so browsers may cache them for good
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Everything else (data.js, editor files) must be revalidated on each load
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Text assets served gzip-compressed to clients that accept it
+GZIP_EXTENSIONS = {'.js', '.css', '.json', '.html', '.htm', '.svg', '.txt', '.xml'}
+
+# Content-hashed bundles written by build --bundle
+HASHED_BUNDLE = re.compile(r'/bundle-\d+\.[0-9a-f]{10}\.(?:js|css)$')
+
+# Content-addressed images extracted from data URIs and sprite atlases,
+# and per-scene data chunks
+HASHED_ASSET = re.compile(r'/(?:assets/(?:sprites-)?[0-9a-f]{16}\.[a-z0-9]+|scenes/[0-9a-f]{16}\.js)$')
+
+
+def is_immutable_path(url_path):
+    """Whether a URL path points at tile imagery or a content-hashed file."""
+    return '/tiles/' in url_path or HASHED_BUNDLE.search(url_path) is not None or \
+        HASHED_ASSET.search(url_path) is not None
+
+
+class FileResource:
+    """A file on disk served with validators and range support."""
+    
+    def __init__(self, path, encoding=None, etag=None):
+        st = os.stat(path)
+        self.path = path
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.encoding = encoding
+        self.etag = etag or f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    
+    def send(self, handler, start, length):
+        with open(self.path, 'rb') as f:
+            handler.wfile.flush()
+            handler.connection.sendfile(f, start, length)
+    
+    def open(self):
+        return open(self.path, 'rb')
+
+
+class ZipMemberResource:
+    """A member of the source ZIP served with validators and range support."""
+    
+    def __init__(self, source, info):
+        self.source = source
+        self.info = info
+        self.size = info.file_size
+        self.mtime = source.mtime
+        self.encoding = None
+        self.etag = f'"z{info.CRC:08x}-{info.file_size:x}"'
+    
+    def send(self, handler, start, length):
+        if self.info.compress_type == 0:
+            # Stored member: zero-copy from the archive
+            offset = self.source.data_offset(self.info)
+            handler.wfile.flush()
+            handler.connection.sendfile(self.source.raw_file(), offset + start, length)
+            return
+        with self.source.open(self.info) as src:
+            if start:
+                src.seek(start)
+            remaining = length
+            while remaining:
+                chunk = src.read(min(COPY_BUFFER_SIZE, remaining))
+                if not chunk:
+                    break
+                handler.wfile.write(chunk)
+                remaining -= len(chunk)
+    
+    def open(self):
+        return self.source.open(self.info)
+
+
+class RequestStats:
+    """Rolling per-request latency and queueing statistics."""
+    
+    def __init__(self, window=STATS_WINDOW):
+        self.requests = 0
+        self.connections = 0
+        self.latencies = collections.deque(maxlen=window)
+        self.queue_waits = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record_request(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(seconds)
+    
+    def record_queue_wait(self, seconds):
+        with self._lock:
+            self.connections += 1
+            self.queue_waits.append(seconds)
+    
+    @staticmethod
+    def _percentiles(samples):
+        if not samples:
+            return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+        ordered = sorted(samples)
+        
+        def pick(q):
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+        
+        return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'max': ordered[-1] * 1000}
+    
+    def summary(self):
+        """Latency and queue-wait percentiles in milliseconds."""
+        with self._lock:
+            latencies = list(self.latencies)
+            queue_waits = list(self.queue_waits)
+            requests = self.requests
+            connections = self.connections
+        return {
+            'requests': requests,
+            'connections': connections,
+            'latency_ms': self._percentiles(latencies),
+            'queue_wait_ms': self._percentiles(queue_waits),
+        }
+
+
+class EventBroadcaster:
+    """Fans server-sent events out to every connected event stream."""
+    
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+    
+    def subscribe(self):
+        """Return a queue receiving (event, data) pairs; None means close."""
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+    
+    def publish(self, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put((event, data))
+    
+    def close(self):
+        """End every open event stream."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(None)
+
+
+class PooledHTTPServer(socketserver.TCPServer):
+    """
+    HTTP server dispatching connections to a fixed pool of worker threads.
+    
+    The accept loop hands sockets to a bounded queue; when every worker is
+    busy it stops accepting and further clients wait in the listen backlog.
+    Time spent waiting for a worker is recorded as queue wait.
+    """
+    
+    def __init__(self, server_address, handler_class, workers=DEFAULT_WORKERS,
+                 backlog=DEFAULT_BACKLOG):
+        # Read by server_activate() when the socket starts listening
+        self.request_queue_size = backlog
+        self.workers = workers
+        self.stats = RequestStats()
+        self._queue = queue.Queue(maxsize=workers)
+        super().__init__(server_address, handler_class)
+        
+        for i in range(workers):
+            worker = threading.Thread(target=self._worker, name=f"http-worker-{i}", daemon=True)
+            worker.start()
+    
+    def process_request(self, request, client_address):
+        self._queue.put((request, client_address, time.monotonic()))
+    
+    def _worker(self):
+        while True:
+            request, client_address, accepted_at = self._queue.get()
+            self.stats.record_queue_wait(time.monotonic() - accepted_at)
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+    
+    def handle_error(self, request, client_address):
+        # Client disconnects are routine for tile requests; anything else is a bug
+        if isinstance(sys.exc_info()[1], CLIENT_DISCONNECTS):
+            return
+        super().handle_error(request, client_address)
+
 
 class QuietHandler(http.server.SimpleHTTPRequestHandler):
-    """HTTP request handler with logging suppressed."""
+    """HTTP/1.1 keep-alive request handler with logging suppressed."""
+    
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
     
     def log_message(self, format, *args):
         pass  # Suppress logging
     
+    def parse_request(self):
+        self.request_started = time.monotonic()
+        return super().parse_request()
+    
+    def handle_one_request(self):
+        """Handle one request and record its latency."""
+        self.request_started = None
+        super().handle_one_request()
+        stats = getattr(self.server, 'stats', None)
+        if stats is not None and self.request_started is not None:
+            stats.record_request(time.monotonic() - self.request_started)
+    
+    tour_store = None
+    events = None
+    
+    def do_GET(self):
+        if self.path == STATS_PATH and hasattr(self.server, 'stats'):
+            self.send_json(200, self.server.stats.summary())
+            return
+        if self.url_path() == TOUR_API_PATH and self.tour_store is not None:
+            snapshot = self.tour_store.snapshot()
+            self.send_json(200, snapshot, etag=f'"{snapshot["revision"]}"')
+            return
+        if self.url_path() == EVENTS_PATH and self.events is not None:
+            self.stream_events()
+            return
+        self.serve(head_only=False)
+    
+    def stream_events(self):
+        """
+        Stream change events to an editor tab (text/event-stream).
+        
+        The stream holds a worker thread until the tab closes or the
+        server stops.
+        """
+        subscriber = self.events.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            self.wfile.write(b"retry: 1000\n\n")
+            self.wfile.flush()
+            while True:
+                try:
+                    message = subscriber.get(timeout=EVENTS_HEARTBEAT)
+                except queue.Empty:
+                    self.wfile.write(b": ping\n\n")
+                    self.wfile.flush()
+                    continue
+                if message is None:
+                    break
+                event, data = message
+                self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+        finally:
+            self.events.unsubscribe(subscriber)
+    
+    def do_PATCH(self):
+        """Apply a JSON Patch from the editor to the tour documents."""
+        if self.url_path() != TOUR_API_PATH or self.tour_store is None:
+            self.send_json(404, {'error': 'Not found'})
+            return
+        
+        operations = self.read_json_body()
+        if operations is None:
+            return
+        
+        base_revision = None
+        if_match = self.headers.get('If-Match', '').strip()
+        if if_match and if_match != '*':
+            try:
+                base_revision = int(if_match.strip('"'))
+            except ValueError:
+                self.send_json(400, {'error': f'Invalid If-Match: {if_match}'})
+                return
+        
+        try:
+            revision = self.tour_store.apply(operations, base_revision)
+        except JsonPatchError as e:
+            self.send_json(422, {'error': str(e)})
+            return
+        except OSError as e:
+            self.send_json(500, {'error': f'Could not save: {e}'})
+            return
+        if revision is None:
+            self.send_json(412, {'error': 'Tour changed since the editor loaded it',
+                                 'revision': self.tour_store.revision})
+            return
+        self.send_json(200, {'revision': revision}, etag=f'"{revision}"')
+    
+    def do_POST(self):
+        """Compact the save journal into tour_data.json/view_config.json."""
+        if self.url_path() != TOUR_COMPACT_PATH or self.tour_store is None:
+            self.send_json(404, {'error': 'Not found'})
+            return
+        self.read_json_body(optional=True)
+        written = self.tour_store.compact()
+        self.send_json(200, {'revision': self.tour_store.revision, 'written': written})
+    
+    def read_json_body(self, optional=False):
+        """
+        Read and decode a JSON request body.
+        
+        Sends an error response and returns None if the body is missing
+        (unless optional), too large or not JSON.
+        """
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_PATCH_BYTES:
+            self.send_json(413 if length > 0 else 400, {'error': 'Invalid request body size'})
+            return None
+        body = self.rfile.read(length) if length else b''
+        if not body and optional:
+            return {}
+        try:
+            return json.loads(body.decode('utf-8'))
+        except ValueError as e:
+            self.send_json(400, {'error': f'Invalid JSON: {e}'})
+            return None
+    
+    def send_json(self, status, value, etag=None):
+        """Send an uncached JSON response."""
+        body = json.dumps(value, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_HEAD(self):
+        self.serve(head_only=True)
+    
+    def url_path(self):
+        """Decoded, normalised path component of the request URL."""
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        return posixpath.normpath(path)
+    
+    def resolve(self):
+        """Return the resource for the request, or None to use the default handler."""
+        path = self.translate_path(self.path)
+        if os.path.isfile(path):
+            return FileResource(path)
+        return None
+    
+    def serve(self, head_only):
+        """
+        Serve a resource with conditional, range and gzip support.
+        
+        Directories and missing files fall back to SimpleHTTPRequestHandler.
+        """
+        resource = self.resolve()
+        if resource is None:
+            return super().do_HEAD() if head_only else super().do_GET()
+        
+        url_path = self.url_path()
+        content_type = self.guess_type(url_path)
+        compressible = os.path.splitext(url_path)[1].lower() in GZIP_EXTENSIONS
+        range_header = self.headers.get('Range')
+        
+        if compressible and not range_header and self.accepts_gzip():
+            resource = self.gzip_variant(resource, url_path)
+        
+        if self.not_modified(resource):
+            self.send_response(304)
+            self.send_validators(resource, url_path, compressible)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        
+        start, length = 0, resource.size
+        status = 200
+        if range_header and self.range_applies(resource):
+            byte_range = self.parse_range(range_header, resource.size)
+            if byte_range is False:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{resource.size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                length = end - start + 1
+                status = 206
+        
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{start + length - 1}/{resource.size}")
+        if resource.encoding:
+            self.send_header("Content-Encoding", resource.encoding)
+        self.send_validators(resource, url_path, compressible)
+        self.end_headers()
+        
+        if not head_only and length:
+            resource.send(self, start, length)
+    
+    def send_validators(self, resource, url_path, compressible):
+        self.send_header("ETag", resource.etag)
+        self.send_header("Last-Modified", self.date_time_string(resource.mtime))
+        if is_immutable_path(url_path):
+            self.send_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+        else:
+            self.send_header("Cache-Control", REVALIDATE_CACHE_CONTROL)
+        if compressible:
+            self.send_header("Vary", "Accept-Encoding")
+    
+    def not_modified(self, resource):
+        """Evaluate If-None-Match / If-Modified-Since against the resource."""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or resource.etag in tags or f'W/{resource.etag}' in tags
+        
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+            if since is not None:
+                return int(resource.mtime) <= since.timestamp()
+        return False
+    
+    def range_applies(self, resource):
+        """Honour If-Range: serve the full body if the validator changed."""
+        if_range = self.headers.get('If-Range')
+        return not if_range or if_range.strip() == resource.etag
+    
+    @staticmethod
+    def parse_range(header, size):
+        """
+        Parse a single 'bytes=' range.
+        
+        Returns:
+            (start, end) inclusive, None to ignore the header, or False if
+            the range is unsatisfiable
+        """
+        unit, _, spec = header.partition('=')
+        if unit.strip() != 'bytes' or ',' in spec:
+            return None  # Multiple ranges: send the whole body instead
+        first, _, last = spec.strip().partition('-')
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+            elif last:
+                start = max(size - int(last), 0)
+                end = size - 1
+            else:
+                return None
+        except ValueError:
+            return None
+        if start >= size or start > end:
+            return False
+        return start, min(end, size - 1)
+    
+    def accepts_gzip(self):
+        for coding in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = coding.strip().partition(';')
+            if name.strip().lower() in ('gzip', '*'):
+                return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+        return False
+    
+    def gzip_variant(self, resource, url_path):
+        """
+        Return the gzip-encoded variant of a text resource.
+        
+        A precompressed '.gz' sibling on disk is used if it is up to date;
+        otherwise the variant is generated once into the tour's cache
+        directory and reused until the source changes.
+        """
+        etag = resource.etag[:-1] + '-gz"'
+        
+        if isinstance(resource, FileResource):
+            sibling = resource.path + '.gz'
+            if os.path.isfile(sibling) and os.path.getmtime(sibling) >= resource.mtime:
+                return FileResource(sibling, encoding='gzip', etag=etag)
+        
+        cache_path = os.path.join(self.directory, WORK_CACHE_DIR, 'gzip', *url_path.lstrip('/').split('/')) + '.gz'
+        if not (os.path.isfile(cache_path) and os.path.getmtime(cache_path) >= resource.mtime):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            with resource.open() as src, open(tmp_path, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as dst:
+                    shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            os.replace(tmp_path, cache_path)
+        return FileResource(cache_path, encoding='gzip', etag=etag)
+    
     def finish(self):
         """Suppress BrokenPipeError exceptions."""
         try:
@@ -26,31 +571,101 @@ class QuietHandler(http.server.SimpleHTTPRequestHandler):
         """Handle requests with exception suppression."""
         try:
             super().handle()
-        except (BrokenPipeError, ConnectionResetError):
-            pass  # Ignore broken pipe errors
+        except (BrokenPipeError, ConnectionResetError, TimeoutError):
+            pass  # Ignore broken pipe errors and idle keep-alive timeouts
 
 
-def start_server(directory, port=8000, open_browser=True):
+class ZipOverlayHandler(QuietHandler):
+    """
+    Serves files from an overlay directory, falling back to the source ZIP.
+    
+    Stored members (tiles) are sent with sendfile straight from the archive;
+    deflated members are streamed through a decompressor.
+    """
+    
+    zip_source = None
+    
+    def resolve(self):
+        resource = super().resolve()
+        if resource is not None or os.path.exists(self.translate_path(self.path)):
+            return resource
+        info = self.zip_source.get(self.url_path().lstrip('/'))
+        if info is None:
+            return None
+        return ZipMemberResource(self.zip_source, info)
+
+
+def start_server(directory, port=8000, open_browser=True, workers=None, backlog=None,
+                 watch=False, poll_interval=None):
     """
     Start local HTTP server.
     
+    Connections are served with HTTP/1.1 keep-alive by a bounded pool of
+    worker threads, so parallel tile requests don't queue behind each other.
+    Request latency and queue-wait percentiles are available at
+    /__server_stats and printed when the server stops.
+    
+    If directory is an overlay created by 'init --from-zip', files missing
+    from it are served straight out of the source ZIP.
+    
+    In watch mode, edits to the tour files and the editor sources are picked
+    up while the server runs: derived files are regenerated (see
+    TourWatcher) and open editor tabs are told to reload or update over
+    server-sent events at /__events.
+    
     Args:
         directory: Directory to serve
         port: Port number (will auto-increment if busy)
         open_browser: Whether to open browser automatically
+        workers: Number of worker threads (defaults to DEFAULT_WORKERS)
+        backlog: Listen backlog (defaults to DEFAULT_BACKLOG)
+        watch: Regenerate derived files and notify editor tabs on changes
+        poll_interval: Seconds between polls in watch mode
+            (defaults to DEFAULT_POLL_INTERVAL)
     """
     os.chdir(directory)
     
+    handler = QuietHandler
+    source_zip = read_source_marker(directory)
+    if source_zip:
+        source = ZipSource(source_zip)
+        handler = type('TourZipHandler', (ZipOverlayHandler,), {'zip_source': source})
+    
+    store = None
+    if TourStore.exists(directory):
+        store = TourStore(directory)
+        handler = type('TourStoreHandler', (handler,), {'tour_store': store})
+    
+    watcher = None
+    if watch:
+        events = EventBroadcaster()
+        watcher = TourWatcher(directory, events.publish, store=store,
+                              interval=poll_interval or DEFAULT_POLL_INTERVAL)
+        handler = type('TourWatchHandler', (handler,), {'events': events})
+    
     # Find available port
     while port < 9000:
         try:
-            httpd = socketserver.TCPServer(("", port), QuietHandler)
+            httpd = PooledHTTPServer(("", port), handler,
+                                     workers=workers or DEFAULT_WORKERS,
+                                     backlog=backlog or DEFAULT_BACKLOG)
             break
         except OSError:
             port += 1
     
     print(f"\n🌐 Starting local server on http://localhost:{port}")
-    print(f"📂 Serving: {directory}")
+    print(f"📂 Serving: {directory} ({httpd.workers} workers)")
+    if source_zip:
+        print(f"🗜️  Backed by: {source_zip} ({len(source.members)} members)")
+    if store is not None:
+        print(f"💾 Editor saves: PATCH {TOUR_API_PATH} (revision {store.revision}, "
+              f"{store.entries} journaled edits)")
+        if store.discarded:
+            print(f"⚠️  Discarded {store.discarded} journaled edits made before "
+                  f"tour_data.json was rewritten")
+    if watcher is not None:
+        print(f"👀 Watching for changes every {watcher.interval:g}s; editor tabs update live")
+        watcher.start()
     print("\n Press Ctrl+C to stop the server")
     
     # Open browser
@@ -67,5 +682,18 @@ def start_server(directory, port=8000, open_browser=True):
     except KeyboardInterrupt:
         print("\n\n🛑 Server stopped")
         httpd.shutdown()
-
-
+        if watcher is not None:
+            watcher.stop()
+            events.close()
+        if store is not None:
+            written = store.compact()
+            if written:
+                print(f"💾 Saved {', '.join(written)}")
+        summary = httpd.stats.summary()
+        if summary['requests']:
+            latency = summary['latency_ms']
+            wait = summary['queue_wait_ms']
+            print(f"📈 {summary['requests']} requests over {summary['connections']} connections: "
+                  f"latency p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+                  f"max {latency['max']:.1f} ms; queue wait p95 {wait['p95']:.1f} ms")
+        httpd.server_close()
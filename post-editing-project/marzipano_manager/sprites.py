@@ -0,0 +1,312 @@
+"""
+Sprite atlases for hotspot images.
+Small images shown in hotspot HTML are packed into a few atlas PNGs and the
+<img> tags are rewritten to atlas regions, so entering a scene costs one
+image request instead of one per icon.
+
+Requires Pillow (optional dependency: pip install pillow).
+"""
+
+import hashlib
+import html
+import io
+import json
+import os
+import re
+import urllib.parse
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .assets import ASSETS_DIRNAME
+from .file_ops import remove_stale_files
+
+
+# Largest atlas side in pixels; more images spill into further atlases
+DEFAULT_MAX_SIZE = 2048
+
+# Images larger than this (either side) are not icons and stay separate
+MAX_SPRITE_SIZE = 256
+
+# Transparent gap around each sprite so scaled regions don't bleed
+PADDING = 1
+
+# Lossless icon formats; JPEG photos would only grow in a PNG atlas
+SPRITE_EXTENSIONS = ('.png', '.gif', '.webp')
+
+# Atlas files: sprites-<sha256 prefix>.png in app-files/assets/
+ATLAS_FILENAME = re.compile(r'^sprites-[0-9a-f]{16}\.png$')
+
+IMG_TAG = re.compile(r'<img\b(?P<attributes>[^>]*?)\s*/?>', re.IGNORECASE)
+ATTRIBUTE = re.compile(r'([^\s=/>]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+
+
+def require_imaging():
+    """Raise ImportError with an install hint if Pillow is missing."""
+    if Image is None:
+        raise ImportError("Sprite atlases require Pillow: pip install pillow")
+
+
+def parse_attributes(text):
+    """
+    Attributes of an HTML tag, in order.
+
+    Returns:
+        list: (name, value or None) pairs, values unescaped
+    """
+    attributes = []
+    for name, value in ATTRIBUTE.findall(text):
+        if value[:1] in ('"', "'"):
+            value = value[1:-1]
+        attributes.append((name.lower(), html.unescape(value) if value else None))
+    return attributes
+
+
+def _hotspot_strings(data):
+    """(hotspot dict, key) of every string field of every hotspot."""
+    for scene in data.get('scenes', []):
+        for kind in ('linkHotspots', 'infoHotspots'):
+            for hotspot in scene.get(kind, []):
+                for key, value in hotspot.items():
+                    if isinstance(value, str) and '<img' in value.lower():
+                        yield hotspot, key
+
+
+def _local_path(src, index_dir, work_dir):
+    """File an <img> src points at, or None for remote/absolute/missing ones."""
+    parts = urllib.parse.urlsplit(src)
+    if parts.scheme or parts.netloc or not parts.path or parts.path.startswith('/'):
+        return None
+    path = os.path.normpath(os.path.join(index_dir, urllib.parse.unquote(parts.path)))
+    if not path.startswith(os.path.join(work_dir, '')) or not os.path.isfile(path):
+        return None
+    if not path.lower().endswith(SPRITE_EXTENSIONS):
+        return None
+    return path
+
+
+def pack_shelves(sizes, max_size):
+    """
+    Pack rectangles into atlases with the shelf (next-fit decreasing
+    height) algorithm.
+
+    Rectangles are sorted by height and laid out in rows; a row that would
+    pass the bottom of the atlas starts the next atlas.
+
+    Args:
+        sizes: key -> (width, height), padding included
+        max_size: Largest atlas width and height
+
+    Returns:
+        list: One dict per atlas: 'size' (width, height) and
+            'positions' (key -> (x, y))
+    """
+    order = sorted(sizes, key=lambda key: (-sizes[key][1], -sizes[key][0]))
+    total_area = sum(w * h for w, h in sizes.values())
+    widest = max((w for w, _ in sizes.values()), default=0)
+    # Roughly square atlases, as narrow as the widest sprite allows
+    width = 1
+    while width * width < total_area:
+        width *= 2
+    width = min(max(width, widest), max_size)
+
+    atlases = []
+    atlas = None
+    x = y = row_height = 0
+    for key in order:
+        w, h = sizes[key]
+        if atlas is not None and x + w > width:
+            x, y, row_height = 0, y + row_height, 0
+        if atlas is None or y + h > max_size:
+            atlas = {'positions': {}, 'size': (0, 0)}
+            atlases.append(atlas)
+            x = y = row_height = 0
+        atlas['positions'][key] = (x, y)
+        atlas['size'] = (max(atlas['size'][0], x + w), max(atlas['size'][1], y + h))
+        x += w
+        row_height = max(row_height, h)
+    return atlases
+
+
+def _number(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+
+def _sprite_tag(attributes, sprite):
+    """<span> showing an atlas region in place of an <img>."""
+    values = dict(attributes)
+    width, height = sprite['width'], sprite['height']
+    try:
+        shown_width = int(values['width']) if values.get('width') else None
+        shown_height = int(values['height']) if values.get('height') else None
+    except ValueError:
+        return None  # e.g. width="50%"
+    if shown_width is None and shown_height is None:
+        shown_width, shown_height = width, height
+    elif shown_width is None:
+        shown_width = width * shown_height / height
+    elif shown_height is None:
+        shown_height = height * shown_width / width
+    scale_x, scale_y = shown_width / width, shown_height / height
+
+    style = (f"display:inline-block;width:{_number(shown_width)}px;height:{_number(shown_height)}px;"
+             f"background-image:url({sprite['url']});background-repeat:no-repeat;"
+             f"background-position:{_number(-sprite['x'] * scale_x)}px {_number(-sprite['y'] * scale_y)}px")
+    if scale_x != 1 or scale_y != 1:
+        atlas_width, atlas_height = sprite['atlas_size']
+        style += f";background-size:{_number(atlas_width * scale_x)}px {_number(atlas_height * scale_y)}px"
+    if values.get('style'):
+        style += ';' + values['style']
+
+    parts = ['<span']
+    classes = ' '.join(filter(None, ['hotspot-sprite', values.get('class')]))
+    parts.append(f'class="{html.escape(classes)}"')
+    parts.append('role="img"')
+    if values.get('alt'):
+        parts.append(f'aria-label="{html.escape(values["alt"])}"')
+    for name, value in attributes:
+        if name in ('src', 'alt', 'width', 'height', 'style', 'class'):
+            continue
+        parts.append(name if value is None else f'{name}="{html.escape(value)}"')
+    parts.append(f'style="{html.escape(style)}"')
+    return ' '.join(parts) + '></span>'
+
+
+def remove_stale_atlases(app_files, keep):
+    """
+    Delete atlases of earlier builds that are not in keep.
+
+    Returns:
+        int: Number of files removed
+    """
+    return remove_stale_files(os.path.join(app_files, ASSETS_DIRNAME), ATLAS_FILENAME, keep)
+
+
+def build_sprite_atlases(data, work_dir, index_path, max_size=DEFAULT_MAX_SIZE):
+    """
+    Pack the small images of hotspot HTML into atlases and rewrite the tags.
+
+    Each distinct image (by content) is packed once. <img> tags whose size
+    is given in pixels by width/height attributes (or not at all) become
+    <span class="hotspot-sprite"> elements showing their atlas region;
+    other tags, remote images and images over MAX_SPRITE_SIZE are left
+    alone.
+
+    Args:
+        data: Tour data (not modified)
+        work_dir: Tour directory
+        index_path: index.html, which image and atlas URLs are relative to
+        max_size: Largest atlas width/height in pixels
+
+    Returns:
+        tuple: (rewritten tour data, stats dict with 'images', 'references',
+            'atlases', 'atlas_bytes', 'unreferenced' (archive names of
+            app-files/assets/ images now only used through an atlas),
+            'removed')
+
+    Raises:
+        ImportError: If Pillow is not installed
+        ValueError: If max_size is smaller than the largest sprite
+    """
+    require_imaging()
+    if max_size < MAX_SPRITE_SIZE + 2 * PADDING:
+        raise ValueError(f"Atlas size must be at least {MAX_SPRITE_SIZE + 2 * PADDING} px")
+    app_files = os.path.join(work_dir, 'app-files')
+    index_dir = os.path.dirname(os.path.abspath(index_path))
+    work_dir = os.path.abspath(work_dir)
+
+    # Find candidate images: path -> content digest, digest -> image
+    images = {}
+    digests = {}
+    for hotspot, key in _hotspot_strings(data):
+        for match in IMG_TAG.finditer(hotspot[key]):
+            src = dict(parse_attributes(match.group('attributes'))).get('src')
+            path = _local_path(src, index_dir, work_dir) if src else None
+            if path is None or path in digests:
+                continue
+            with open(path, 'rb') as f:
+                content = f.read()
+            digest = hashlib.sha256(content).hexdigest()
+            digests[path] = digest
+            if digest in images:
+                continue
+            try:
+                image = Image.open(io.BytesIO(content))
+                image.load()
+            except (OSError, ValueError):
+                continue
+            if getattr(image, 'n_frames', 1) > 1 or max(image.size) > MAX_SPRITE_SIZE:
+                continue  # Animations and large pictures stay separate
+            images[digest] = image.convert('RGBA')
+
+    rewritten = {**data, 'scenes': [dict(scene) for scene in data.get('scenes', [])]}
+    stats = {'images': len(images), 'references': 0, 'atlases': 0, 'atlas_bytes': 0,
+             'unreferenced': set(), 'removed': 0}
+    if not images:
+        stats['removed'] = remove_stale_atlases(app_files, set())
+        return rewritten, stats
+
+    # Pack and write the atlases
+    sizes = {digest: (image.width + 2 * PADDING, image.height + 2 * PADDING)
+             for digest, image in images.items()}
+    prefix = os.path.relpath(app_files, index_dir).replace(os.path.sep, '/')
+    prefix = '' if prefix == '.' else prefix + '/'
+    sprites = {}
+    written = set()
+    for atlas in pack_shelves(sizes, max_size):
+        sheet = Image.new('RGBA', atlas['size'], (0, 0, 0, 0))
+        for digest, (x, y) in atlas['positions'].items():
+            sheet.paste(images[digest], (x + PADDING, y + PADDING))
+        buffer = io.BytesIO()
+        sheet.save(buffer, 'PNG', optimize=True)
+        content = buffer.getvalue()
+        filename = f"sprites-{hashlib.sha256(content).hexdigest()[:16]}.png"
+        assets_dir = os.path.join(app_files, ASSETS_DIRNAME)
+        os.makedirs(assets_dir, exist_ok=True)
+        with open(os.path.join(assets_dir, filename), 'wb') as f:
+            f.write(content)
+        written.add(filename)
+        stats['atlas_bytes'] += len(content)
+        for digest, (x, y) in atlas['positions'].items():
+            sprites[digest] = {
+                'url': f"{prefix}{ASSETS_DIRNAME}/{filename}",
+                'x': x + PADDING, 'y': y + PADDING,
+                'width': images[digest].width, 'height': images[digest].height,
+                'atlas_size': atlas['size'],
+            }
+    stats['atlases'] = len(written)
+    stats['removed'] = remove_stale_atlases(app_files, written)
+
+    # Rewrite the tags
+    def replace(match):
+        attributes = parse_attributes(match.group('attributes'))
+        src = dict(attributes).get('src')
+        path = _local_path(src, index_dir, work_dir) if src else None
+        sprite = sprites.get(digests.get(path))
+        if sprite is None:
+            return match.group(0)
+        tag = _sprite_tag(attributes, sprite)
+        if tag is None:
+            return match.group(0)
+        stats['references'] += 1
+        return tag
+
+    for scene in rewritten['scenes']:
+        for kind in ('linkHotspots', 'infoHotspots'):
+            if kind not in scene:
+                continue
+            scene[kind] = [dict(hotspot) for hotspot in scene[kind]]
+            for hotspot in scene[kind]:
+                for key, value in hotspot.items():
+                    if isinstance(value, str) and '<img' in value.lower():
+                        hotspot[key] = IMG_TAG.sub(replace, value)
+
+    # Extracted assets only shown through an atlas need not be shipped
+    remaining = json.dumps(rewritten)
+    assets_dir = os.path.join(app_files, ASSETS_DIRNAME)
+    for path in digests:
+        if os.path.dirname(path) == assets_dir and os.path.basename(path) not in remaining:
+            stats['unreferenced'].add(os.path.relpath(path, work_dir).replace(os.path.sep, '/'))
+    return rewritten, stats
@@ -0,0 +1,173 @@
+"""
+Content-addressed deduplication of tour tiles.
+Each unique tile is stored once; duplicates are listed in tile_map.js and
+resolved to the stored copy by the runtime tile source.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .file_ops import COPY_BUFFER_SIZE, default_jobs
+from .zip_source import ZipSource
+
+
+TILES_PREFIX = 'app-files/tiles/'
+
+# Written to app-files/ and loaded before index.js
+TILE_MAP_FILENAME = 'tile_map.js'
+
+
+def collect_tiles(work_dir, source_zip=None):
+    """
+    List every file under app-files/tiles with its size.
+
+    Args:
+        work_dir: Tour directory
+        source_zip: Optional ZipSource the tour overlays
+
+    Returns:
+        dict: Archive name -> (size, path or ZipInfo)
+    """
+    tiles = {}
+    if source_zip is not None:
+        for name, info in source_zip.members.items():
+            if name.startswith(TILES_PREFIX):
+                tiles[name] = (info.file_size, info)
+
+    tiles_dir = os.path.join(work_dir, *TILES_PREFIX.split('/'))
+    for root, _, files in os.walk(tiles_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            arcname = os.path.relpath(path, work_dir).replace(os.path.sep, '/')
+            tiles[arcname] = (os.path.getsize(path), path)
+    return tiles
+
+
+def _digest(location, source_zip):
+    sha = hashlib.sha256()
+    if isinstance(location, str):
+        f = open(location, 'rb')
+    else:
+        f = source_zip.open(location)
+    with f:
+        while True:
+            chunk = f.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            sha.update(chunk)
+    return sha.digest()
+
+
+def find_duplicates(tiles, source_zip=None, jobs=None):
+    """
+    Group byte-identical tiles.
+
+    Only tiles that share their size with another tile (and extension,
+    since formats never alias each other) are hashed.
+
+    Args:
+        tiles: Result of collect_tiles()
+        source_zip: ZipSource for tiles that live in the source ZIP
+        jobs: Number of hashing threads (defaults to CPU count)
+
+    Returns:
+        dict: Stored archive name -> sorted list of duplicate archive names
+    """
+    by_size = {}
+    for arcname, (size, _) in tiles.items():
+        key = (size, os.path.splitext(arcname)[1].lower())
+        by_size.setdefault(key, []).append(arcname)
+    candidates = [name for names in by_size.values() if len(names) > 1 for name in names]
+
+    with ThreadPoolExecutor(max_workers=jobs or default_jobs()) as executor:
+        digests = executor.map(lambda name: _digest(tiles[name][1], source_zip), candidates)
+        by_digest = {}
+        for name, digest in zip(candidates, digests):
+            by_digest.setdefault(digest, []).append(name)
+
+    groups = {}
+    for names in by_digest.values():
+        if len(names) > 1:
+            names.sort()
+            groups[names[0]] = names[1:]
+    return groups
+
+
+def write_tile_map(work_dir, groups):
+    """
+    Write app-files/tile_map.js.
+
+    Paths are relative to app-files, as requested by the runtime.
+
+    Args:
+        work_dir: Tour directory
+        groups: Result of find_duplicates()
+
+    Returns:
+        int: Size of the written file
+    """
+    strip = len('app-files/')
+    tile_map = {
+        stored[strip:]: [name[strip:] for name in duplicates]
+        for stored, duplicates in sorted(groups.items())
+    }
+    path = os.path.join(work_dir, 'app-files', TILE_MAP_FILENAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("var TILE_MAP = " + json.dumps(tile_map, separators=(',', ':')) + ";\n")
+    return os.path.getsize(path)
+
+
+def clear_tile_map(work_dir):
+    """
+    Empty a tile map left by a previous deduplicated build, if any.
+
+    Returns:
+        bool: Whether a non-empty map was cleared
+    """
+    path = os.path.join(work_dir, 'app-files', TILE_MAP_FILENAME)
+    if not os.path.exists(path):
+        return False
+    with open(path, 'r', encoding='utf-8') as f:
+        if f.read().strip() == "var TILE_MAP = {};":
+            return False
+    write_tile_map(work_dir, {})
+    return True
+
+
+def dedup_tiles(work_dir, source_zip=None, jobs=None):
+    """
+    Find duplicate tiles and write the tile map.
+
+    Args:
+        work_dir: Tour directory
+        source_zip: Optional path of the source ZIP the tour overlays
+        jobs: Number of hashing threads (defaults to CPU count)
+
+    Returns:
+        dict: tiles, unique, duplicates, saved_bytes, map_bytes, seconds, and
+            'excluded' (archive names to leave out of the package)
+    """
+    start = time.monotonic()
+    source = ZipSource(source_zip) if source_zip else None
+    try:
+        tiles = collect_tiles(work_dir, source)
+        groups = find_duplicates(tiles, source, jobs=jobs)
+    finally:
+        if source:
+            source.close()
+
+    excluded = {name for duplicates in groups.values() for name in duplicates}
+    map_bytes = write_tile_map(work_dir, groups)
+
+    return {
+        'tiles': len(tiles),
+        'unique': len(tiles) - len(excluded),
+        'duplicates': len(excluded),
+        'saved_bytes': sum(tiles[name][0] for name in excluded),
+        'map_bytes': map_bytes,
+        'excluded': excluded,
+        'seconds': time.monotonic() - start,
+    }
@@ -0,0 +1,403 @@
+"""
+Multi-resolution cube tiler for equirectangular panoramas.
+Produces the same tiles/<id>/{z}/{f}/{y}/{x}.jpg pyramid, preview.jpg and
+levels/faceSize entries as the Marzipano Tool, without a browser.
+
+Requires numpy and Pillow (optional dependencies: pip install numpy pillow).
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = None
+    Image = None
+
+from .file_ops import default_jobs
+
+
+# Tiling parameters used by the Marzipano Tool
+TILE_SIZE = 512
+PREVIEW_SIZE = 256
+PREVIEW_FACE_ORDER = 'bdflru'
+FACES = 'fbudlr'
+
+DEFAULT_QUALITY = 85
+
+
+def require_imaging():
+    """Raise ImportError with an install hint if numpy/Pillow are missing."""
+    if np is None or Image is None:
+        raise ImportError("Tiling requires numpy and Pillow: pip install numpy pillow")
+
+
+def slugify(name):
+    """Scene id slug, as computed by the Marzipano Tool."""
+    slug = name.replace(' ', '-')
+    slug = ''.join(c for c in slug if c.isascii() and (c.isalnum() or c in '-_'))
+    return slug.lower()
+
+
+def compute_levels(face_size):
+    """
+    Cube levels for a face size, as chosen by the Marzipano Tool.
+
+    Levels double from 512 while they fit the face size; one larger level
+    is added if the face is more than 25% bigger than the last one.
+
+    Args:
+        face_size: Native cube face size (equirect width / 4)
+
+    Returns:
+        tuple: (levels including the fallback preview level, faceSize)
+    """
+    levels = []
+    size = TILE_SIZE
+    while size <= face_size:
+        levels.append({'tileSize': TILE_SIZE, 'size': size})
+        size *= 2
+    if levels and 1.25 * levels[-1]['size'] < face_size:
+        levels.append({'tileSize': TILE_SIZE, 'size': size})
+    if not levels:
+        levels.append({'tileSize': TILE_SIZE, 'size': TILE_SIZE})
+
+    levels.insert(0, {'tileSize': PREVIEW_SIZE, 'size': PREVIEW_SIZE, 'fallbackOnly': True})
+    return levels, min(face_size, levels[-1]['size'])
+
+
+def face_directions(face, size, x0, y0, width, height):
+    """
+    View directions through pixel centres of a block of a cube face.
+
+    Matches the orientation of Marzipano's CubeGeometry: f looks down -z,
+    r is +x, u is +y, and face rows run top to bottom.
+
+    Args:
+        face: Face letter (f, b, l, r, u, d)
+        size: Face size in pixels
+        x0, y0: Top-left pixel of the block
+        width, height: Block size in pixels
+
+    Returns:
+        tuple: (x, y, z) float arrays of shape (height, width)
+    """
+    a = (np.arange(x0, x0 + width, dtype=np.float32) + 0.5) / size - 0.5
+    b = 0.5 - (np.arange(y0, y0 + height, dtype=np.float32) + 0.5) / size
+    a, b = np.meshgrid(a, b)
+    half = np.full_like(a, 0.5)
+
+    if face == 'f':
+        return a, b, -half
+    if face == 'b':
+        return -a, b, half
+    if face == 'l':
+        return -half, b, -a
+    if face == 'r':
+        return half, b, a
+    if face == 'u':
+        return a, half, b
+    if face == 'd':
+        return a, -half, -b
+    raise ValueError(f"Unknown cube face: {face}")
+
+
+def sample_equirect(panorama, x, y, z):
+    """
+    Bilinearly sample an equirectangular image along view directions.
+
+    Args:
+        panorama: (H, W, 3) uint8 array
+        x, y, z: Direction arrays from face_directions()
+
+    Returns:
+        ndarray: uint8 RGB block with the shape of the direction arrays
+    """
+    height, width = panorama.shape[:2]
+    yaw = np.arctan2(x, -z)
+    pitch = np.arctan2(y, np.hypot(x, z))
+
+    u = (yaw / (2 * np.pi) + 0.5) * width - 0.5
+    v = (0.5 - pitch / np.pi) * height - 0.5
+
+    u0 = np.floor(u)
+    v0 = np.floor(v)
+    fu = (u - u0)[..., None]
+    fv = (v - v0)[..., None]
+
+    # Wrap horizontally across the seam, clamp at the poles
+    u0 = u0.astype(np.intp) % width
+    u1 = (u0 + 1) % width
+    v0 = np.clip(v0.astype(np.intp), 0, height - 1)
+    v1 = np.clip(v0 + 1, 0, height - 1)
+
+    top = panorama[v0, u0] * (1 - fu) + panorama[v0, u1] * fu
+    bottom = panorama[v1, u0] * (1 - fu) + panorama[v1, u1] * fu
+    return np.clip(top * (1 - fv) + bottom * fv + 0.5, 0, 255).astype(np.uint8)
+
+
+def decode_panorama(image_path, cache_path):
+    """
+    Decode a panorama once into an uncompressed array the face workers map.
+
+    Args:
+        image_path: Equirectangular image
+        cache_path: .npy file to write
+
+    Returns:
+        tuple: (width, height) of the panorama
+
+    Raises:
+        ValueError: The image is not 2:1
+        OSError: The image cannot be read or decoded; the message names it
+    """
+    require_imaging()
+    # Panoramas are trusted local input and routinely exceed the bomb limit
+    Image.MAX_IMAGE_PIXELS = None
+
+    try:
+        with Image.open(image_path) as image:
+            width, height = image.size
+            if width != 2 * height:
+                raise ValueError(f"{image_path} is not a 2:1 equirectangular image ({width}x{height})")
+            array = np.asarray(image.convert('RGB'))
+    except OSError as e:
+        raise OSError(f"Could not read panorama {image_path}: {e}") from None
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    np.save(cache_path, array)
+    return width, height
+
+
+def render_face(cache_path, face, levels, scene_dir, quality):
+    """
+    Render one cube face at every level and write its tiles.
+
+    The largest level is sampled from the panorama block by block; smaller
+    levels are box-filtered down from it, which avoids aliasing.
+
+    Args:
+        cache_path: Decoded panorama from decode_panorama()
+        face: Face letter
+        levels: Levels from compute_levels()
+        scene_dir: tiles/<scene id> directory
+        quality: JPEG quality
+
+    Returns:
+        tuple: (face, preview face as RGB bytes, tiles written, bytes written)
+    """
+    require_imaging()
+    panorama = np.load(cache_path, mmap_mode='r')
+
+    top = levels[-1]['size']
+    face_pixels = np.empty((top, top, 3), dtype=np.uint8)
+    for y0 in range(0, top, TILE_SIZE):
+        for x0 in range(0, top, TILE_SIZE):
+            x, y, z = face_directions(face, top, x0, y0, TILE_SIZE, TILE_SIZE)
+            face_pixels[y0:y0 + TILE_SIZE, x0:x0 + TILE_SIZE] = sample_equirect(panorama, x, y, z)
+    del panorama
+
+    image = Image.fromarray(face_pixels)
+    tiles = 0
+    nbytes = 0
+    for z in range(len(levels) - 1, 0, -1):
+        level = levels[z]
+        if image.size[0] != level['size']:
+            image = image.resize((level['size'], level['size']), Image.BOX)
+
+        tile_size = level['tileSize']
+        for row in range(level['size'] // tile_size):
+            row_dir = os.path.join(scene_dir, str(z), face, str(row))
+            os.makedirs(row_dir, exist_ok=True)
+            for col in range(level['size'] // tile_size):
+                box = (col * tile_size, row * tile_size, (col + 1) * tile_size, (row + 1) * tile_size)
+                tile_path = os.path.join(row_dir, f"{col}.jpg")
+                image.crop(box).save(tile_path, 'JPEG', quality=quality)
+                tiles += 1
+                nbytes += os.path.getsize(tile_path)
+
+    preview = image.resize((PREVIEW_SIZE, PREVIEW_SIZE), Image.BOX)
+    return face, preview.tobytes(), tiles, nbytes
+
+
+def save_preview(faces, scene_dir, quality):
+    """
+    Write preview.jpg: the low-res faces stacked vertically in bdflru order.
+
+    Args:
+        faces: Face letter -> RGB bytes of a PREVIEW_SIZE face
+        scene_dir: tiles/<scene id> directory
+        quality: JPEG quality
+    """
+    strip = Image.new('RGB', (PREVIEW_SIZE, PREVIEW_SIZE * 6))
+    for index, face in enumerate(PREVIEW_FACE_ORDER):
+        tile = Image.frombytes('RGB', (PREVIEW_SIZE, PREVIEW_SIZE), faces[face])
+        strip.paste(tile, (0, index * PREVIEW_SIZE))
+    strip.save(os.path.join(scene_dir, 'preview.jpg'), 'JPEG', quality=quality)
+
+
+def plan_scenes(image_paths, existing_scenes):
+    """
+    Assign scene ids and names to panoramas.
+
+    A panorama whose name matches an existing scene replaces that scene's
+    tiles; others become new scenes numbered after the existing ones.
+
+    Args:
+        image_paths: Equirectangular images
+        existing_scenes: Scenes already in data.js
+
+    Returns:
+        list: Dicts with image, id and name
+    """
+    by_slug = {}
+    for scene in existing_scenes:
+        by_slug[slugify(scene.get('name', ''))] = scene['id']
+
+    plans = []
+    next_index = len(existing_scenes)
+    for image_path in image_paths:
+        name = os.path.splitext(os.path.basename(image_path))[0]
+        slug = slugify(name)
+        scene_id = by_slug.get(slug)
+        if scene_id is None:
+            scene_id = f"{next_index}-{slug}"
+            next_index += 1
+            by_slug[slug] = scene_id
+        plans.append({'image': os.path.abspath(image_path), 'id': scene_id, 'name': name})
+    return plans
+
+
+def tile_panoramas(image_paths, tiles_dir, processes=None, quality=DEFAULT_QUALITY,
+                   existing_scenes=(), cache_dir=None):
+    """
+    Tile equirectangular panoramas into Marzipano cube pyramids.
+
+    Scenes are decoded once each and their six faces are rendered in
+    parallel across a process pool. Only a few decoded panoramas are kept
+    on disk at a time.
+
+    Args:
+        image_paths: Equirectangular images
+        tiles_dir: app-files/tiles directory of the tour
+        processes: Worker processes (defaults to CPU count)
+        quality: JPEG quality for tiles and previews
+        existing_scenes: Scenes already in data.js, for id assignment
+        cache_dir: Scratch directory for decoded panoramas (defaults to a
+            temporary directory); removed when tiling finishes
+
+    Returns:
+        dict: 'scenes' (id, name, levels, faceSize) in input order, plus
+            tiles, bytes and seconds totals
+    """
+    require_imaging()
+    processes = processes or default_jobs()
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix='marzipano-tiler-')
+    plans = plan_scenes(image_paths, existing_scenes)
+
+    start = time.monotonic()
+    results = {}
+    totals = {'tiles': 0, 'bytes': 0}
+
+    try:
+        _run_tiling(plans, tiles_dir, cache_dir, processes, quality, results, totals)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    return {
+        'scenes': [results[plan['id']] for plan in plans],
+        'tiles': totals['tiles'],
+        'bytes': totals['bytes'],
+        'seconds': time.monotonic() - start,
+    }
+
+
+def _run_tiling(plans, tiles_dir, cache_dir, processes, quality, results, totals):
+    # Enough scenes in flight to keep every worker busy with faces
+    max_open = max(1, processes // len(FACES)) + 1
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = list(plans)
+        open_scenes = {}
+        futures = {}
+
+        def open_next():
+            plan = pending.pop(0)
+            plan['scene_dir'] = os.path.join(tiles_dir, plan['id'])
+            plan['cache'] = os.path.join(cache_dir, plan['id'] + '.npy')
+            plan['faces'] = {}
+            shutil.rmtree(plan['scene_dir'], ignore_errors=True)
+            open_scenes[plan['id']] = plan
+            futures[executor.submit(decode_panorama, plan['image'], plan['cache'])] = ('decode', plan)
+
+        while pending and len(open_scenes) < max_open:
+            open_next()
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, plan = futures.pop(future)
+                if kind == 'decode':
+                    width, _ = future.result()
+                    plan['levels'], plan['faceSize'] = compute_levels(width // 4)
+                    for face in FACES:
+                        futures[executor.submit(render_face, plan['cache'], face, plan['levels'],
+                                                plan['scene_dir'], quality)] = ('face', plan)
+                    continue
+
+                face, preview, tiles, nbytes = future.result()
+                plan['faces'][face] = preview
+                totals['tiles'] += tiles
+                totals['bytes'] += nbytes
+                if len(plan['faces']) < len(FACES):
+                    continue
+
+                save_preview(plan['faces'], plan['scene_dir'], quality)
+                os.remove(plan['cache'])
+                del open_scenes[plan['id']]
+                results[plan['id']] = {
+                    'id': plan['id'],
+                    'name': plan['name'],
+                    'levels': plan['levels'],
+                    'faceSize': plan['faceSize'],
+                }
+                print(f"  ✓ {plan['id']} ({plan['faceSize']}px faces, {len(plan['levels']) - 1} levels)")
+                if pending:
+                    open_next()
+
+
+def merge_scenes(data, tiled_scenes):
+    """
+    Add tiled scenes to tour data, or update the levels of existing ones.
+
+    New scenes get the Marzipano Tool defaults for view parameters and
+    empty hotspot lists.
+
+    Args:
+        data: Tour data (APP_DATA)
+        tiled_scenes: 'scenes' from tile_panoramas()
+    """
+    scenes = data.setdefault('scenes', [])
+    by_id = {scene['id']: scene for scene in scenes}
+    for tiled in tiled_scenes:
+        scene = by_id.get(tiled['id'])
+        if scene is None:
+            scene = {
+                'id': tiled['id'],
+                'name': tiled['name'],
+                'levels': tiled['levels'],
+                'faceSize': tiled['faceSize'],
+                'initialViewParameters': {'pitch': 0, 'yaw': 0, 'fov': 1.5707963267948966},
+                'linkHotspots': [],
+                'infoHotspots': [],
+            }
+            scenes.append(scene)
+            by_id[scene['id']] = scene
+        else:
+            scene['levels'] = tiled['levels']
+            scene['faceSize'] = tiled['faceSize']
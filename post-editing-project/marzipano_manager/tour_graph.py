@@ -0,0 +1,114 @@
+"""
+Indexed scene graph of a tour.
+Built once per run and shared by the auto-180 and view-config logic.
+"""
+
+import math
+
+
+def normalize_angle(angle):
+    """Normalize angle to [-π, π] range"""
+    while angle > math.pi:
+        angle -= 2 * math.pi
+    while angle < -math.pi:
+        angle += 2 * math.pi
+    return angle
+
+
+class TourGraph:
+    """
+    Scenes and link hotspots of a tour, indexed for constant-time lookups.
+
+    Provides id -> scene, forward and reverse adjacency, and the return
+    link of any edge (the hotspot in the target scene that points back to
+    the source). Building the index is linear in the number of hotspots.
+    """
+
+    def __init__(self, tour_data):
+        self.scenes = {}
+        self.outgoing = {}
+        self.incoming = {}
+        # (scene id, target id) -> first / last link hotspot in scene pointing at target
+        self._first_link = {}
+        self._last_link = {}
+
+        for scene in tour_data['scenes']:
+            self.scenes[scene['id']] = scene
+            self.outgoing[scene['id']] = []
+            self.incoming.setdefault(scene['id'], [])
+
+        for scene in tour_data['scenes']:
+            source_id = scene['id']
+            for hotspot in scene.get('linkHotspots', []):
+                target_id = hotspot.get('target')
+                if not target_id:
+                    continue
+                self.outgoing[source_id].append(hotspot)
+                self.incoming.setdefault(target_id, []).append((source_id, hotspot))
+                self._first_link.setdefault((source_id, target_id), hotspot)
+                self._last_link[(source_id, target_id)] = hotspot
+
+    def scene(self, scene_id):
+        """Return the scene dict for an id, or None."""
+        return self.scenes.get(scene_id)
+
+    def links_from(self, scene_id):
+        """Link hotspots of a scene."""
+        return self.outgoing.get(scene_id, [])
+
+    def links_to(self, scene_id):
+        """(source id, hotspot) pairs of links pointing at a scene."""
+        return self.incoming.get(scene_id, [])
+
+    def return_link(self, source_id, target_id):
+        """Hotspot in target_id that links back to source_id, or None."""
+        return self._first_link.get((target_id, source_id))
+
+    def edges(self):
+        """Iterate (source id, hotspot) over every link, in tour order."""
+        for source_id, hotspots in self.outgoing.items():
+            for hotspot in hotspots:
+                yield source_id, hotspot
+
+    def entry_yaw(self, source_id, target_id, use_return_links=True):
+        """
+        Auto-180 entry yaw when arriving at target_id from source_id.
+
+        When arriving at B from A, the camera should face away from the way
+        we came in: 180° from B's return hotspot to A if there is one,
+        otherwise 180° from the (last) clicked hotspot in A.
+
+        Args:
+            source_id: Scene the link is clicked in
+            target_id: Scene arrived at
+            use_return_links: Prefer the return hotspot over the clicked one
+
+        Returns:
+            float: Entry yaw, or None if source_id has no link to target_id
+        """
+        reference = self._last_link.get((source_id, target_id))
+        if reference is None:
+            return None
+        if use_return_links:
+            reference = self.return_link(source_id, target_id) or reference
+        return normalize_angle(reference.get('yaw', 0) + math.pi)
+
+    def entry_yaws(self, use_return_links=True):
+        """
+        Compute the auto-180 entry yaw of every link in one pass.
+
+        Args:
+            use_return_links: Prefer the return hotspot over the clicked one
+
+        Returns:
+            dict: target id -> {source id: entry yaw}, for existing targets
+        """
+        entry_yaws = {}
+
+        for source_id, target_id in self._last_link:
+            if target_id not in self.scenes:
+                continue
+            entry_yaws.setdefault(target_id, {})[source_id] = \
+                self.entry_yaw(source_id, target_id, use_return_links)
+
+        return entry_yaws
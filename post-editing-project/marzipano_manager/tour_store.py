@@ -0,0 +1,443 @@
+"""
+Server-side storage of editor saves.
+The editor sends JSON Patch (RFC 6902) deltas against {tourData, viewConfig};
+each accepted patch is appended to a journal, and the journal is compacted
+into app-files/tour_data.json and view_config.json every so often.
+"""
+
+import contextlib
+import copy
+import hashlib
+import json
+import os
+import threading
+
+
+# Documents the editor edits: top-level patch key -> file in app-files/
+DOCUMENT_FILES = {
+    'tourData': 'tour_data.json',
+    'viewConfig': 'view_config.json',
+}
+
+# Append-only journal of accepted patches, in the tour directory (never packaged)
+JOURNAL_FILENAME = '.save_journal.jsonl'
+
+# Compact after this many journal entries or journal bytes
+COMPACT_ENTRIES = 200
+COMPACT_BYTES = 4 * 1024 * 1024
+
+
+class JsonPatchError(ValueError):
+    """Invalid JSON Patch operation or a failed 'test'."""
+
+
+def parse_pointer(pointer):
+    """
+    Split a JSON Pointer (RFC 6901) into reference tokens.
+
+    Args:
+        pointer: Pointer string, e.g. '/tourData/scenes/0/name'
+
+    Returns:
+        list: Unescaped tokens ([] for the whole document)
+    """
+    if pointer == '':
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def _array_index(array, token, allow_end=False):
+    if token == '-' and allow_end:
+        return len(array)
+    if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(array) or (index == len(array) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve(document, tokens):
+    value = document
+    for token in tokens:
+        if isinstance(value, dict):
+            if token not in value:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_array_index(value, token)]
+        else:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return value
+
+
+def _add(document, tokens, value, undo):
+    parent = _resolve(document, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        if key in parent:
+            old = parent[key]
+            undo.append(lambda: parent.__setitem__(key, old))
+        else:
+            undo.append(lambda: parent.pop(key))
+        parent[key] = value
+    elif isinstance(parent, list):
+        index = _array_index(parent, key, allow_end=True)
+        parent.insert(index, value)
+        undo.append(lambda: parent.pop(index))
+    else:
+        raise JsonPatchError(f"Cannot add to a {type(parent).__name__}")
+
+
+def _remove(document, tokens, undo):
+    parent = _resolve(document, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+        old = parent.pop(key)
+        undo.append(lambda: parent.__setitem__(key, old))
+    elif isinstance(parent, list):
+        index = _array_index(parent, key)
+        old = parent.pop(index)
+        undo.append(lambda: parent.insert(index, old))
+    else:
+        raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return old
+
+
+def _apply_operation(document, operation, undo):
+    if not isinstance(operation, dict) or 'op' not in operation or 'path' not in operation:
+        raise JsonPatchError(f"Malformed operation: {operation!r}")
+    op = operation['op']
+    tokens = parse_pointer(operation['path'])
+    if not tokens:
+        raise JsonPatchError("Operations on the whole document are not supported")
+
+    if op in ('add', 'replace', 'test') and 'value' not in operation:
+        raise JsonPatchError(f"'{op}' needs a value")
+
+    if op == 'add':
+        _add(document, tokens, operation['value'], undo)
+    elif op == 'remove':
+        _remove(document, tokens, undo)
+    elif op == 'replace':
+        _remove(document, tokens, undo)
+        _add(document, tokens, operation['value'], undo)
+    elif op in ('move', 'copy'):
+        source = parse_pointer(operation.get('from', ''))
+        if not source:
+            raise JsonPatchError(f"'{op}' needs a 'from' path")
+        if op == 'move':
+            if tokens[:len(source)] == source and tokens != source:
+                raise JsonPatchError("Cannot move a value into itself")
+            value = _remove(document, source, undo)
+        else:
+            value = copy.deepcopy(_resolve(document, source))
+        _add(document, tokens, value, undo)
+    elif op == 'test':
+        if _resolve(document, tokens) != operation['value']:
+            raise JsonPatchError(f"Test failed at {operation['path']}")
+    else:
+        raise JsonPatchError(f"Unknown operation: {op!r}")
+
+
+def _undo(undo):
+    for step in reversed(undo):
+        step()
+
+
+def _apply_operations(document, operations):
+    """Apply a patch atomically; returns the steps undoing it."""
+    if not isinstance(operations, list):
+        raise JsonPatchError("A JSON Patch must be a list of operations")
+    undo = []
+    try:
+        for operation in operations:
+            _apply_operation(document, operation, undo)
+    except (JsonPatchError, TypeError):
+        _undo(undo)
+        raise
+    return undo
+
+
+def apply_patch(document, operations):
+    """
+    Apply a JSON Patch in place, atomically.
+
+    If any operation fails, the operations already applied are undone, so
+    the document is either fully patched or unchanged. Values are inserted
+    as given, not copied.
+
+    Args:
+        document: Document to modify
+        operations: List of RFC 6902 operations
+
+    Raises:
+        JsonPatchError: If an operation is invalid or a test fails
+    """
+    _apply_operations(document, operations)
+
+
+def _documents_touched(operations):
+    """
+    Names of the documents a patch modifies.
+
+    Raises:
+        JsonPatchError: If the patch is malformed or leaves the documents
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("A JSON Patch must be a list of operations")
+    touched = set()
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise JsonPatchError(f"Malformed operation: {operation!r}")
+        for field in ('path', 'from'):
+            if field not in operation:
+                continue
+            tokens = parse_pointer(operation[field])
+            if not tokens or tokens[0] not in DOCUMENT_FILES:
+                raise JsonPatchError(f"Path outside the tour documents: {operation[field]!r}")
+            if operation.get('op') != 'test' and (field == 'path' or operation.get('op') == 'move'):
+                touched.add(tokens[0])
+    return touched
+
+
+def document_digest(document):
+    """Digest of a document's canonical JSON form."""
+    canonical = json.dumps(document, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _write_json_atomic(path, value):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(value, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class TourStore:
+    """
+    The editor's documents plus the journal of patches not yet compacted.
+
+    The journal starts with a header holding the digest of the documents on
+    disk it applies to. If they no longer match (the documents were
+    rewritten, e.g. by a compaction interrupted before the journal was
+    reset), the stale entries are dropped instead of being applied twice.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self.app_files = os.path.join(work_dir, 'app-files')
+        self.journal_path = os.path.join(work_dir, JOURNAL_FILENAME)
+        self.lock = threading.Lock()
+        self.document = {}
+        # Digest of each document as last read from or written to disk
+        self.disk_digests = {}
+        for key in DOCUMENT_FILES:
+            self.document[key] = self._read_document(key)
+            self.disk_digests[key] = document_digest(self.document[key])
+        self.revision = 0
+        self.entries = 0
+        self.dirty = set()
+        self.discarded = 0
+        self.journal_current = False
+        self._replay()
+
+    @classmethod
+    def exists(cls, work_dir):
+        """Whether work_dir has the tour_data.json the store is built on."""
+        return os.path.exists(os.path.join(work_dir, 'app-files', DOCUMENT_FILES['tourData']))
+
+    def _read_document(self, key):
+        path = os.path.join(self.app_files, DOCUMENT_FILES[key])
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _replay(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            lines = [line for line in f if line.strip()]
+        if not lines:
+            return
+
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            header = {}
+        if header.get('base') != document_digest(self.document):
+            self.discarded = len(lines) - 1
+            return
+
+        self.revision = header.get('revision', 0)
+        for number, line in enumerate(lines[1:], 1):
+            try:
+                entry = json.loads(line)
+                apply_patch(self.document, entry['ops'])
+            except (ValueError, KeyError):
+                # A torn final write was never acknowledged; entries after
+                # an unreadable one were, and are lost
+                self.discarded = len(lines) - 1 - number
+                return
+            self.revision = entry['revision']
+            self.entries += 1
+            self.dirty.update(_documents_touched(entry['ops']))
+        self.journal_current = True
+
+    def snapshot(self):
+        """
+        Current state.
+
+        Returns:
+            dict: {'revision', 'tourData', 'viewConfig'}
+        """
+        with self.lock:
+            return dict(copy.deepcopy(self.document), revision=self.revision)
+
+    def apply(self, operations, base_revision=None):
+        """
+        Apply and journal a patch.
+
+        Args:
+            operations: JSON Patch against {tourData, viewConfig}
+            base_revision: Revision the client patched (None skips the check)
+
+        Returns:
+            int: New revision, or None if base_revision is outdated
+
+        Raises:
+            JsonPatchError: If the patch is invalid; nothing is changed
+            OSError: If the journal cannot be written; nothing is changed
+        """
+        with self.lock:
+            if base_revision is not None and base_revision != self.revision:
+                return None
+            touched = _documents_touched(operations)
+            if not operations:
+                return self.revision
+
+            # Start a journal whose header matches the documents on disk
+            if not self.journal_current:
+                self._compact()
+
+            # Journal the patch as received: the document gets copies of its
+            # values, which later operations and patches modify in place
+            entry = json.dumps({'revision': self.revision + 1, 'ops': operations},
+                               separators=(',', ':'), ensure_ascii=False)
+            undo = _apply_operations(self.document, copy.deepcopy(operations))
+            try:
+                self._append_journal(entry)
+            except OSError:
+                _undo(undo)
+                raise
+
+            self.revision += 1
+            self.entries += 1
+            self.dirty.update(touched)
+
+            if self.entries >= COMPACT_ENTRIES or os.path.getsize(self.journal_path) >= COMPACT_BYTES:
+                self._compact()
+            return self.revision
+
+    def _append_journal(self, entry):
+        with open(self.journal_path, 'ab', buffering=0) as f:
+            size = f.seek(0, os.SEEK_END)
+            try:
+                f.write((entry + '\n').encode('utf-8'))
+                os.fsync(f.fileno())
+            except OSError:
+                # Cut off the partial line so later entries still replay
+                with contextlib.suppress(OSError):
+                    f.truncate(size)
+                raise
+
+    def changed_on_disk(self):
+        """
+        Documents whose files were changed by something other than the store.
+
+        Returns:
+            set: Document keys ('tourData', 'viewConfig')
+
+        Raises:
+            ValueError: If a changed file is not valid JSON (e.g. mid-edit)
+        """
+        with self.lock:
+            return {key for key in DOCUMENT_FILES
+                    if document_digest(self._read_document(key)) != self.disk_digests[key]}
+
+    def refresh(self, keys):
+        """
+        Adopt documents edited on disk.
+
+        Journaled edits to the other documents are written out first; those
+        to the reloaded documents are superseded by the files. The revision
+        is bumped so editors holding the old state get a conflict.
+
+        Args:
+            keys: Document keys to reload
+
+        Returns:
+            bool: Whether journaled edits to the reloaded documents were dropped
+        """
+        with self.lock:
+            documents = {key: self._read_document(key) for key in keys}
+            dropped = bool(self.dirty & set(keys))
+            self.dirty -= set(keys)
+            self.document.update(documents)
+            for key, document in documents.items():
+                self.disk_digests[key] = document_digest(document)
+            self.revision += 1
+            self._compact()
+            return dropped
+
+    def compact(self):
+        """
+        Write the documents and reset the journal.
+
+        Returns:
+            list: File names written
+        """
+        with self.lock:
+            return self._compact()
+
+    def _compact(self):
+        written = []
+        for key in sorted(self.dirty):
+            filename = DOCUMENT_FILES[key]
+            _write_json_atomic(os.path.join(self.app_files, filename), self.document[key])
+            self.disk_digests[key] = document_digest(self.document[key])
+            written.append(filename)
+        self._reset_journal()
+        self.dirty.clear()
+        self.entries = 0
+        return written
+
+    def _reset_journal(self):
+        header = {'base': document_digest(self.document), 'revision': self.revision}
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header) + '\n')
+        os.replace(tmp_path, self.journal_path)
+        self.journal_current = True
+
+
+def load_documents(work_dir):
+    """
+    Tour data and view config including journaled edits, read-only.
+
+    Args:
+        work_dir: Tour directory
+
+    Returns:
+        tuple: (tour data, view config, or None if there is none yet)
+    """
+    store = TourStore(work_dir)
+    has_view_config = 'viewConfig' in store.dirty or \
+        os.path.exists(os.path.join(store.app_files, DOCUMENT_FILES['viewConfig']))
+    return store.document['tourData'], store.document['viewConfig'] if has_view_config else None
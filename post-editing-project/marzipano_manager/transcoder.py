@@ -0,0 +1,259 @@
+"""
+Tile transcoding to modern image formats (WebP/AVIF).
+Writes a sibling of every JPEG tile; the JPEGs stay as the fallback.
+
+Requires Pillow (optional dependency: pip install pillow).
+"""
+
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .file_ops import WORK_CACHE_DIR, ProgressReporter, default_jobs, member_target_path
+
+
+# Supported formats: Pillow encoder, default quality and a 1x1 probe image
+# the runtime decodes to detect browser support
+FORMATS = {
+    'webp': {
+        'encoder': 'WEBP',
+        'quality': 80,
+        'probe': 'data:image/webp;base64,UklGRiQAAABXRUJQVlA4IBgAAAAwAQCdASoBAAEAAsBMJaQAA3AA/veMAAA=',
+    },
+    'avif': {
+        'encoder': 'AVIF',
+        'quality': 60,
+        'probe': (
+            'data:image/avif;base64,AAAAIGZ0eXBhdmlmAAAAAGF2aWZtaWYxbWlhZk1BMUIAAADrbWV0YQAAAAAAAAAh'
+            'aGRscgAAAAAAAAAAcGljdAAAAAAAAAAAAAAAAAAAAAAOcGl0bQAAAAAAAQAAAB5pbG9jAAAAAEQAAAEAAQAAAAEA'
+            'AAETAAAAIQAAAChpaW5mAAAAAAABAAAAGmluZmUCAAAAAAEAAGF2MDFDb2xvcgAAAABqaXBycAAAAEtpcGNvAAAA'
+            'FGlzcGUAAAAAAAAAAQAAAAEAAAAQcGl4aQAAAAADCAgIAAAADGF2MUOBAAwAAAAAE2NvbHJuY2x4AAEADQAGgAAA'
+            'ABdpcG1hAAAAAAAAAAEAAQQBAoMEAAAAKW1kYXQSAAoIGAAGiAhoNCAyExlHh4Yhh5555oAAAJBAyRxgimo='
+        ),
+    },
+}
+
+TILES_PREFIX = 'app-files/tiles/'
+
+# Settings of the last transcode, so a quality change re-encodes everything
+SETTINGS_FILE = 'transcode.json'
+
+# Tiles handed to a worker process per task
+CHUNK_SIZE = 64
+
+# Per-process cache of open source ZIPs (workers transcode many members)
+_zip_files = {}
+
+
+def check_format(tile_format):
+    """
+    Validate a tile format and make sure Pillow can encode it.
+
+    Args:
+        tile_format: Format name ('webp' or 'avif')
+
+    Raises:
+        ValueError: Unknown format
+        ImportError: Pillow is missing or lacks the encoder
+    """
+    if tile_format not in FORMATS:
+        raise ValueError(f"Unsupported tile format: {tile_format} (choose from {', '.join(FORMATS)})")
+    if Image is None:
+        raise ImportError("Tile transcoding requires Pillow: pip install pillow")
+    Image.init()
+    if FORMATS[tile_format]['encoder'] not in Image.SAVE:
+        raise ImportError(f"This Pillow build cannot encode {tile_format}")
+
+
+def _open_source(source):
+    if isinstance(source, str):
+        return open(source, 'rb')
+    zip_path, member = source
+    zf = _zip_files.get(zip_path)
+    if zf is None:
+        zf = _zip_files[zip_path] = zipfile.ZipFile(zip_path, 'r')
+    return zf.open(member)
+
+
+def transcode_tile(source, target, encoder, quality):
+    """
+    Transcode one JPEG tile.
+
+    Args:
+        source: JPEG path, or (zip path, member name) for overlay tours
+        target: Output path
+        encoder: Pillow format name
+        quality: Encoder quality
+
+    Returns:
+        int: Size of the written file
+
+    Raises:
+        OSError: The tile cannot be read, decoded or written; the message
+            names the tile
+    """
+    try:
+        with _open_source(source) as f, Image.open(f) as image:
+            image.load()
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = target + '.tmp'
+            image.save(tmp_path, encoder, quality=quality)
+        os.replace(tmp_path, target)
+    except OSError as e:
+        name = source if isinstance(source, str) else f"{source[1]} in {source[0]}"
+        raise OSError(f"Could not transcode {name}: {e}") from None
+    return os.path.getsize(target)
+
+
+def _transcode_chunk(tasks, encoder, quality):
+    return [transcode_tile(source, target, encoder, quality) for source, target in tasks]
+
+
+def collect_tiles(work_dir, extension, source_zip=None):
+    """
+    Find JPEG tiles and previews and their transcoded counterparts.
+
+    Args:
+        work_dir: Tour directory
+        extension: Target extension without the dot
+        source_zip: Source ZIP when work_dir is an overlay
+
+    Returns:
+        list: (source, target, source size, source mtime) tuples
+    """
+    tiles = {}
+    tiles_dir = os.path.join(work_dir, *TILES_PREFIX.split('/'))
+
+    if source_zip:
+        with zipfile.ZipFile(source_zip, 'r') as zf:
+            zip_mtime = os.path.getmtime(source_zip)
+            for info in zf.infolist():
+                if info.filename.startswith(TILES_PREFIX) and info.filename.lower().endswith('.jpg'):
+                    path = member_target_path(work_dir, info.filename)
+                    tiles[path] = ((source_zip, info.filename), info.file_size, zip_mtime)
+
+    for root, _, files in os.walk(tiles_dir):
+        for name in files:
+            if name.lower().endswith('.jpg'):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                tiles[path] = (path, stat.st_size, stat.st_mtime)
+
+    return [
+        (source, os.path.splitext(path)[0] + '.' + extension, size, mtime)
+        for path, (source, size, mtime) in sorted(tiles.items())
+    ]
+
+
+def remove_orphans(work_dir, tiles):
+    """Delete transcoded tiles whose JPEG is gone or that use another format."""
+    wanted = {target for _, target, _, _ in tiles}
+    extensions = tuple('.' + name for name in FORMATS)
+    tiles_dir = os.path.join(work_dir, *TILES_PREFIX.split('/'))
+    removed = 0
+    for root, _, files in os.walk(tiles_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(extensions) and path not in wanted:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def remove_transcoded(work_dir):
+    """
+    Delete the transcoded tiles of a previous build and its settings.
+
+    Returns:
+        int: Number of tiles removed
+    """
+    settings_path = os.path.join(work_dir, WORK_CACHE_DIR, SETTINGS_FILE)
+    if os.path.exists(settings_path):
+        os.remove(settings_path)
+    return remove_orphans(work_dir, [])
+
+
+def transcode_tiles(work_dir, tile_format, quality=None, processes=None, source_zip=None,
+                    progress=True):
+    """
+    Transcode every tile of a tour across a process pool.
+
+    Tiles whose transcoded file is newer than the JPEG are skipped, so
+    repeated builds only encode new or changed tiles, unless the format or
+    quality differs from the previous run.
+
+    Args:
+        work_dir: Tour directory
+        tile_format: 'webp' or 'avif'
+        quality: Encoder quality (defaults per format)
+        processes: Worker processes (defaults to CPU count)
+        source_zip: Source ZIP when work_dir is an overlay
+        progress: Print a progress line
+
+    Returns:
+        dict: tiles, encoded, skipped, removed, jpeg_bytes, output_bytes, seconds
+    """
+    check_format(tile_format)
+    fmt = FORMATS[tile_format]
+    quality = quality or fmt['quality']
+    processes = processes or default_jobs()
+    start = time.monotonic()
+
+    tiles = collect_tiles(work_dir, tile_format, source_zip)
+    removed = remove_orphans(work_dir, tiles)
+
+    settings = {'format': tile_format, 'quality': quality}
+    settings_path = os.path.join(work_dir, WORK_CACHE_DIR, SETTINGS_FILE)
+    try:
+        with open(settings_path, 'r', encoding='utf-8') as f:
+            unchanged = json.load(f) == settings
+    except (OSError, ValueError):
+        unchanged = False
+
+    todo = []
+    output_bytes = 0
+    for source, target, size, mtime in tiles:
+        try:
+            stat = os.stat(target)
+        except FileNotFoundError:
+            stat = None
+        if unchanged and stat is not None and stat.st_mtime >= mtime:
+            output_bytes += stat.st_size
+        else:
+            todo.append((source, target, size))
+
+    reporter = ProgressReporter('Transcoding', len(todo), sum(t[2] for t in todo), enabled=progress)
+    if todo:
+        chunks = [todo[i:i + CHUNK_SIZE] for i in range(0, len(todo), CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [
+                (chunk, executor.submit(_transcode_chunk, [(s, t) for s, t, _ in chunk],
+                                        fmt['encoder'], quality))
+                for chunk in chunks
+            ]
+            for chunk, future in futures:
+                sizes = future.result()
+                output_bytes += sum(sizes)
+                reporter.update(files=len(chunk), nbytes=sum(t[2] for t in chunk))
+    reporter.finish()
+
+    os.makedirs(os.path.dirname(settings_path), exist_ok=True)
+    with open(settings_path, 'w', encoding='utf-8') as f:
+        json.dump(settings, f)
+
+    return {
+        'tiles': len(tiles),
+        'encoded': len(todo),
+        'skipped': len(tiles) - len(todo),
+        'removed': removed,
+        'jpeg_bytes': sum(t[2] for t in tiles),
+        'output_bytes': output_bytes,
+        'seconds': time.monotonic() - start,
+    }
@@ -31,6 +31,13 @@
   let isTransitioning = false;
   let originalLimiter = null;
 
+  // Prefetch state
+  const PREFETCH_MANIFEST_URL = "prefetch.json";
+  let prefetchManifest; // undefined: not requested, null: unavailable
+  let prefetchCallbacks = [];
+  let prefetchGeneration = 0;
+  const prefetched = new Set();
+
   /**
    * Load view configuration
    */
@@ -232,6 +239,7 @@
               // Switch scene
               toScene.scene.switchTo();
               currentSceneId = toSceneId;
+              schedulePrefetch(toSceneId);
 
               // Step 4: Remove blur & restore zoom limits
               console.log("4️⃣ Removing blur & restoring zoom...");
@@ -261,6 +269,109 @@
     );
   };
 
+  /**
+   * Load prefetch.json once (written by the build)
+   */
+  function loadPrefetchManifest(callback) {
+    if (prefetchManifest !== undefined) {
+      callback(prefetchManifest);
+      return;
+    }
+    prefetchCallbacks.push(callback);
+    if (prefetchCallbacks.length > 1) return;
+
+    fetch(PREFETCH_MANIFEST_URL)
+      .then(function (response) {
+        return response.ok ? response.json() : null;
+      })
+      .catch(function () {
+        return null;
+      })
+      .then(function (manifest) {
+        prefetchManifest = manifest;
+        const callbacks = prefetchCallbacks;
+        prefetchCallbacks = [];
+        callbacks.forEach(function (cb) {
+          cb(manifest);
+        });
+      });
+  }
+
+  function whenIdle(fn) {
+    if (window.requestIdleCallback) {
+      window.requestIdleCallback(fn, { timeout: 2000 });
+    } else {
+      setTimeout(fn, 200);
+    }
+  }
+
+  /**
+   * Warm the previews and entry-view tiles of the neighbours of a scene
+   * while the browser is idle, within the manifest's byte budget.
+   * Starting another scene's prefetch cancels this one.
+   */
+  function schedulePrefetch(sceneId) {
+    const generation = ++prefetchGeneration;
+
+    loadPrefetchManifest(function (manifest) {
+      if (!manifest || generation !== prefetchGeneration) return;
+
+      // Interleave links so every neighbour gets its preview first
+      const links = manifest.scenes[sceneId] || [];
+      const queue = [];
+      for (let i = 0; links.some((link) => i < link.assets.length); i++) {
+        links.forEach(function (link) {
+          if (i < link.assets.length) queue.push(link.assets[i]);
+        });
+      }
+
+      let remaining = manifest.budget;
+
+      function next() {
+        if (generation !== prefetchGeneration) return;
+        if (isTransitioning) {
+          setTimeout(next, TRANSITION_CONFIG.unzoomDuration);
+          return;
+        }
+        whenIdle(function () {
+          while (queue.length && generation === prefetchGeneration) {
+            const asset = queue.shift();
+            const url = window.resolveTileUrl
+              ? window.resolveTileUrl(asset[0])
+              : asset[0];
+            if (prefetched.has(url) || asset[1] > remaining) continue;
+
+            remaining -= asset[1];
+            prefetched.add(url);
+            const image = new Image();
+            image.onload = image.onerror = next;
+            image.src = url;
+            return;
+          }
+        });
+      }
+
+      next();
+    });
+  }
+
+  // Initial scene: shown by index.js before it fires "marzipano-ready"
+  function prefetchInitialScene() {
+    if (currentSceneId || !window.viewer || !window.scenes) return;
+    const active = window.viewer.scene();
+    window.scenes.forEach(function (scene) {
+      if (scene.scene === active) schedulePrefetch(scene.data.id);
+    });
+  }
+
+  if (window.marzipanoReady) {
+    prefetchInitialScene();
+  } else {
+    window.addEventListener("marzipano-ready", prefetchInitialScene, {
+      once: true,
+    });
+  }
+
   /**
    * Normalize angle to [-π, π]
    */
@@ -275,6 +386,7 @@
    */
   window.setCurrentScene = function (sceneId) {
     currentSceneId = sceneId;
+    schedulePrefetch(sceneId);
   };
 
   console.log("🎬 Seamless Transition System loaded");
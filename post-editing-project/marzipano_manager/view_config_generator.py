@@ -2,20 +2,45 @@
 Generates view configuration with auto-180 logic for seamless transitions.
 """
 
+import hashlib
 import json
-import math
+import os
 
+try:
+    from . import parser
+    from .file_ops import WORK_CACHE_DIR
+    from .tour_graph import TourGraph
+except ImportError:  # Run as a standalone script
+    import parser
+    from file_ops import WORK_CACHE_DIR
+    from tour_graph import TourGraph
 
-def normalize_angle(angle):
-    """Normalize angle to [-π, π] range"""
-    while angle > math.pi:
-        angle -= 2 * math.pi
-    while angle < -math.pi:
-        angle += 2 * math.pi
-    return angle
 
+# Scene hashes and generated entry digests of the last regeneration, kept
+# in the tour's cache directory for incremental updates
+SOURCES_FILENAME = 'view_config_sources.json'
 
-def generate_view_config(tour_data):
+DEFAULT_FOV = 1.3365071038314758
+
+
+def _init_parameters(scene):
+    init_params = scene['initialViewParameters']
+    return {
+        'yaw': init_params.get('yaw', 0),
+        'pitch': 0,  # Always horizontal
+        'fov': init_params.get('fov', DEFAULT_FOV)
+    }
+
+
+def _entry_view(entry_yaw, entry_fov):
+    return {
+        'yaw': entry_yaw,
+        'pitch': 0,  # Always horizontal
+        'fov': entry_fov
+    }
+
+
+def generate_view_config(tour_data, graph=None):
     """
     Generate view configuration with auto-180 logic.
     
@@ -23,6 +48,13 @@ def generate_view_config(tour_data):
     - Scene B's entry view when coming from A should be ~180° from the hotspot direction
     - This creates the illusion of "walking through" the doorway
     
+    Return links are looked up in the TourGraph index, so generation is
+    linear in the number of hotspots.
+    
+    Args:
+        tour_data: Tour data dictionary
+        graph: Optional prebuilt TourGraph for tour_data
+    
     Returns a dict structure:
     {
       "scene-id": {
@@ -34,66 +66,200 @@ def generate_view_config(tour_data):
       }
     }
     """
+    if graph is None:
+        graph = TourGraph(tour_data)
+    
     view_config = {}
     
     # Initialize with default parameters (force horizontal pitch)
     for scene in tour_data['scenes']:
-        scene_id = scene['id']
-        init_params = scene['initialViewParameters']
-        
-        view_config[scene_id] = {
-            'Init_parameters': {
-                'yaw': init_params.get('yaw', 0),
-                'pitch': 0,  # Always horizontal
-                'fov': init_params.get('fov', 1.3365071038314758)
-            },
+        view_config[scene['id']] = {
+            'Init_parameters': _init_parameters(scene),
             'ifCameFrom': {}
         }
     
-    # Build the conditional views based on hotspot links
-    for source_scene in tour_data['scenes']:
-        source_id = source_scene['id']
+    # Entry views face 180° away from the return hotspot (look through the
+    # doorway), falling back to the clicked hotspot + 180°
+    for target_id, entry_yaws in graph.entry_yaws(use_return_links=True).items():
+        # Use default FOV from target scene
+        entry_fov = view_config[target_id]['Init_parameters']['fov']
         
-        for hotspot in source_scene.get('linkHotspots', []):
-            target_id = hotspot['target']
-            
-            # CORRECT LOGIC: 
-            # Find the RETURN hotspot in the target scene that points back to source
-            # Entry angle should be 180° from that return hotspot
-            return_hotspot_yaw = None
-            
-            # Find target scene
-            target_scene = next((s for s in tour_data['scenes'] if s['id'] == target_id), None)
-            if target_scene:
-                # Look for hotspot in target that points back to source
-                for return_hs in target_scene.get('linkHotspots', []):
-                    if return_hs['target'] == source_id:
-                        return_hotspot_yaw = return_hs['yaw']
-                        break
+        for source_id, entry_yaw in entry_yaws.items():
+            view_config[target_id]['ifCameFrom'][source_id] = _entry_view(entry_yaw, entry_fov)
+    
+    return view_config
+
+
+def merge_view_config(generated, existing):
+    """
+    Combine a regenerated view config with the one the editor saved.
+    
+    Init_parameters follow the tour data; entry views saved for links that
+    still exist are kept (they may have been aligned by hand), entries for
+    new links are taken from the generated config and entries for removed
+    scenes or links are dropped.
+    
+    Args:
+        generated: Output of generate_view_config for the current tour data
+        existing: Previously saved view config
+    
+    Returns:
+        dict: Merged view config
+    """
+    merged = {}
+    for scene_id, scene_config in generated.items():
+        saved = existing.get(scene_id, {}).get('ifCameFrom', {})
+        merged[scene_id] = {
+            'Init_parameters': scene_config['Init_parameters'],
+            'ifCameFrom': {
+                source_id: saved.get(source_id, entry)
+                for source_id, entry in scene_config['ifCameFrom'].items()
+            }
+        }
+    return merged
+
+
+def _digest(value):
+    payload = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def scene_hashes(tour_data):
+    """
+    Fingerprint the inputs of each scene's view config.
+    
+    Returns:
+        dict: scene id -> {'view': hash of the initial view, 'links': hash
+            of the link hotspots (target and yaw, in order)}
+    """
+    hashes = {}
+    for scene in tour_data['scenes']:
+        hashes[scene['id']] = {
+            'view': _digest(_init_parameters(scene)),
+            'links': _digest([[hotspot.get('target'), hotspot.get('yaw', 0)]
+                              for hotspot in scene.get('linkHotspots', [])]),
+        }
+    return hashes
+
+
+def update_view_config(tour_data, existing, sources=None, graph=None):
+    """
+    Regenerate a view config incrementally.
+    
+    Only entries whose inputs changed since the regeneration recorded in
+    sources are recomputed: a scene's Init_parameters when its initial view
+    changed, an ifCameFrom entry when the source scene's links (the clicked
+    hotspot) or the target scene's links (the return hotspot) or initial
+    view changed. An entry that differs from what was generated for it last
+    time was aligned by hand and is kept even then; without sources (the
+    first run) that is every entry differing from the generated one, as in
+    merge_view_config.
+    Entries of removed scenes or links are dropped.
+    
+    Args:
+        tour_data: Tour data dictionary
+        existing: Saved view config ({} if there is none)
+        sources: Record returned by the previous call, or None
+        graph: Optional prebuilt TourGraph for tour_data
+    
+    Returns:
+        tuple: (view config, sources record for the next call, report dict
+            with 'recomputed' and 'kept' ((scene id, source id or None)
+            pairs: recomputed entries, hand-tuned entries whose inputs
+            changed), 'reused' and 'removed' (entry counts))
+    """
+    if graph is None:
+        graph = TourGraph(tour_data)
+    hashes = scene_hashes(tour_data)
+    previous = (sources or {}).get('scenes', {})
+    generated = (sources or {}).get('generated', {})
+    changed = {
+        scene_id: {key: previous.get(scene_id, {}).get(key) != digest
+                   for key, digest in scene_hash.items()}
+        for scene_id, scene_hash in hashes.items()
+    }
+    
+    view_config = {}
+    record = {'scenes': hashes, 'generated': {}}
+    report = {'recomputed': [], 'kept': [], 'reused': 0, 'removed': 0}
+    for scene in tour_data['scenes']:
+        target_id = scene['id']
+        saved = existing.get(target_id, {})
+        init_params = saved.get('Init_parameters')
+        if init_params is None or changed[target_id]['view']:
+            init_params = _init_parameters(scene)
+            report['recomputed'].append((target_id, None))
+        else:
+            report['reused'] += 1
+        
+        saved_entries = saved.get('ifCameFrom', {})
+        entries = {}
+        digests = {}
+        last_digests = generated.get(target_id, {})
+        for source_id, _ in graph.links_to(target_id):
+            if source_id in entries:
+                continue
+            entry = saved_entries.get(source_id)
+            if entry is not None and not (changed[source_id]['links'] or
+                                          changed[target_id]['links'] or changed[target_id]['view']):
+                entries[source_id] = entry
+                digests[source_id] = last_digests.get(source_id) or _digest(entry)
+                report['reused'] += 1
+                continue
             
-            # Calculate entry angle
-            if return_hotspot_yaw is not None:
-                # Face 180° away from the return hotspot (look through the doorway)
-                entry_yaw = normalize_angle(return_hotspot_yaw + math.pi)
+            fresh = _entry_view(graph.entry_yaw(source_id, target_id),
+                                _init_parameters(scene)['fov'])
+            digests[source_id] = _digest(fresh)
+            if entry is not None and _digest(entry) != last_digests.get(source_id, digests[source_id]):
+                entries[source_id] = entry
+                report['kept'].append((target_id, source_id))
             else:
-                # Fallback: use the clicked hotspot + 180 (old logic)
-                entry_yaw = normalize_angle(hotspot['yaw'] + math.pi)
-            
-            # Always horizontal view (pitch = 0)
-            entry_pitch = 0
-            
-            # Use default FOV from target scene
-            entry_fov = view_config[target_id]['Init_parameters']['fov']
-            
-            # Store the conditional view
-            if target_id in view_config:
-                view_config[target_id]['ifCameFrom'][source_id] = {
-                    'yaw': entry_yaw,
-                    'pitch': entry_pitch,
-                    'fov': entry_fov
-                }
+                entries[source_id] = fresh
+                report['recomputed'].append((target_id, source_id))
+        
+        report['removed'] += len(set(saved_entries) - set(entries))
+        view_config[target_id] = {'Init_parameters': init_params, 'ifCameFrom': entries}
+        record['generated'][target_id] = digests
     
-    return view_config
+    report['removed'] += sum(len(scene_config.get('ifCameFrom', {})) + 1
+                             for scene_id, scene_config in existing.items() if scene_id not in view_config)
+    return view_config, record, report
+
+
+def sources_path(work_dir):
+    """Path of a tour's view config sources record."""
+    return os.path.join(work_dir, WORK_CACHE_DIR, SOURCES_FILENAME)
+
+
+def load_sources(work_dir):
+    """Sources record of the last regeneration, or None."""
+    try:
+        with open(sources_path(work_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_sources(sources, work_dir):
+    """Keep the sources record for the next incremental regeneration."""
+    path = sources_path(work_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(sources, f, separators=(',', ':'))
+
+
+def print_update_report(report, limit=10):
+    """Print what an incremental regeneration recomputed and kept."""
+    def describe(target_id, source_id):
+        return f"{target_id} (initial view)" if source_id is None else f"{target_id} ← {source_id}"
+    
+    print(f"✓ View config: {len(report['recomputed'])} entries recomputed, {report['reused']} unchanged, "
+          f"{len(report['kept'])} hand-tuned kept, {report['removed']} removed")
+    for label, entries in (('recomputed', report['recomputed']), ('kept', report['kept'])):
+        for target_id, source_id in entries[:limit]:
+            print(f"  {'↻' if label == 'recomputed' else '✋'} {describe(target_id, source_id)}")
+        if len(entries) > limit:
+            print(f"  ... and {len(entries) - limit} more {label}")
 
 
 def save_view_config(view_config, output_path):
@@ -105,16 +271,7 @@ def save_view_config(view_config, output_path):
 
 def generate_from_data_js(data_js_path, output_path):
     """Generate view config from data.js file"""
-    # Read and parse data.js
-    with open(data_js_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Extract JSON from "var APP_DATA = {...};"
-    start = content.find('{')
-    end = content.rfind('}') + 1
-    json_str = content[start:end]
-    
-    tour_data = json.loads(json_str)
+    tour_data = parser.parse_data_js(data_js_path)
     view_config = generate_view_config(tour_data)
     save_view_config(view_config, output_path)
     
@@ -0,0 +1,292 @@
+"""
+Watch mode for the preview server.
+Polls the tour directory and the editor sources, regenerates only the
+files derived from what changed and notifies open editor tabs.
+"""
+
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from . import html_patcher
+from . import js_patcher
+from . import parser
+from . import view_config_generator
+from .patch_pipeline import APPLIED, PatchPipeline, run_pipelines
+from .tour_graph import TourGraph
+from .tour_store import DOCUMENT_FILES
+
+
+# Seconds between two polls of the watched files
+DEFAULT_POLL_INTERVAL = 0.5
+
+MANAGER_DIR = Path(__file__).parent
+
+# Editor sources in this package -> the file init installs them as in app-files/
+INSTALLED_SOURCES = {
+    MANAGER_DIR / "editor" / "editor.js": 'editor.js',
+    MANAGER_DIR / "editor" / "editor.css": 'editor.css',
+    MANAGER_DIR / "transitions" / "runtime.js": 'transition_runtime.js',
+}
+
+EDITOR_INIT_TEMPLATE = MANAGER_DIR / "templates" / "editor_init.html"
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class TourWatcher:
+    """
+    Polls a tour for edits and keeps its derived files up to date.
+
+    Only the top level of app-files/ is scanned (never the tiles), plus the
+    editor sources, so a poll costs a few dozen stat calls. A change is
+    handled once the files have been stable for one poll, so a save written
+    in several steps is handled once; files the watcher writes itself are
+    not picked up as changes.
+
+    What is regenerated:
+    - tour_data.json: data.js and view_config.json (hand-aligned entry
+      views are kept), then index.html
+    - view_config.json, index.html, index.js, editor_init.html: the
+      idempotent index.html/index.js patches, with the view config inlined
+    - editor.js, editor.css, runtime.js in this package: their copy in app-files/
+
+    Events passed to notify(event, data):
+    - 'reload' {'files'}: open tabs should reload
+    - 'view-config' {'viewConfig', 'revision'}: only the view config changed
+    - 'stylesheet' {'files'}: stylesheets to refetch
+    """
+
+    def __init__(self, work_dir, notify, store=None, interval=DEFAULT_POLL_INTERVAL):
+        """
+        Args:
+            work_dir: Tour directory
+            notify: Function (event, data) called with each change event
+            store: TourStore of the preview server, kept in sync with edits
+                made to tour_data.json and view_config.json on disk
+            interval: Seconds between polls
+        """
+        self.work_dir = work_dir
+        self.app_files = os.path.join(work_dir, "app-files")
+        self.notify = notify
+        self.store = store
+        self.interval = interval
+
+        self.index_path = os.path.join(self.app_files, "index.html")
+        if not os.path.exists(self.index_path):
+            self.index_path = os.path.join(work_dir, "index.html")
+        self.index_js_path = js_patcher.index_js_path(work_dir)
+
+        self.signatures = self._scan()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _watched_paths(self):
+        paths = {str(source) for source in INSTALLED_SOURCES}
+        paths.add(str(EDITOR_INIT_TEMPLATE))
+        paths.add(self.index_path)
+        with os.scandir(self.app_files) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith('.') and \
+                        not entry.name.endswith(('.tmp', '.gz')):
+                    paths.add(entry.path)
+        return paths
+
+    def _scan(self):
+        signatures = {}
+        for path in self._watched_paths():
+            signature = _signature(path)
+            if signature is not None:
+                signatures[path] = signature
+        return signatures
+
+    def start(self):
+        """Start polling in a background thread."""
+        self._thread = threading.Thread(target=self._run, name="tour-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling and wait for a change being handled."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        pending = set()
+        while not self._stop.wait(self.interval):
+            current = self._scan()
+            changed = {path for path in current.keys() | self.signatures.keys()
+                       if current.get(path) != self.signatures.get(path)}
+            self.signatures = current
+            if changed:
+                pending |= changed  # Wait until the files settle
+            elif pending:
+                self.poll_changes(pending)
+                pending = set()
+
+    def poll_changes(self, paths):
+        """
+        Handle changed files, printing and reporting any failure.
+
+        Args:
+            paths: Changed file paths
+        """
+        names = ', '.join(sorted(os.path.basename(path) for path in paths))
+        try:
+            written, events = self.handle(paths)
+        except (OSError, ValueError, KeyError) as e:
+            # e.g. tour_data.json saved half-way through an edit
+            print(f"⚠️  {names} changed but could not be processed: {e}")
+            return
+
+        for path in written:
+            signature = _signature(path)
+            if signature is not None:
+                self.signatures[path] = signature
+
+        if written:
+            updated = ', '.join(sorted(os.path.basename(path) for path in written))
+            print(f"🔄 {names} changed → {updated} updated")
+        elif events:
+            print(f"🔄 {names} changed")
+        for event, data in events:
+            self.notify(event, data)
+
+    def handle(self, paths):
+        """
+        Regenerate the files derived from changed paths.
+
+        Args:
+            paths: Changed file paths
+
+        Returns:
+            tuple: (paths written, [(event, data), ...])
+        """
+        written = []
+        reload_files = []
+        stylesheets = []
+        documents = set()
+        repatch = False
+
+        document_paths = {os.path.join(self.app_files, filename): key
+                          for key, filename in DOCUMENT_FILES.items()}
+        installed = {str(source): name for source, name in INSTALLED_SOURCES.items()}
+
+        for path in sorted(paths):
+            name = os.path.basename(path)
+            if path in installed:
+                target = os.path.join(self.app_files, installed[path])
+                shutil.copy(path, target)
+                written.append(target)
+                path, name = target, installed[path]
+            elif path in document_paths:
+                documents.add(document_paths[path])
+                continue
+            elif path in (str(EDITOR_INIT_TEMPLATE), self.index_path, self.index_js_path):
+                repatch = True
+                reload_files.append(name)
+                continue
+
+            if name.endswith('.css'):
+                stylesheets.append(name)
+            else:
+                reload_files.append(name)
+
+        view_config_only = False
+        if documents:
+            documents = self._sync_documents(documents, written)
+            if documents:
+                repatch = True
+                if 'tourData' in documents:
+                    reload_files.append(DOCUMENT_FILES['tourData'])
+                else:
+                    view_config_only = True
+
+        if repatch:
+            written.extend(self._repatch())
+
+        events = []
+        if reload_files:
+            events.append(('reload', {'files': reload_files}))
+        elif view_config_only:
+            events.append(('view-config', {
+                'viewConfig': self._load_view_config(),
+                'revision': self.store.revision if self.store is not None else None,
+            }))
+        if stylesheets and not reload_files:
+            events.append(('stylesheet', {'files': stylesheets}))
+        return written, events
+
+    def _sync_documents(self, keys, written):
+        """
+        Adopt tour_data.json / view_config.json edited on disk.
+
+        Returns:
+            set: Document keys that really changed (saves of the preview
+                server's own store are ignored)
+        """
+        replaced = False
+        if self.store is not None:
+            keys = self.store.changed_on_disk()
+            if not keys:
+                return keys
+            replaced = self.store.refresh(keys)
+
+        if 'tourData' in keys:
+            data = parser.json_to_data(os.path.join(self.app_files, DOCUMENT_FILES['tourData']))
+            data_js_path = os.path.join(self.app_files, "data.js")
+            parser.generate_data_js(data, data_js_path)
+            written.append(data_js_path)
+
+            # Recompute the entry views of changed links only, keeping
+            # those aligned by hand
+            existing = self._load_view_config()
+            view_config, sources, report = view_config_generator.update_view_config(
+                data, existing, view_config_generator.load_sources(self.work_dir), TourGraph(data))
+            view_config_generator.save_sources(sources, self.work_dir)
+            if report['recomputed'] or report['kept'] or report['removed']:
+                view_config_generator.print_update_report(report)
+            if view_config != existing:
+                view_config_path = os.path.join(self.app_files, DOCUMENT_FILES['viewConfig'])
+                view_config_generator.save_view_config(view_config, view_config_path)
+                written.append(view_config_path)
+                keys = keys | {'viewConfig'}
+                if self.store is not None:
+                    replaced = self.store.refresh({'viewConfig'}) or replaced
+
+        if replaced:
+            print("⚠️  Unsaved editor changes were replaced by the edited files")
+        return keys
+
+    def _load_view_config(self):
+        path = os.path.join(self.app_files, DOCUMENT_FILES['viewConfig'])
+        if not os.path.exists(path):
+            return {}
+        return parser.json_to_data(path)
+
+    def _repatch(self):
+        """
+        Reapply the index.html and index.js patches init applies.
+
+        Returns:
+            list: Paths of the files that changed
+        """
+        with open(EDITOR_INIT_TEMPLATE, 'r', encoding='utf-8') as f:
+            editor_init = f.read()
+        index_html = html_patcher.editor_patches(PatchPipeline(self.index_path), editor_init)
+        index_html.register('editor script update', html_patcher.refresh_editor_init,
+                            editor_init, html_patcher.path_prefix(self.index_path))
+        html_patcher.transition_patches(index_html, self._load_view_config())
+        index_js = js_patcher.editor_patches(PatchPipeline(self.index_js_path))
+        js_patcher.transition_patches(index_js)
+
+        report = run_pipelines(index_html, index_js)
+        paths = {'index.html': self.index_path, 'index.js': self.index_js_path}
+        return sorted({paths[entry['file']] for entry in report if entry['status'] == APPLIED})
@@ -0,0 +1,133 @@
+"""
+Read-only access to tour files stored inside a Marzipano Tool ZIP.
+Lets the server and packager use archive members without extracting them.
+"""
+
+import json
+import os
+import struct
+import threading
+import zipfile
+
+
+# Marker written to an overlay directory that is backed by a source ZIP
+SOURCE_MARKER = '.tour_source.json'
+
+# Files the patchers rewrite; only these are extracted to the overlay
+OVERLAY_FILES = {'index.html', 'index.js', 'data.js'}
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_LOCAL_HEADER_SIGNATURE = 0x04034b50
+
+
+class ZipSource:
+    """
+    Index of the members of a ZIP archive by name.
+
+    The central directory is read once; local header offsets are resolved
+    lazily and cached, so opening a multi-GB archive costs one directory
+    scan. File handles are kept per thread, so lookups and reads are safe
+    from concurrent request handlers.
+    """
+
+    def __init__(self, zip_path):
+        self.path = os.path.abspath(zip_path)
+        with zipfile.ZipFile(self.path, 'r') as zf:
+            self.members = {info.filename: info for info in zf.infolist() if not info.is_dir()}
+        self.mtime = os.path.getmtime(self.path)
+        self._offsets = {}
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Return the ZipInfo for a member name, or None."""
+        return self.members.get(name)
+
+    def _raw_handle(self):
+        fp = getattr(self._local, 'raw', None)
+        if fp is None:
+            fp = self._local.raw = open(self.path, 'rb')
+            with self._lock:
+                self._handles.append(fp)
+        return fp
+
+    def _zip_handle(self):
+        zf = getattr(self._local, 'zip', None)
+        if zf is None:
+            zf = self._local.zip = zipfile.ZipFile(self.path, 'r')
+            with self._lock:
+                self._handles.append(zf)
+        return zf
+
+    def data_offset(self, info):
+        """
+        Offset of a member's (compressed) bytes within the archive.
+
+        Args:
+            info: ZipInfo of the member
+
+        Returns:
+            int: Absolute file offset of the member data
+        """
+        offset = self._offsets.get(info.filename)
+        if offset is None:
+            fp = self._raw_handle()
+            fp.seek(info.header_offset)
+            fields = _LOCAL_HEADER.unpack(fp.read(_LOCAL_HEADER.size))
+            if fields[0] != _LOCAL_HEADER_SIGNATURE:
+                raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+            offset = info.header_offset + _LOCAL_HEADER.size + fields[9] + fields[10]
+            self._offsets[info.filename] = offset
+        return offset
+
+    def raw_file(self):
+        """This thread's raw handle on the archive, for zero-copy sends."""
+        return self._raw_handle()
+
+    def open(self, info):
+        """Open a member for streaming (decompressing if needed)."""
+        return self._zip_handle().open(info)
+
+    def close(self):
+        with self._lock:
+            for handle in self._handles:
+                handle.close()
+            self._handles = []
+
+
+def is_overlay_member(name):
+    """Whether a ZIP member belongs in the overlay directory."""
+    parts = name.split('/')
+    return parts[-1] in OVERLAY_FILES and 'tiles' not in parts
+
+
+def write_source_marker(work_dir, zip_path):
+    """
+    Record that work_dir is an overlay on top of zip_path.
+
+    Args:
+        work_dir: Overlay directory
+        zip_path: Source Marzipano Tool ZIP
+    """
+    with open(os.path.join(work_dir, SOURCE_MARKER), 'w', encoding='utf-8') as f:
+        json.dump({'zip': os.path.abspath(zip_path)}, f, indent=2)
+
+
+def read_source_marker(work_dir):
+    """
+    Return the source ZIP backing work_dir, or None if it was fully extracted.
+
+    Args:
+        work_dir: Tour directory
+    """
+    marker_path = os.path.join(work_dir, SOURCE_MARKER)
+    if not os.path.exists(marker_path):
+        return None
+
+    with open(marker_path, 'r', encoding='utf-8') as f:
+        zip_path = json.load(f)['zip']
+
+    if not os.path.exists(zip_path):
+        raise FileNotFoundError(f"Source ZIP for {work_dir} not found: {zip_path}")
+    return zip_path
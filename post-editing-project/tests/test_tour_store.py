@@ -0,0 +1,156 @@
+import json
+import os
+
+import pytest
+
+from marzipano_manager import tour_store
+from marzipano_manager.tour_store import JsonPatchError, TourStore, apply_patch
+
+
+@pytest.fixture
+def tour_dir(tmp_path):
+    app_files = tmp_path / 'app-files'
+    app_files.mkdir()
+    (app_files / 'tour_data.json').write_text(json.dumps({'scenes': [{'id': 'a', 'name': 'A'}]}))
+    return str(tmp_path)
+
+
+def journal_lines(tour_dir):
+    with open(os.path.join(tour_dir, tour_store.JOURNAL_FILENAME), encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_apply_patch_operations():
+    document = {'list': [1, 2], 'obj': {'a': 1}}
+    apply_patch(document, [
+        {'op': 'add', 'path': '/list/-', 'value': 3},
+        {'op': 'replace', 'path': '/obj/a', 'value': 2},
+        {'op': 'copy', 'from': '/obj', 'path': '/copied'},
+        {'op': 'move', 'from': '/list/0', 'path': '/first'},
+        {'op': 'remove', 'path': '/obj/a'},
+        {'op': 'test', 'path': '/copied/a', 'value': 2},
+    ])
+    assert document == {'list': [2, 3], 'obj': {}, 'copied': {'a': 2}, 'first': 1}
+
+
+def test_apply_patch_rolls_back_on_failure():
+    document = {'list': [1, 2], 'obj': {'a': 1}}
+    with pytest.raises(JsonPatchError):
+        apply_patch(document, [
+            {'op': 'add', 'path': '/list/0', 'value': 0},
+            {'op': 'remove', 'path': '/obj/a'},
+            {'op': 'test', 'path': '/list/0', 'value': 1},
+        ])
+    assert document == {'list': [1, 2], 'obj': {'a': 1}}
+
+
+def test_apply_journals_the_patch_as_received(tour_dir):
+    store = TourStore(tour_dir)
+    operations = [
+        {'op': 'add', 'path': '/tourData/x', 'value': {'a': 1}},
+        {'op': 'remove', 'path': '/tourData/x/a'},
+    ]
+    assert store.apply(operations) == 1
+    assert store.apply([{'op': 'add', 'path': '/tourData/y', 'value': 2}]) == 2
+    assert operations[0]['value'] == {'a': 1}
+    assert journal_lines(tour_dir)[1]['ops'] == operations
+
+    replayed = TourStore(tour_dir)
+    assert replayed.revision == 2
+    assert replayed.discarded == 0
+    assert replayed.document['tourData']['x'] == {}
+    assert replayed.document['tourData']['y'] == 2
+
+
+def test_apply_rolls_back_when_the_journal_write_fails(tour_dir, monkeypatch):
+    store = TourStore(tour_dir)
+    store.apply([{'op': 'replace', 'path': '/tourData/scenes/0/name', 'value': 'B'}])
+    before = store.snapshot()
+
+    def fail(entry):
+        raise OSError("disk full")
+    monkeypatch.setattr(store, '_append_journal', fail)
+    with pytest.raises(OSError):
+        store.apply([{'op': 'remove', 'path': '/tourData/scenes/0'}])
+    assert store.snapshot() == before
+
+    monkeypatch.undo()
+    assert store.apply([{'op': 'add', 'path': '/tourData/y', 'value': 2}]) == 2
+    assert TourStore(tour_dir).snapshot() == store.snapshot()
+
+
+def test_invalid_patch_changes_nothing(tour_dir):
+    store = TourStore(tour_dir)
+    with pytest.raises(JsonPatchError):
+        store.apply([{'op': 'remove', 'path': '/tourData/missing'}])
+    with pytest.raises(JsonPatchError):
+        store.apply([{'op': 'add', 'path': '/other', 'value': 1}])
+    assert store.revision == 0
+    assert len(journal_lines(tour_dir)) <= 1
+
+
+def test_outdated_base_revision_is_rejected(tour_dir):
+    store = TourStore(tour_dir)
+    store.apply([{'op': 'add', 'path': '/tourData/y', 'value': 1}])
+    assert store.apply([{'op': 'add', 'path': '/tourData/y', 'value': 2}], base_revision=0) is None
+    assert store.document['tourData']['y'] == 1
+
+
+def test_replay_ignores_a_torn_final_write(tour_dir):
+    store = TourStore(tour_dir)
+    store.apply([{'op': 'add', 'path': '/tourData/y', 'value': 1}])
+    with open(store.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"revision":2,"ops":[{"op"')
+
+    replayed = TourStore(tour_dir)
+    assert replayed.revision == 1
+    assert replayed.discarded == 0
+    assert replayed.document['tourData']['y'] == 1
+
+
+def test_replay_reports_entries_after_an_unreadable_one(tour_dir):
+    store = TourStore(tour_dir)
+    store.apply([{'op': 'add', 'path': '/tourData/y', 'value': 1}])
+    with open(store.journal_path, 'a', encoding='utf-8') as f:
+        f.write('not json\n')
+        f.write(json.dumps({'revision': 2, 'ops': [{'op': 'add', 'path': '/tourData/z', 'value': 2}]}) + '\n')
+
+    replayed = TourStore(tour_dir)
+    assert replayed.revision == 1
+    assert replayed.discarded == 1
+
+
+def test_compact_writes_documents_and_resets_the_journal(tour_dir):
+    store = TourStore(tour_dir)
+    store.apply([{'op': 'replace', 'path': '/tourData/scenes/0/name', 'value': 'B'}])
+    store.apply([{'op': 'add', 'path': '/viewConfig/a', 'value': {'yaw': 1}}])
+    assert sorted(store.compact()) == ['tour_data.json', 'view_config.json']
+
+    assert journal_lines(tour_dir) == [{'base': tour_store.document_digest(store.document), 'revision': 2}]
+    with open(os.path.join(tour_dir, 'app-files', 'tour_data.json'), encoding='utf-8') as f:
+        assert json.load(f)['scenes'][0]['name'] == 'B'
+
+    reopened = TourStore(tour_dir)
+    assert reopened.snapshot() == store.snapshot()
+    assert reopened.entries == 0
+
+
+def test_compacts_after_too_many_entries(tour_dir, monkeypatch):
+    monkeypatch.setattr(tour_store, 'COMPACT_ENTRIES', 3)
+    store = TourStore(tour_dir)
+    for value in range(3):
+        store.apply([{'op': 'add', 'path': '/tourData/y', 'value': value}])
+    assert store.entries == 0
+    assert len(journal_lines(tour_dir)) == 1
+    assert TourStore(tour_dir).document['tourData']['y'] == 2
+
+
+def test_stale_journal_is_discarded(tour_dir):
+    store = TourStore(tour_dir)
+    store.apply([{'op': 'add', 'path': '/tourData/y', 'value': 1}])
+    with open(os.path.join(tour_dir, 'app-files', 'tour_data.json'), 'w', encoding='utf-8') as f:
+        json.dump({'scenes': []}, f)
+
+    reopened = TourStore(tour_dir)
+    assert reopened.discarded == 1
+    assert reopened.document['tourData'] == {'scenes': []}